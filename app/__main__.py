@@ -0,0 +1,7 @@
+from app.cli import main
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n👋 Forced Exit.")
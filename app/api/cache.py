@@ -0,0 +1,124 @@
+from flask import request, Response
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import threading
+from app.config import CACHE_BACKEND, CACHE_REDIS_URL, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+from app.core.generation import current_generation
+
+class MemoryBackend:
+    """In-process LRU. Entries from older generations are dropped as soon as a newer one is stored."""
+    name = "memory"
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation):
+        with self._lock:
+            if self._generation is None or generation > self._generation:
+                self._data.clear()
+                self._generation = generation
+            elif generation < self._generation:
+                return # A slow request finished after a newer write; don't resurrect it
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def size(self):
+        return len(self._data)
+
+class RedisBackend:
+    """Shared across workers via any Redis-compatible server. Old generations age out by TTL."""
+    name = "redis"
+
+    def __init__(self, url, ttl):
+        import redis # Optional: only needed when CACHE_BACKEND=redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, generation):
+        self.client.setex(key, self.ttl, value)
+
+    def size(self):
+        return self.client.dbsize()
+
+class ResponseCache:
+    """
+    Serialized JSON responses keyed by (endpoint, params, generation).
+    The generation only moves after a committed close or ledger write, so a
+    key never maps to stale data and no explicit invalidation is needed.
+    """
+    def __init__(self):
+        if CACHE_BACKEND == "redis":
+            self.backend = RedisBackend(CACHE_REDIS_URL, CACHE_TTL_SECONDS)
+        else:
+            self.backend = MemoryBackend(CACHE_MAX_ENTRIES)
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, field):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self.backend.size()
+        }
+
+    def cached(self, view):
+        """Decorator: serves 304 / cached bytes for the current generation, else runs the view."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            generation = current_generation()
+            params = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            key = f"resp:{request.endpoint}:{request.view_args}:{params}:{generation}"
+            etag = f"g{generation}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+            if etag in request.if_none_match:
+                self._count("not_modified")
+                resp = Response(status=304)
+                resp.set_etag(etag)
+                return resp
+
+            entry = self.backend.get(key)
+            if entry is not None:
+                self._count("hits")
+                cache_control, body = entry.split(b"\n", 1)
+                resp = Response(body, mimetype="application/json")
+                resp.headers["Cache-Control"] = cache_control.decode()
+            else:
+                self._count("misses")
+                resp = view(*args, **kwargs)
+                if isinstance(resp, tuple) or resp.status_code != 200:
+                    return resp # Errors are never cached
+                if "Cache-Control" not in resp.headers:
+                    resp.cache_control.no_cache = True # Always revalidate against the generation
+                self.backend.set(key, resp.headers["Cache-Control"].encode() + b"\n" + resp.get_data(), generation)
+
+            resp.set_etag(etag)
+            return resp
+        return wrapper
+
+response_cache = ResponseCache()
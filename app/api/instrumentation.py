@@ -0,0 +1,35 @@
+from flask import request, g, Response
+import time
+from app.core.metrics import metrics
+from app.api.cache import response_cache
+
+REQUEST_SECONDS = metrics.histogram("http_request_seconds", "HTTP request latency by endpoint", ("endpoint", "method", "status"))
+
+def _cache_samples():
+    stats = response_cache.stats()
+    for field in ("hits", "misses", "not_modified", "entries"):
+        yield (field,), stats[field]
+
+metrics.gauge("response_cache_events", "Dashboard response cache counters (this worker)", ("event",),
+              callback=_cache_samples)
+
+def register_instrumentation(app):
+    """Installs per-endpoint latency hooks and the /metrics scrape endpoint."""
+    if metrics.enabled:
+        @app.before_request
+        def _start_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def _record_latency(response):
+            started = g.pop("request_started", None)
+            if started is not None:
+                # Route rule, not raw path, keeps label cardinality bounded
+                endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method, response.status_code)
+            return response
+
+    @app.route('/metrics')
+    def scrape_metrics():
+        """Prometheus text exposition format."""
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,179 @@
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from json.encoder import encode_basestring, encode_basestring_ascii
+from operator import itemgetter
+from werkzeug.http import http_date
+import math
+from app.config import JSON_DECIMAL_MODE
+
+def _decimal_literal(value):
+    """Exact fixed-point text; format 'f' avoids exponents such as 1E+2."""
+    return format(value, 'f')
+
+_BOOLS = {True: "true", False: "false"}
+
+def _encode_float(v):
+    return repr(v) if math.isfinite(v) else "null" # NaN/Infinity are not valid JSON
+
+def _decimal_column(col):
+    """Decimal.__str__ is the fastest exact form; it only switches to exponents for very large/small scales."""
+    text = list(map(Decimal.__str__, col))
+    return text if "E" not in "".join(text) else list(map(_decimal_literal, col))
+
+class _Encoder:
+    """
+    Type-dispatched JSON writer. Decimals are written as exact literals directly (no
+    placeholder pass over the output), and a list of rows is encoded a column at a time
+    with C-level map() calls, then stitched together with one %-template per row.
+    """
+    def __init__(self, decimal_mode, date_text, default, sort_keys=False, ensure_ascii=True):
+        self.default = default
+        self.sort_keys = sort_keys
+        self.text = encode_basestring_ascii if ensure_ascii else encode_basestring
+        text = self.text
+        quote_decimals = decimal_mode != "number"
+
+        def encode_decimal(v):
+            if not v.is_finite():
+                return "null"
+            literal = str(v)
+            if "E" in literal:
+                literal = _decimal_literal(v)
+            return '"' + literal + '"' if quote_decimals else literal
+
+        def encode_date(v):
+            return text(date_text(v))
+
+        self.scalars = {
+            str: text,
+            int: int.__repr__,
+            bool: _BOOLS.__getitem__,
+            float: _encode_float,
+            Decimal: encode_decimal,
+            date: encode_date,
+            datetime: encode_date,
+            type(None): lambda v: "null",
+        }
+        # Whole columns of one type, as (texts, quoted by the row template); None when
+        # the column holds values only the scalar path handles (NaN, ...)
+        self.columns = {
+            str: lambda col: (map(text, col), False),
+            int: lambda col: (map(int.__repr__, col), False),
+            bool: lambda col: (map(_BOOLS.__getitem__, col), False),
+            float: lambda col: (map(float.__repr__, col), False) if all(map(math.isfinite, col)) else None,
+            Decimal: lambda col: (_decimal_column(col), quote_decimals) if all(map(Decimal.is_finite, col)) else None,
+            date: lambda col: (map(text, map(date_text, col)), False),
+            datetime: lambda col: (map(text, map(date_text, col)), False),
+            type(None): lambda col: (["null"] * len(col), False),
+        }
+
+    def encode(self, o):
+        scalar = self.scalars.get(type(o))
+        if scalar is not None:
+            return scalar(o)
+        if isinstance(o, dict):
+            return self._object(o)
+        if isinstance(o, (list, tuple)):
+            return self._array(o)
+        # Subclasses json would encode as their base type (str/int enums, ...)
+        if isinstance(o, str):
+            return self.text(o)
+        if isinstance(o, int):
+            return _BOOLS[o] if isinstance(o, bool) else int.__repr__(o)
+        if isinstance(o, float):
+            return _encode_float(o)
+        return self.encode(self.default(o))
+
+    def rows(self, columns, rows):
+        """JSON array of objects, one key per column, from a sequence of tuples."""
+        data = list(zip(*rows))
+        if not data:
+            return "[]"
+        encoded = list(map(self._column, data))
+        template = "{" + ",".join(self.text(c).replace("%", "%%") + (':"%s"' if quoted else ":%s")
+                                  for c, (_, quoted) in zip(columns, encoded)) + "}"
+        return "[" + ",".join(map(template.__mod__, zip(*[texts for texts, _ in encoded]))) + "]"
+
+    def _column(self, col):
+        types = set(map(type, col))
+        if len(types) == 1:
+            bulk = self.columns.get(types.pop())
+            encoded = bulk(col) if bulk is not None else None
+            if encoded is not None:
+                return encoded
+        return map(self.encode, col), False
+
+    def _key(self, k):
+        return self.text(k if isinstance(k, str) else self.encode(k))
+
+    def _object(self, o):
+        items = sorted(o.items(), key=itemgetter(0)) if self.sort_keys else o.items()
+        return "{" + ",".join(self._key(k) + ":" + self.encode(v) for k, v in items) + "}"
+
+    def _array(self, o):
+        # A list of same-shaped dicts (a query result) takes the column path
+        if len(o) > 1 and type(o[0]) is dict and o[0] and set(map(type, o)) == {dict}:
+            keys = tuple(o[0])
+            if all(type(k) is str for k in keys) and all(map(keys.__eq__, map(tuple, o))):
+                if self.sort_keys:
+                    keys = tuple(sorted(keys))
+                getter = itemgetter(*keys)
+                return self.rows(keys, map(getter, o) if len(keys) > 1 else zip(map(getter, o)))
+        return "[" + ",".join(map(self.encode, o)) + "]"
+
+class LedgerJSONProvider(DefaultJSONProvider):
+    """
+    App-wide JSON provider (registered in run.py).
+    Encodes Decimals exactly, as numbers or strings per JSON_DECIMAL_MODE; non-finite ones become null.
+    Compact output (every response outside debug) goes through _Encoder; indented debug
+    output falls back to json.dumps, where Decimals can only be written as strings.
+    """
+    decimal_mode = JSON_DECIMAL_MODE
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._encoders = {}
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return _decimal_literal(o) if o.is_finite() else None # NaN/Infinity have no JSON form
+        if isinstance(o, timedelta):
+            return o.total_seconds() # PostgreSQL intervals
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get("indent") is not None or "default" in kwargs or "cls" in kwargs:
+            kwargs.setdefault("default", self.default)
+            return super().dumps(obj, **kwargs)
+        return self._encoder(kwargs.get("sort_keys", self.sort_keys),
+                             kwargs.get("ensure_ascii", self.ensure_ascii)).encode(obj)
+
+    def _encoder(self, sort_keys, ensure_ascii):
+        key = (self.decimal_mode, sort_keys, ensure_ascii)
+        encoder = self._encoders.get(key)
+        if encoder is None:
+            # Dates as Flask writes them (RFC 822)
+            encoder = self._encoders[key] = _Encoder(self.decimal_mode, http_date, self.default,
+                                                     sort_keys, ensure_ascii)
+        return encoder
+
+# --- Fast path: cursor tuples -> JSON text, no intermediate dicts ---
+
+def _app_default(o):
+    """Types without an encoder (jsonb dicts, UUIDs, ...) are converted by the app's provider."""
+    return current_app.json.default(o)
+
+_ROW_ENCODERS = {mode: _Encoder(mode, lambda v: v.isoformat(), _app_default) for mode in ("number", "string")}
+
+def rows_to_json(columns, rows):
+    """Serializes rows as a JSON array of objects, one key per column."""
+    return _ROW_ENCODERS[JSON_DECIMAL_MODE].rows(columns, rows)
+
+def json_text_response(text, status=200):
+    return current_app.response_class(text, status=status, mimetype="application/json")
+
+def rows_response(columns, rows):
+    """Flask response for a list of cursor rows."""
+    return json_text_response(rows_to_json(columns, rows))
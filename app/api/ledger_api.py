@@ -1,15 +1,35 @@
 from flask import Blueprint, request, jsonify
 from app.core.ledger_manager import LedgerManager
-from app.core.validators import validate_user_withdrawal, simple_amount_check
+from app.core.validators import validate_user_withdrawal, simple_amount_check, intake_user_id, intake_portfolio_id
+from app.core.intake_journal import get_journal
+from app.api.rate_limit import register_rate_limits
+from app.config import INTAKE_JOURNAL_ENABLED
 from decimal import Decimal
 
 ledger_api = Blueprint('ledger_api', __name__)
 manager = LedgerManager()
 
+# Per-client token buckets + concurrency gate, tightened while a close runs
+register_rate_limits(ledger_api)
+
+def _accept(user_id, req_type, amount, portfolio_id=None):
+    """Journals the request (returns its intake id) or, with the journal off, writes straight to Postgres."""
+    if INTAKE_JOURNAL_ENABLED:
+        return get_journal().append(user_id, req_type, amount, portfolio_id)
+    manager.queue_request(user_id, req_type, amount, portfolio_id=portfolio_id)
+    return None
+
+@ledger_api.record_once
+def _start_intake_flusher(state):
+    # Drain anything journaled before a restart as soon as the app is up
+    if INTAKE_JOURNAL_ENABLED:
+        get_journal()
+
 @ledger_api.route('/deposit', methods=['POST'])
 def deposit():
     data = request.get_json() or {}
-    user_id = data.get('user_id')
+    # Checked against the column limits here: a journaled entry must be insertable later
+    user_id = intake_user_id(data.get('user_id'))
     raw_amount = data.get('amount')
     
     valid, amount = simple_amount_check(raw_amount)
@@ -17,28 +37,34 @@ def deposit():
         return jsonify({"error": "Missing User ID or invalid amount"}), 400
         
     try:
-        manager.queue_request(user_id, 'DEPOSIT', amount)
-        return jsonify({"message": f"Queued deposit for {user_id}"}), 202
+        intake_id = _accept(user_id, 'DEPOSIT', amount)
+        return jsonify({"message": f"Queued deposit for {user_id}", "intake_id": intake_id}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @ledger_api.route('/withdraw', methods=['POST'])
 def withdraw():
+    """
+    Journaled (the default): only local checks run here, so a database stall can't block
+    the request; the flusher checks ownership and balance and dead-letters a refused
+    withdrawal. Without the journal the request is checked and written synchronously (403).
+    """
     data = request.get_json() or {}
-    user_id = data.get('user_id')
-    port_id = data.get('portfolio_id')
+    user_id = intake_user_id(data.get('user_id'))
+    port_id = intake_portfolio_id(data.get('portfolio_id'))
     raw_amount = data.get('amount')
     
     valid, amount = simple_amount_check(raw_amount)
     if not all([user_id, port_id is not None, valid]):
         return jsonify({"error": "Missing parameters"}), 400
         
-    allowed, msg = validate_user_withdrawal(user_id, port_id, amount)
-    if not allowed:
-        return jsonify({"error": "Unauthorized", "reason": msg}), 403
-        
+    if not INTAKE_JOURNAL_ENABLED:
+        allowed, msg = validate_user_withdrawal(user_id, port_id, amount)
+        if not allowed:
+            return jsonify({"error": "Unauthorized", "reason": msg}), 403
+
     try:
-        manager.queue_request(user_id, 'WITHDRAWAL', amount, portfolio_id=port_id)
-        return jsonify({"message": "Withdrawal queued"}), 202
+        intake_id = _accept(user_id, 'WITHDRAWAL', amount, portfolio_id=port_id)
+        return jsonify({"message": "Withdrawal queued", "intake_id": intake_id}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
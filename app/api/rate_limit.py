@@ -0,0 +1,81 @@
+from flask import request, g, jsonify
+import math
+
+from app.config import (RATE_LIMIT_ENABLED, RATE_LIMIT_RPS, RATE_LIMIT_BURST, RATE_LIMIT_MAX_IN_FLIGHT,
+                        RATE_LIMIT_CLOSE_FACTOR, RATE_LIMIT_CLIENT_HEADER)
+from app.core.ingest_limits import get_limit_store
+from app.core.metrics import metrics
+
+THROTTLED = metrics.counter("ledger_api_throttled_total", "Ledger API requests answered 429", ("reason", "mode"))
+
+class IngestLimiter:
+    """
+    Admission control for the external ledger API.
+    1. Token bucket per client: a sustained RATE_LIMIT_RPS with bursts up to RATE_LIMIT_BURST.
+    2. Concurrency gate: at most RATE_LIMIT_MAX_IN_FLIGHT requests in the handlers (and
+       so on the database) at once, across every worker sharing the limit store.
+       Excess is rejected, never queued.
+    3. Adaptive: while a close runs, both limits shrink by RATE_LIMIT_CLOSE_FACTOR so
+       intake can't take the connections and row locks the close needs.
+    """
+    def __init__(self, rps=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST, max_in_flight=RATE_LIMIT_MAX_IN_FLIGHT,
+                 close_factor=RATE_LIMIT_CLOSE_FACTOR, enabled=RATE_LIMIT_ENABLED):
+        self.rps = rps
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.close_factor = close_factor
+        self.enabled = enabled
+
+    def limits(self, closing):
+        """(rps, burst, max in flight) for the current mode."""
+        if not closing:
+            return self.rps, self.burst, self.max_in_flight
+        f = self.close_factor
+        return self.rps * f, max(1.0, self.burst * f), max(1, int(self.max_in_flight * f))
+
+    def admit(self, client):
+        """(True, None) and a held slot, or (False, (reason, retry_after_seconds))."""
+        store = get_limit_store()
+        closing = store.close_running()
+        rps, burst, max_in_flight = self.limits(closing)
+        mode = "close" if closing else "normal"
+
+        reason, wait = store.enter(client, rps, burst, max_in_flight)
+        if reason is None:
+            return True, None
+        THROTTLED.inc(reason, mode)
+        if reason == "concurrency":
+            return False, (reason, 1)
+        return False, (reason, max(1, math.ceil(wait)) if wait != float("inf") else 60)
+
+    def release(self):
+        get_limit_store().leave()
+
+ingest_limiter = IngestLimiter()
+
+metrics.gauge("ledger_api_in_flight", "Ledger API requests currently admitted (every worker sharing the limit store)",
+              callback=lambda: [((), get_limit_store().in_flight())])
+
+def client_key():
+    return request.headers.get(RATE_LIMIT_CLIENT_HEADER) or request.remote_addr or "unknown"
+
+def register_rate_limits(blueprint):
+    """Puts every route of the blueprint behind ingest_limiter."""
+    @blueprint.before_request
+    def _admit():
+        if not ingest_limiter.enabled:
+            return None
+        admitted, rejection = ingest_limiter.admit(client_key())
+        if admitted:
+            g.ingest_slot = True
+            return None
+        reason, retry_after = rejection
+        response = jsonify({"error": "Too Many Requests", "reason": reason, "retry_after": retry_after})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after)
+        return response
+
+    @blueprint.teardown_request
+    def _release(exc):
+        if g.pop("ingest_slot", False):
+            ingest_limiter.release()
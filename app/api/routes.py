@@ -1,27 +1,39 @@
 from flask import Blueprint, jsonify, request
-import psycopg2
-from app.config import PSYCOPG2_CONFIG
+from app.database.replica import read_connection
 from app.core.ledger_manager import LedgerManager
 from app.core.daily_engine import DailyEngine
 from app.core.auditor import SystemAuditor
+from app.core.reconciler import ReconciliationEngine
+from app.core import exposure
+from app.core.retention import rolls_up_on
+from app.core.profiler import slow_queries
+from app.database.sharding import fan_out
+from app.api.cache import response_cache
+from app.api.json_provider import rows_to_json, rows_response, json_text_response
 from datetime import datetime, timedelta
 
 api_blueprint = Blueprint('dashboard_api', __name__)
 ledger = LedgerManager()
 engine = DailyEngine()
 auditor = SystemAuditor()
+reconciler = ReconciliationEngine()
+
+def _sum_liability(shard, conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(SUM(principal_owned), 0) FROM user_shares")
+        return cur.fetchone()[0]
 
 @api_blueprint.route('/status', methods=['GET'])
+@response_cache.cached
 def get_status():
     """Summarizes system health with performance metrics."""
-    conn = psycopg2.connect(**PSYCOPG2_CONFIG)
+    conn = read_connection()
     with conn.cursor() as cur:
         cur.execute("SELECT total_idle_cash, total_invested, last_close_date FROM fund_registry")
         reg = cur.fetchone()
         idle, inv, last_date = reg if reg else (0, 0, None)
         
-        cur.execute("SELECT COALESCE(SUM(principal_owned), 0) FROM user_shares")
-        liability = cur.fetchone()[0]
+        liability = sum(fan_out(_sum_liability, read_only=True))
         
         cur.execute("SELECT COALESCE(SUM(accrued_interest), 0) FROM portfolio")
         shadow_profit = cur.fetchone()[0]
@@ -31,24 +43,26 @@ def get_status():
         
     conn.close()
     return jsonify({
-        "idle_cash": float(idle),
-        "total_invested": float(inv),
-        "total_liability": float(liability),
-        "shadow_profit": float(shadow_profit),
-        "realized_pnl": float(realized_pnl),
+        "idle_cash": idle,
+        "total_invested": inv,
+        "total_liability": liability,
+        "shadow_profit": shadow_profit,
+        "realized_pnl": realized_pnl,
         "last_close_date": str(last_date) if last_date else None,
         "next_expected_date": str(next_date)
     })
 
 @api_blueprint.route('/pending-summary', methods=['GET'])
+@response_cache.cached
 def get_pending_summary():
     """Aggregated stats for the header."""
     return jsonify(ledger.get_daily_aggregation())
 
 @api_blueprint.route('/pending-list', methods=['GET'])
+@response_cache.cached
 def get_pending_list():
     """Granular list of transactions for editing/deleting in FrontOffice."""
-    return jsonify(ledger.get_pending_list())
+    return rows_response(LedgerManager.PENDING_COLUMNS, ledger.get_pending_rows())
 
 @api_blueprint.route('/pending/<int:tx_id>', methods=['DELETE'])
 def cancel_pending(tx_id):
@@ -71,37 +85,174 @@ def update_pending(tx_id):
         return jsonify({"error": str(e)}), 500
 
 @api_blueprint.route('/audit/full', methods=['GET'])
+@response_cache.cached
 def get_audit():
-    return jsonify(auditor.get_full_audit_data())
+    users, ports, registry, archived = auditor.get_full_audit_rows()
+    registry_json = rows_to_json(SystemAuditor.REGISTRY_COLUMNS, [registry])[1:-1]
+    return json_text_response(
+        '{"users":' + rows_to_json(SystemAuditor.USER_COLUMNS, users) +
+        ',"portfolios":' + rows_to_json(SystemAuditor.PORTFOLIO_COLUMNS, ports) +
+        ',"registry":' + registry_json +
+        ',"archived":' + rows_to_json(SystemAuditor.ARCHIVE_COLUMNS, archived) + '}'
+    )
 
-@api_blueprint.route('/reports', methods=['GET'])
-def get_reports():
-    conn = psycopg2.connect(**PSYCOPG2_CONFIG)
+@api_blueprint.route('/exposure', methods=['GET'])
+@response_cache.cached
+def get_exposure():
+    """
+    Principal, accrued interest and weighted-average yield per bank, with each bank's
+    maturity ladder by month. Reads only the bank_exposure index (rows = banks x months).
+    """
+    conn = read_connection()
     with conn.cursor() as cur:
+        cur.execute("SELECT last_close_date FROM fund_registry")
+        last_close = cur.fetchone()[0]
         cur.execute("""
-            SELECT report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close 
-            FROM daily_reports ORDER BY report_date DESC LIMIT 15
+            SELECT bank_name, maturity_month, lots, principal_cents, accrued_cents, rate_weighted
+            FROM bank_exposure ORDER BY bank_name, maturity_month
         """)
         rows = cur.fetchall()
     conn.close()
-    return jsonify([{
-        "date": str(r[0]), "in": float(r[1]), "out": float(r[2]), 
-        "idle": float(r[3]), "invested": float(r[4])
-    } for r in rows])
+    return jsonify(dict(exposure.summarize(rows), as_of=str(last_close) if last_close else None))
+
+@api_blueprint.route('/reconcile', methods=['POST'])
+def reconcile():
+    """Runs lot reconciliation. Body {"mode": "full"} forces the nightly full scan."""
+    data = request.get_json(silent=True) or {}
+    try:
+        if data.get('mode') == 'full':
+            return jsonify(reconciler.run_full())
+        return jsonify(reconciler.run_incremental())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Downsampling granularity -> date_trunc unit (whitelisted, never interpolated from input)
+REPORT_BUCKETS = {"day": "day", "week": "week", "month": "month"}
+
+@api_blueprint.route('/reports', methods=['GET'])
+@response_cache.cached
+def get_reports():
+    """
+    Without parameters: the last 15 daily rows (dashboard default).
+    With ?from=&to=&bucket=day|week|month: an ascending series aggregated in SQL
+    (sum of flows, end-of-bucket idle/invested). Ranges ending on or before the
+    last close are immutable and served with a long-lived Cache-Control.
+    ETags and 304s come from the generation-keyed response cache.
+    Both retention tiers are read: months rolled up into daily_reports_monthly come
+    back as one row per month (dated by its last close), whatever the bucket.
+    """
+    if not any(k in request.args for k in ('from', 'to', 'bucket')):
+        conn = read_connection()
+        with conn.cursor() as cur:
+            cur.execute("""
+                (SELECT report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close 
+                 FROM daily_reports ORDER BY report_date DESC LIMIT 15)
+                UNION ALL
+                (SELECT last_date, total_deposit, total_withdrawal, idle_cash_at_close, invested_at_close
+                 FROM daily_reports_monthly ORDER BY month DESC LIMIT 15)
+                ORDER BY 1 DESC LIMIT 15
+            """)
+            rows = cur.fetchall()
+        conn.close()
+        return rows_response(("date", "in", "out", "idle", "invested"), rows)
+
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in REPORT_BUCKETS:
+        return jsonify({"error": f"Invalid bucket '{bucket}'. Use one of: {', '.join(REPORT_BUCKETS)}"}), 400
+    try:
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+    except ValueError:
+        return jsonify({"error": "Dates must be formatted as YYYY-MM-DD"}), 400
+    if start and end and start > end:
+        return jsonify({"error": "'from' must not be after 'to'"}), 400
+
+    conn = read_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT last_close_date, (SELECT MAX(last_date) FROM daily_reports_monthly),
+                       (SELECT MIN(report_date) FROM daily_reports)
+                FROM fund_registry
+            """)
+            last_close, rolled_through, oldest_daily = cur.fetchone()
+
+            # Each tier filtered on its own columns, so the hot leg prunes partitions;
+            # a rolled-up month is included whole when it overlaps the range
+            cur.execute("""
+                WITH tiers AS (
+                    SELECT report_date AS first_date, report_date AS last_date, 1 AS days, daily_deposit AS deposit,
+                           daily_withdrawal AS withdrawal, idle_cash_at_close AS idle, invested_at_close AS invested
+                    FROM daily_reports
+                    WHERE (%(start)s::date IS NULL OR report_date >= %(start)s::date)
+                      AND (%(end)s::date IS NULL OR report_date <= %(end)s::date)
+                    UNION ALL
+                    SELECT first_date, last_date, days, total_deposit, total_withdrawal, idle_cash_at_close, invested_at_close
+                    FROM daily_reports_monthly
+                    WHERE (%(start)s::date IS NULL OR last_date >= %(start)s::date)
+                      AND (%(end)s::date IS NULL OR first_date <= %(end)s::date)
+                )
+                SELECT date_trunc(%(unit)s, first_date)::date AS bucket_start,
+                       MAX(last_date),
+                       SUM(days),
+                       SUM(deposit),
+                       SUM(withdrawal),
+                       (ARRAY_AGG(idle ORDER BY last_date DESC))[1],
+                       (ARRAY_AGG(invested ORDER BY last_date DESC))[1]
+                FROM tiers
+                GROUP BY bucket_start
+                ORDER BY bucket_start
+            """, {"unit": REPORT_BUCKETS[bucket], "start": start, "end": end})
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    resp = rows_response(("date", "end", "days", "in", "out", "idle", "invested"), rows)
+
+    # Closed days can never be re-closed, but `maintain` later replaces their daily rows with
+    # one monthly row: only a range already wholly rolled up is final. Otherwise cache until
+    # its oldest daily month could roll up, at one close per day.
+    if end and last_close and end <= last_close:
+        resp.cache_control.public = True
+        if rolled_through and end <= rolled_through:
+            resp.cache_control.max_age = 31536000
+            resp.cache_control.immutable = True
+        else:
+            first_daily = max(start or oldest_daily, oldest_daily) if oldest_daily else None
+            days_left = (rolls_up_on(first_daily.replace(day=1)) - last_close).days if first_daily else 0
+            resp.cache_control.max_age = min(31536000, max(0, days_left) * 86400)
+    return resp
 
 @api_blueprint.route('/history/<target_date>', methods=['GET'])
+@response_cache.cached
 def get_history(target_date):
-    conn = psycopg2.connect(**PSYCOPG2_CONFIG)
-    try:
+    def fetch(shard, conn):
         with conn.cursor() as cur:
             cur.execute("""
                 SELECT user_id, type, amount FROM pending_ledger 
                 WHERE status = 'COMPLETED' AND created_at::date = %s
             """, (target_date,))
-            rows = cur.fetchall()
-            return jsonify([{"user_id": r[0], "type": r[1], "amount": float(r[2])} for r in rows])
-    finally:
-        conn.close()
+            return cur.fetchall()
+
+    rows = [r for part in fan_out(fetch, read_only=True) for r in part]
+    return rows_response(("user_id", "type", "amount"), rows)
+
+@api_blueprint.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss counters for the dashboard response cache (this worker)."""
+    return jsonify(response_cache.stats())
+
+@api_blueprint.route('/debug/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Recent statements over SLOW_QUERY_MS with EXPLAIN plans (QUERY_PROFILING=1 only)."""
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        "enabled": slow_queries.enabled,
+        "threshold_ms": slow_queries.threshold * 1000,
+        "captured": slow_queries.captured,
+        "log_file": slow_queries.path,
+        "entries": slow_queries.recent(limit)
+    })
 
 @api_blueprint.route('/close-day', methods=['POST'])
 def close_day():
@@ -0,0 +1,89 @@
+import argparse
+import importlib
+
+from app.config import (CLOSE_WORKERS, STRESS_PATHS, STRESS_WORKERS, STRESS_HORIZONS, REBUILD_WORKERS,
+                        REPORT_RETENTION_DAYS, REPORT_PARTITIONS_AHEAD)
+
+# Subcommand -> module under app.commands exposing main(args). The module (and with it
+# psycopg2, tabulate, pyarrow, numpy...) is imported only when that subcommand runs.
+COMMANDS = {
+    "queue": "app.commands.queue",
+    "close": "app.commands.close",
+    "audit": "app.commands.audit",
+    "export": "app.commands.export",
+    "simulate": "app.commands.simulate",
+    "stress": "app.commands.stress",
+    "rebuild": "app.commands.rebuild",
+    "maintain": "app.commands.maintain"
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app", description="Liquidity V3 command line")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("queue", help="Queue a deposit or withdrawal for the next close")
+    p.add_argument("user_id")
+    p.add_argument("type", choices=["deposit", "withdrawal"])
+    p.add_argument("amount")
+    p.add_argument("--portfolio", type=int, default=None, help="Lot to withdraw from (withdrawals only)")
+
+    p = sub.add_parser("close", help="Run the daily close")
+    p.add_argument("--date", default=None, help="Close date, YYYY-MM-DD (default: today)")
+    p.add_argument("--bank", default=None, help="Invest the day's deposits with this bank")
+    p.add_argument("--rate", default=None, help="Yield rate (%%)")
+    p.add_argument("--early-rate", default=None, help="Exit/early rate (%%)")
+    p.add_argument("--duration", type=int, default=None, help="Tenor (days)")
+    p.add_argument("--workers", type=int, default=CLOSE_WORKERS, help="Partition workers for the close")
+    p.add_argument("--resolve", action="store_true",
+                   help="Settle close transactions a crashed coordinator left prepared, then stop")
+
+    p = sub.add_parser("audit", help="System audit and reconciliation reports")
+    p.add_argument("--summary", action="store_true", help="Registry and totals only (fast, cron-friendly)")
+    p.add_argument("--reconcile", action="store_true", help="Verify lots touched since the last check")
+    p.add_argument("--full", action="store_true", help="With --reconcile: rescan every lot (nightly)")
+
+    p = sub.add_parser("export", help="Export fund history and positions to Parquet/Arrow")
+    p.add_argument("--out", default="exports", help="Output directory (partitioned by date)")
+    p.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    p.add_argument("--tables", nargs="+", default=None, help="Tables to export (default: all)")
+    p.add_argument("--full", action="store_true", help="Ignore watermarks and re-export everything")
+    p.add_argument("--batch-size", type=int, default=50000, help="Rows per server-side fetch")
+
+    p = sub.add_parser("simulate", help="Multi-day simulation")
+    p.add_argument("--engine", choices=["db", "memory"], default="db",
+                   help="db: real PostgreSQL stack; memory: in-process FundModel")
+    p.add_argument("--days", type=int, default=60)
+    p.add_argument("--users", type=int, default=100)
+    p.add_argument("--txs", type=int, default=None, help="Average transactions per day (default 20-50)")
+    p.add_argument("--audit-every", type=int, default=1, help="Reconcile every N days")
+    p.add_argument("--seed", type=int, default=None)
+
+    p = sub.add_parser("stress", help="Monte Carlo liquidity stress test of the current fund")
+    p.add_argument("--paths", type=int, default=STRESS_PATHS)
+    p.add_argument("--workers", type=int, default=STRESS_WORKERS, help="Worker processes (0 = one per core)")
+    p.add_argument("--horizons", type=int, nargs="+", default=STRESS_HORIZONS, help="Reporting horizons in days")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--withdrawal-scale", type=float, default=1.0, help="Multiplier on calibrated withdrawals")
+    p.add_argument("--run-probability", type=float, default=0.01, help="Daily chance of entering a run")
+    p.add_argument("--run-multiplier", type=float, default=4.0, help="Withdrawal multiplier during a run")
+
+    p = sub.add_parser("rebuild", help="Rebuild the ledger tables from the ledger_events journal")
+    p.add_argument("--workers", type=int, default=REBUILD_WORKERS, help="Replay processes (0 = one per core)")
+    p.add_argument("--baseline", action="store_true",
+                   help="Journal the current state of a fund that predates ledger_events, then stop")
+    p.add_argument("--verify", action="store_true", help="Run a full reconciliation after the rebuild")
+
+    p = sub.add_parser("maintain", help="Create report partitions and roll old months up (online)")
+    p.add_argument("--retention-days", type=int, default=REPORT_RETENTION_DAYS,
+                   help="Keep daily rows for months ending within this many days of the last close")
+    p.add_argument("--ahead", type=int, default=REPORT_PARTITIONS_AHEAD, help="Months of partitions to create ahead")
+    p.add_argument("--dry-run", action="store_true", help="Show what would be created and rolled up")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "close" and args.bank and None in (args.rate, args.early_rate, args.duration):
+        # V3 requires the 4 Pillars whenever deposits are invested
+        parser.error("close --bank also needs --rate, --early-rate and --duration")
+    importlib.import_module(COMMANDS[args.command]).main(args)
@@ -0,0 +1,26 @@
+from datetime import date
+from decimal import Decimal
+
+from app.core.daily_engine import DailyEngine
+from app.core.sharded_close import resolve_in_doubt
+
+def main(args):
+    """Runs the daily close non-interactively (cron); exits non-zero if the engine refuses."""
+    if args.resolve:
+        print(f"✨ SUCCESS: {resolve_in_doubt()} in-doubt close transaction(s) resolved.")
+        return
+
+    inv_params = None
+    if args.bank:
+        inv_params = {
+            'bank': args.bank,
+            'rate': Decimal(args.rate),
+            'early_rate': Decimal(args.early_rate),
+            'duration': args.duration
+        }
+
+    close_date = date.fromisoformat(args.date) if args.date else date.today()
+    success, msg = DailyEngine(workers=args.workers).run_daily_close(close_date, inv_params)
+    if not success:
+        raise SystemExit(f"🔥 ENGINE ERROR: {msg}")
+    print(f"✨ SUCCESS: {msg}")
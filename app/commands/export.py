@@ -0,0 +1,21 @@
+from app.core.exporter import ColumnarExporter, SCHEMAS
+
+def run_export(out_dir, fmt, tables, full, batch_size):
+    tables = tables or list(SCHEMAS)
+    exporter = ColumnarExporter(out_dir, fmt=fmt, batch_size=batch_size)
+    mode = "FULL" if full else "INCREMENTAL"
+
+    print("\n" + "="*80)
+    print(f"📦 COLUMNAR EXPORT | Mode: {mode} | Format: {fmt.upper()} | Target: {out_dir}")
+    print("="*80)
+
+    summary = exporter.run(tables=tables, full=full)
+    for table in tables:
+        print(f"  {table:<15}: {summary.get(table, 0):>12,} rows")
+    print("="*80 + "\n")
+
+def main(args):
+    unknown = [t for t in args.tables or [] if t not in SCHEMAS]
+    if unknown:
+        raise SystemExit(f"Unknown table(s): {', '.join(unknown)}. Choose from: {', '.join(SCHEMAS)}")
+    run_export(args.out, args.format, args.tables, args.full, args.batch_size)
@@ -0,0 +1,21 @@
+from app.core.retention import RetentionManager
+
+def main(args):
+    """Report partitions and retention roll-ups (cron); safe while the API and the close are running."""
+    manager = RetentionManager(retention_days=args.retention_days, ahead=args.ahead)
+    summary = manager.run(dry_run=args.dry_run)
+
+    print("\n" + "="*80)
+    print(f"🗄️  RETENTION MAINTENANCE{' (DRY RUN)' if args.dry_run else ''} | Last Close: {summary['last_close']} "
+          f"| Horizon: {manager.retention_days} days | {summary['seconds']:.2f}s")
+    print("="*80)
+    print(f"  Partitions created : {', '.join(summary['created']) or 'none'}"
+          + (f" ({summary['moved_rows']:,} rows moved from the default partition)" if summary['moved_rows'] else ""))
+    print(f"  Months rolled up   : {', '.join(summary['rolled_up']) or 'none'}"
+          + (f" ({summary['dropped_rows']:,} daily rows)" if summary['dropped_rows'] else ""))
+    for name, reason in summary['deferred']:
+        print(f"  Deferred           : {name} ({reason}), retried on the next run")
+    print(f"  Hot daily rows     : {summary['hot_rows']:,}")
+    print(f"  Archived months    : {summary['archived_months']:,}")
+    print(f"  Archived lots      : {summary['archived_lots']:,}")
+    print("="*80 + "\n")
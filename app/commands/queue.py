@@ -0,0 +1,22 @@
+from app.core.ledger_manager import LedgerManager
+from app.core.validators import validate_user_withdrawal, simple_amount_check, intake_user_id
+
+def main(args):
+    """Queues one request for the next close (scripted equivalent of main_cli.py [1]/[2])."""
+    req_type = args.type.upper()
+    valid, amt = simple_amount_check(args.amount)
+    if not valid:
+        raise SystemExit("❌ Error: Invalid amount.")
+    if intake_user_id(args.user_id) is None:
+        raise SystemExit("❌ Error: Invalid user id.")
+
+    if req_type == 'WITHDRAWAL':
+        if args.portfolio is None:
+            raise SystemExit("❌ Error: Withdrawals need --portfolio.")
+        # V3 Security Validation
+        allowed, msg = validate_user_withdrawal(args.user_id, args.portfolio, amt)
+        if not allowed:
+            raise SystemExit(f"⚠️ Rejected: {msg}")
+
+    tx_id = LedgerManager().queue_request(args.user_id, req_type, amt, args.portfolio)
+    print(f"✅ Queued: {req_type.title()} of ${amt:,.2f} for {args.user_id} (tx {tx_id})")
@@ -0,0 +1,29 @@
+from app.core.journal_rebuild import JournalRebuilder
+
+def main(args):
+    """Rebuilds pending_ledger, user_shares, portfolio, lot totals, reports and the registry from ledger_events."""
+    rebuilder = JournalRebuilder(workers=args.workers)
+    if args.baseline:
+        for database, count in rebuilder.baseline().items():
+            note = f"{count:,} events journaled" if count else "journal not empty, left as is"
+            print(f"📒 {database}: {note}")
+        return
+
+    report = rebuilder.run()
+    print("\n" + "="*80)
+    print(f"🔁 JOURNAL REBUILD | {report['events']:,} events | {rebuilder.workers} workers | {report['seconds']:.2f}s")
+    print("="*80)
+    for db in report["databases"]:
+        rows = ", ".join(f"{table} {n:,}" for table, n in db["rows"].items()) or "no rows"
+        print(f"  {db['database']:<28}: {db['events']:>12,} events | replay {db['replay_seconds']:.2f}s "
+              f"| total {db['seconds']:.2f}s")
+        print(f"  {'':<28}  {rows}")
+
+    if args.verify:
+        from app.core.reconciler import ReconciliationEngine
+        recon = ReconciliationEngine().run_full()
+        status = "✅ CLEAN" if recon["clean"] else f"❌ {len(recon['discrepancies'])} DISCREPANCIES, fund diff ${recon['fund_diff']:,.2f}"
+        print(f"\n  Reconciliation     : {status} ({recon['lots_checked']} lots)")
+        if not recon["clean"]:
+            raise SystemExit(1)
+    print("="*80 + "\n")
@@ -0,0 +1,173 @@
+import random
+import time
+from decimal import Decimal
+from datetime import date, timedelta
+import psycopg2
+
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+from app.core.auditor import SystemAuditor
+from app.core.reconciler import ReconciliationEngine
+from app.core.fund_model import FundModel
+from app.core.money import from_cents
+from app.config import PSYCOPG2_CONFIG
+from app.database.sharding import is_sharded, fan_out
+
+def reset_environment():
+    """Wipes the database and resets the registry to Day Zero."""
+    print("🧹 Wiping database for fresh 60-day simulation...")
+    conn = psycopg2.connect(**PSYCOPG2_CONFIG)
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE pending_ledger, portfolio, user_shares, daily_reports, lot_share_totals, reconciliation_runs, close_runs, daily_reports_monthly, portfolio_archive, bank_exposure, ledger_events CASCADE")
+            cur.execute("UPDATE fund_registry SET total_idle_cash = 1000000, total_invested = 0, last_close_date = NULL")
+            cur.execute("SELECT nextval('fund_generation')")
+    conn.close()
+    if is_sharded():
+        fan_out(_truncate_shard)
+
+def _truncate_shard(shard, conn):
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE pending_ledger, user_shares, ledger_events RESTART IDENTITY")
+
+MIN_BALANCE_CENTS = 1000
+
+def get_users_with_balances():
+    """Queries current holders (on every shard) to allow for realistic withdrawals. Balances in cents."""
+    def fetch(shard, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id, portfolio_id, owned_cents FROM user_shares WHERE owned_cents > %s",
+                        (MIN_BALANCE_CENTS,))
+            return cur.fetchall()
+    return [r for part in fan_out(fetch) for r in part]
+
+class DatabaseBackend:
+    """The real stack: every request, close and audit goes through PostgreSQL."""
+    def __init__(self):
+        reset_environment()
+        self.ledger = LedgerManager()
+        self.engine = DailyEngine()
+        self.auditor = SystemAuditor()
+        self.reconciler = ReconciliationEngine()
+        self.queue_request = self.ledger.queue_request
+        self.get_daily_aggregation = self.ledger.get_daily_aggregation
+        self.run_daily_close = self.engine.run_daily_close
+        self.get_users_with_balances = get_users_with_balances
+
+    def check(self):
+        # Math Proof: Sum(User Shares) == Sum(Portfolio Principals) == Registry, checked on touched lots only
+        return self.reconciler.run_incremental()
+
+    def final(self):
+        # Nightly-style full scan
+        return self.reconciler.run_full(), self.auditor.get_full_audit_data()
+
+class MemoryBackend:
+    """FundModel: same close semantics, no database (what-if runs over many users and days)."""
+    def __init__(self):
+        self.model = FundModel()
+        self.queue_request = self.model.queue_request
+        self.get_daily_aggregation = self.model.get_daily_aggregation
+        self.run_daily_close = self.model.run_daily_close
+
+    def get_users_with_balances(self):
+        return [(u, p, c) for (u, p), c in self.model.shares.items() if c > MIN_BALANCE_CENTS]
+
+    def check(self):
+        return self.model.reconcile()
+
+    def final(self):
+        return self.model.reconcile(), self.model.get_full_audit_data()
+
+def run_simulation(engine="db", days=60, users=100, txs=None, audit_every=1, seed=None):
+    rng = random.Random(seed)
+    # 1. Initialize Core Engines
+    backend = MemoryBackend() if engine == "memory" else DatabaseBackend()
+    
+    # 2. Setup Parameters
+    user_pool = [f"Client_{i:03d}" for i in range(1, users + 1)]
+    banks = ["VCB", "ACB", "BIDV", "Techcombank", "TPBank"]
+    start_date = date(2026, 1, 1)
+    tx_range = (txs * 2 // 3, txs * 4 // 3) if txs else (20, 50)
+    total_txs = 0
+    started = time.perf_counter()
+    
+    print(f"\n🚀 STARTING {days}-DAY LIQUIDITY SIMULATION ({engine} engine, {users:,} users)")
+    print("=" * 100)
+    print(f"{'DAY':<5} | {'DATE':<12} | {'DEPOSITS':<10} | {'WITHDRAWS':<10} | {'NET FLOW':<12} | {'STATUS'}")
+    print("-" * 100)
+
+    for d in range(days):
+        current_date = start_date + timedelta(days=d)
+        
+        # --- PHASE A: RANDOM TRANSACTIONS ---
+        num_txs = rng.randint(*tx_range)
+        total_txs += num_txs
+        daily_users_with_balance = backend.get_users_with_balances()
+
+        for _ in range(num_txs):
+            # 70% chance of deposit, 30% chance of withdrawal
+            if rng.random() < 0.7 or not daily_users_with_balance:
+                # Deposit
+                u = rng.choice(user_pool)
+                amt = from_cents(rng.randint(50000, 1500000))
+                backend.queue_request(u, 'DEPOSIT', amt)
+            else:
+                # Withdrawal (Pick from actual holders)
+                holder = rng.choice(daily_users_with_balance)
+                u_id, p_id, balance = holder
+                # Withdraw between 5% and 50% of their holding
+                cents = balance * rng.randint(50, 500) // 1000
+                if cents > 0:
+                    backend.queue_request(u_id, 'WITHDRAWAL', from_cents(cents), portfolio_id=p_id)
+
+        # --- PHASE B: DAILY CLOSE ---
+        summary = backend.get_daily_aggregation()
+        
+        # Prepare V3 Pillars for new deployment
+        inv_params = None
+        if summary['net_flow'] > 0:
+            inv_params = {
+                'bank': rng.choice(banks),
+                'rate': Decimal(rng.randint(70, 95)).scaleb(-1),
+                'early_rate': Decimal('2.0'),
+                'duration': rng.choice([180, 360])
+            }
+
+        success, msg = backend.run_daily_close(current_date, inv_params)
+        
+        # --- PHASE C: INTEGRITY AUDIT ---
+        if (d + 1) % audit_every == 0:
+            recon = backend.check()
+            if recon['clean']:
+                integrity = "✅ OK"
+            else:
+                integrity = f"❌ FAIL ({len(recon['discrepancies'])} lots, fund diff ${recon['fund_diff']})"
+        else:
+            integrity = "✅ CLOSED" if success else f"❌ {msg}"
+        
+        # Log Progress
+        print(f"{d+1:<5} | {str(current_date):<12} | ${summary['total_deposit']:>9,.2f} | ${summary['total_withdrawal']:>9,.2f} | ${summary['net_flow']:>11,.2f} | {integrity}")
+
+    # Final Summary (nightly-style full scan)
+    final_recon, final_audit = backend.final()
+    elapsed = time.perf_counter() - started
+    reg = final_audit['registry']
+    print("-" * 100)
+    print(f"🏁 SIMULATION COMPLETE")
+    print(f"   Final Total Invested : ${reg['invested']:,.2f}")
+    print(f"   Final Idle Cash      : ${reg['idle']:,.2f}")
+    print(f"   Final Active Lots    : {len(final_audit['portfolios'])}")
+    print(f"   Active User Accounts : {len(set(u['uid'] for u in final_audit['users']))}")
+    print(f"   Full Reconciliation  : {'✅ CLEAN' if final_recon['clean'] else '❌ DISCREPANCY'}")
+    print(f"   Throughput           : {total_txs:,} transactions in {elapsed:,.1f}s ({total_txs / elapsed * 60:,.0f}/min)")
+    print("=" * 100 + "\n")
+
+def main(args):
+    try:
+        run_simulation(args.engine, args.days, args.users, args.txs, args.audit_every, args.seed)
+    except KeyboardInterrupt:
+        print("\nSimulation aborted.")
+    except Exception as e:
+        print(f"\nSimulation crashed: {e}")
@@ -0,0 +1,40 @@
+from tabulate import tabulate # You may need to: pip install tabulate
+import time
+
+from app.config import STRESS_PATHS, STRESS_WORKERS, STRESS_HORIZONS
+from app.core.stress import FundSnapshot, StressScenario, LiquidityStressEngine, PERCENTILES
+
+def run_stress(paths, workers, horizons, seed, scenario):
+    snapshot = FundSnapshot.from_database()
+    start = time.perf_counter()
+    report = LiquidityStressEngine(snapshot, scenario, paths=paths, workers=workers,
+                                   horizons=horizons, seed=seed).run()
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "="*80)
+    print(f"🌊 LIQUIDITY STRESS TEST | As Of: {report['as_of']} | Paths: {paths:,} | {elapsed:.2f}s")
+    print("="*80)
+    print(f"  Idle Cash          : ${report['idle_cash']:,.2f}")
+    print(f"  User Claims        : ${report['claims']:,.2f} ({report['holders']:,} holders)")
+    print(f"  Active Lots        : {len(snapshot.lots):,} across {len(snapshot.banks)} banks")
+
+    print("\n[A] LIQUIDITY SHORTFALL (WITHDRAWALS BEYOND IDLE CASH + DEPOSITS + MATURITIES)")
+    headers = ["Horizon", "P(Short)"] + [f"P{p}" for p in PERCENTILES] + ["P(Short) After Exit", "P99 After Exit"]
+    rows = [[f"{h}d", f"{v['shortfall_probability']:.2%}"] +
+            [f"${v['shortfall_percentiles'][p]:,.0f}" for p in PERCENTILES] +
+            [f"{v['residual_probability']:.2%}", f"${v['residual_percentiles'][99]:,.0f}"]
+            for h, v in report["horizons"].items()]
+    print(tabulate(rows, headers=headers, tablefmt="presto"))
+
+    print("\n[B] PER-BANK EXPOSURE (EARLY-EXIT DRAW TO COVER SHORTFALL)")
+    headers = ["Horizon", "Bank", "Principal", "Maturing", "Exit Mean", "Exit P95", "Exit P99"]
+    rows = [[f"{h}d", b["bank"], f"${b['principal']:,.2f}", f"${b['maturing']:,.2f}",
+             f"${b['exit_draw_mean']:,.0f}", f"${b['exit_draw_p95']:,.0f}", f"${b['exit_draw_p99']:,.0f}"]
+            for h, v in report["horizons"].items() for b in v["banks"]]
+    print(tabulate(rows, headers=headers, tablefmt="presto"))
+    print("="*80 + "\n")
+
+def main(args):
+    scenario = StressScenario(horizon_days=max(args.horizons), withdrawal_scale=args.withdrawal_scale,
+                              run_probability=args.run_probability, run_multiplier=args.run_multiplier)
+    run_stress(args.paths, args.workers, args.horizons, args.seed, scenario)
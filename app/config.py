@@ -17,10 +17,140 @@ PSYCOPG2_CONFIG = {
     "database": DB_NAME
 }
 
+# --- SHARDING ---
+# Comma-separated shard databases ("dbname" on DB_HOST, or "host/dbname").
+# Users are hash-partitioned across them: user_shares and pending_ledger live on
+# the user's shard, while portfolio, fund_registry and daily_reports stay on DB_NAME.
+# Empty = single database (DB_NAME is the only shard). A single entry naming another
+# database is still a sharded fund (one shard), closed with two-phase commit.
+SHARD_DATABASES = [s.strip() for s in os.getenv("SHARD_DATABASES", "").split(",") if s.strip()]
+
+def _shard_config(entry):
+    host, _, name = entry.rpartition("/")
+    return dict(PSYCOPG2_CONFIG, host=host or DB_HOST, database=name)
+
+SHARD_CONFIGS = [_shard_config(e) for e in SHARD_DATABASES] or [PSYCOPG2_CONFIG]
+
 # Maintenance config used to create/drop the main DB
 MAINTENANCE_CONFIG = {
     "host": DB_HOST,
     "user": DB_USER,
     "password": DB_PASS,
     "database": "postgres"
-}
\ No newline at end of file
+}
+
+# --- DASHBOARD RESPONSE CACHE ---
+# "memory" keeps serialized responses in-process; "redis" shares them across
+# workers through any Redis-compatible server at CACHE_REDIS_URL.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+
+# --- JSON SERIALIZATION ---
+# How Decimals leave the API: "number" emits exact fixed-point literals (123.45),
+# "string" emits them quoted ("123.45"). Neither path goes through float.
+JSON_DECIMAL_MODE = os.getenv("JSON_DECIMAL_MODE", "number")
+
+# --- INSTRUMENTATION ---
+# Phase timers, per-query stats and endpoint latency, scraped at /metrics.
+# "0" turns every recording call into an early return.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# --- QUERY PROFILING (opt-in) ---
+# Records every statement slower than SLOW_QUERY_MS with its EXPLAIN (ANALYZE, BUFFERS)
+# plan. ANALYZE re-runs the statement (inside a rolled-back savepoint for writes),
+# so keep this off in normal operation.
+QUERY_PROFILING = os.getenv("QUERY_PROFILING", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "logs/slow_queries.log")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+
+# --- LEDGER API INTAKE JOURNAL ---
+# Deposits/withdrawals are appended to a local SQLite WAL journal and answered
+# with 202 immediately; a background flusher drains them into pending_ledger.
+# Withdrawals get their ownership/balance check at flush time: a refused one lands in
+# the journal's dead_letter table instead of a synchronous 403.
+# INTAKE_SYNC: "FULL" fsyncs every append, "NORMAL" batches fsyncs at WAL checkpoints.
+INTAKE_JOURNAL_ENABLED = os.getenv("INTAKE_JOURNAL_ENABLED", "1") == "1"
+INTAKE_JOURNAL_PATH = os.getenv("INTAKE_JOURNAL_PATH", "journal/intake.sqlite3")
+INTAKE_SYNC = os.getenv("INTAKE_SYNC", "NORMAL")
+INTAKE_FLUSH_INTERVAL_MS = int(os.getenv("INTAKE_FLUSH_INTERVAL_MS", "50"))
+INTAKE_FLUSH_BATCH = int(os.getenv("INTAKE_FLUSH_BATCH", "500"))
+
+# --- LEDGER GROUP COMMIT ---
+# Concurrent queue_request calls in one process share a batcher that writes
+# every N rows or M milliseconds as one multi-row INSERT and one commit.
+LEDGER_GROUP_COMMIT = os.getenv("LEDGER_GROUP_COMMIT", "0") == "1"
+LEDGER_GROUP_COMMIT_MAX_ROWS = int(os.getenv("LEDGER_GROUP_COMMIT_MAX_ROWS", "256"))
+LEDGER_GROUP_COMMIT_WINDOW_MS = float(os.getenv("LEDGER_GROUP_COMMIT_WINDOW_MS", "2"))
+
+# --- PARALLEL DAILY CLOSE ---
+# CLOSE_WORKERS > 1 splits each shard's pending batch into user_id ranges and
+# closes them on a process pool, one connection per partition, committed together
+# with two-phase commit (needs max_prepared_transactions >= CLOSE_WORKERS + 1).
+# 1 = the serial engine.
+CLOSE_WORKERS = int(os.getenv("CLOSE_WORKERS", "1"))
+CLOSE_LOCK_TIMEOUT_MS = int(os.getenv("CLOSE_LOCK_TIMEOUT_MS", "10000"))
+
+# --- CHECKPOINTED CLOSE ---
+# 1 = on an unsharded fund the serial close commits each phase (withdrawals, accrual,
+# investment, report) separately and records it in close_runs: a failed close resumes
+# from the last durable phase, but between phases the fund is visibly part-way closed.
+# 0 (default) = one all-or-nothing transaction (a part-way checkpointed close is still resumed).
+CLOSE_CHECKPOINTS = os.getenv("CLOSE_CHECKPOINTS", "0") == "1"
+
+# --- READ REPLICA ---
+# libpq DSN of a streaming-replication standby of DB_NAME ("" = every read on the primary).
+# Dashboard/audit reads go there once its replay LSN has reached the primary's WAL
+# position (read-your-writes after a close); if it can't catch up within
+# REPLICA_MAX_WAIT_MS the read falls back to the primary. An unreachable replica is
+# skipped for REPLICA_RETRY_SECONDS. The primary's LSN is read over a shared pool of at
+# most REPLICA_PROBE_CONNECTIONS connections per process; requests waiting for one reuse
+# the LSN of a probe sent after they arrived.
+READ_REPLICA_DSN = os.getenv("READ_REPLICA_DSN", "")
+REPLICA_CONFIG = {"dsn": READ_REPLICA_DSN} if READ_REPLICA_DSN else None
+REPLICA_MAX_WAIT_MS = float(os.getenv("REPLICA_MAX_WAIT_MS", "50"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+REPLICA_PROBE_CONNECTIONS = max(1, int(os.getenv("REPLICA_PROBE_CONNECTIONS", "2")))
+
+# --- LIQUIDITY STRESS TEST ---
+# Monte Carlo paths per run, worker processes (0 = one per core) and reporting horizons in days.
+STRESS_PATHS = int(os.getenv("STRESS_PATHS", "10000"))
+STRESS_WORKERS = int(os.getenv("STRESS_WORKERS", "0"))
+STRESS_HORIZONS = [int(h) for h in os.getenv("STRESS_HORIZONS", "30,90,180").split(",") if h.strip()]
+
+# --- JOURNAL REBUILD ---
+# Worker processes for `python -m app rebuild` (0 = one per core). Each database's
+# ledger_events is split by lot id and by tx id, one replay partition per worker.
+REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", "0"))
+
+# --- RETENTION TIERS ---
+# daily_reports is partitioned by month. `python -m app maintain` (cron) creates the
+# next REPORT_PARTITIONS_AHEAD months and rolls every month that ended more than
+# REPORT_RETENTION_DAYS before the last close into daily_reports_monthly, dropping its
+# partition. Each step takes its locks with MAINTENANCE_LOCK_TIMEOUT_MS and is retried
+# on the next run if the close or a reader holds them, so it can run during business.
+REPORT_RETENTION_DAYS = int(os.getenv("REPORT_RETENTION_DAYS", "730"))
+REPORT_PARTITIONS_AHEAD = int(os.getenv("REPORT_PARTITIONS_AHEAD", "3"))
+MAINTENANCE_LOCK_TIMEOUT_MS = int(os.getenv("MAINTENANCE_LOCK_TIMEOUT_MS", "2000"))
+
+# --- LEDGER API RATE LIMITS ---
+# Every /api/ledger/* request spends a token from its client's bucket (refilled at
+# RATE_LIMIT_RPS, holding at most RATE_LIMIT_BURST) and holds one of RATE_LIMIT_MAX_IN_FLIGHT
+# slots while it runs; either one running out answers 429 with Retry-After. Clients are
+# told apart by RATE_LIMIT_CLIENT_HEADER, falling back to the remote address.
+# While a daily close runs, the rate and the slots are scaled by RATE_LIMIT_CLOSE_FACTOR.
+# RATE_LIMIT_STORE_PATH: a local SQLite file that shares buckets, in-flight slots and close
+# markers between the workers of one host ("" = per-process state: each worker gets its own
+# RATE_LIMIT_MAX_IN_FLIGHT slots and only closes run in this process count).
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "50"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "100"))
+RATE_LIMIT_MAX_IN_FLIGHT = int(os.getenv("RATE_LIMIT_MAX_IN_FLIGHT", "32"))
+RATE_LIMIT_CLOSE_FACTOR = float(os.getenv("RATE_LIMIT_CLOSE_FACTOR", "0.2"))
+RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER", "X-Client-Id")
+RATE_LIMIT_STORE_PATH = os.getenv("RATE_LIMIT_STORE_PATH", "")
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
@@ -1,53 +1,126 @@
-import psycopg2
 from decimal import Decimal
-import os
-import sys
+import heapq
 
-# Ensure config is accessible
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.config import PSYCOPG2_CONFIG
+from app.database.connection import get_connection
+from app.database.replica import read_connection
+from app.core.metrics import metrics
+from app.database.sharding import is_sharded, fan_out
+
+AUDIT_SECONDS = metrics.histogram("audit_fetch_seconds", "Full audit data fetch latency")
 
 class SystemAuditor:
-    def __init__(self):
+    """
+    Audit views over both retention tiers: live lots (portfolio) and the lots the close
+    archived once their principal reached zero (portfolio_archive, with their final accrual).
+    """
+    def __init__(self, use_replica=True):
         self.conn_params = PSYCOPG2_CONFIG
+        self.use_replica = use_replica
 
-    def get_full_audit_data(self):
-        """Fetches raw data for both CLI and API consumption."""
-        conn = psycopg2.connect(**self.conn_params)
+    USER_COLUMNS = ("uid", "bank", "pid", "amt", "rate")
+    PORTFOLIO_COLUMNS = ("id", "bank", "principal", "accrued", "start", "end")
+    REGISTRY_COLUMNS = ("idle", "invested", "last_close")
+    ARCHIVE_COLUMNS = ("id", "bank", "accrued", "start", "end", "archived_on")
+
+    def get_full_audit_rows(self):
+        """Raw cursor rows per section, in the *_COLUMNS order (for direct serialization)."""
+        conn = read_connection() if self.use_replica else get_connection(self.conn_params)
         try:
-            with conn.cursor() as cur:
+            with AUDIT_SECONDS.time(), conn.cursor() as cur:
                 # 1. User Ownership
+                if is_sharded():
+                    return self._sharded_rows(cur)
                 cur.execute("""
                     SELECT s.user_id, p.bank_name, p.id, s.principal_owned, p.annual_rate_m
                     FROM user_shares s
                     JOIN portfolio p ON s.portfolio_id = p.id
                     ORDER BY s.user_id ASC
                 """)
-                users = [{"uid": r[0], "bank": r[1], "pid": r[2], "amt": r[3], "rate": r[4]} for r in cur.fetchall()]
+                users = cur.fetchall()
 
-                # 2. Portfolios (Updated to include Dates)
-                cur.execute("""
-                    SELECT id, bank_name, principal, accrued_interest, purchase_date, maturity_date 
-                    FROM portfolio
-                """)
-                ports = [{
-                    "id": r[0], 
-                    "bank": r[1], 
-                    "principal": r[2], 
-                    "accrued": r[3],
-                    "start": str(r[4]), 
-                    "end": str(r[5])
-                } for r in cur.fetchall()]
-
-                # 3. Registry
-                cur.execute("SELECT total_idle_cash, total_invested, last_close_date FROM fund_registry")
-                reg_raw = cur.fetchone()
-                registry = {
-                    "idle": reg_raw[0],
-                    "invested": reg_raw[1],
-                    "last_close": str(reg_raw[2])
-                }
-
-                return {"users": users, "portfolios": ports, "registry": registry}
+                ports, registry, archived = self._fund_rows(cur)
+                return users, ports, registry, archived
+        finally:
+            conn.close()
+
+    def _fund_rows(self, cur):
+        # 2. Portfolios (Updated to include Dates)
+        cur.execute("""
+            SELECT id, bank_name, principal, accrued_interest, purchase_date::text, maturity_date::text 
+            FROM portfolio
+        """)
+        ports = cur.fetchall()
+
+        # 3. Registry
+        cur.execute("SELECT total_idle_cash, total_invested, COALESCE(last_close_date::text, 'None') FROM fund_registry")
+        registry = cur.fetchone()
+
+        # 4. Archived lots (principal zero, kept for their history)
+        cur.execute("""
+            SELECT id, bank_name, accrued_interest, purchase_date::text, maturity_date::text, archived_on::text
+            FROM portfolio_archive ORDER BY id
+        """)
+        archived = cur.fetchall()
+        return ports, registry, archived
+
+    def _sharded_rows(self, cur):
+        """User rows come from every shard (merged by user_id); bank and rate join from the primary."""
+        ports, registry, archived = self._fund_rows(cur)
+        cur.execute("SELECT id, annual_rate_m FROM portfolio")
+        rates = dict(cur.fetchall())
+        banks = {p[0]: p[1] for p in ports}
+
+        def fetch(shard, conn):
+            with conn.cursor() as shard_cur:
+                shard_cur.execute("SELECT user_id, portfolio_id, principal_owned FROM user_shares ORDER BY user_id, portfolio_id")
+                return shard_cur.fetchall()
+
+        users = [(uid, banks[pid], pid, amt, rates[pid])
+                 for uid, pid, amt in heapq.merge(*fan_out(fetch, read_only=self.use_replica), key=lambda r: (r[0], r[1]))
+                 if pid in banks]
+        return users, ports, registry, archived
+
+    def get_summary(self):
+        """Section C of the audit from aggregates: claims count only shares in lots that still exist."""
+        conn = read_connection() if self.use_replica else get_connection(self.conn_params)
+        try:
+            with AUDIT_SECONDS.time(), conn.cursor() as cur:
+                cur.execute("SELECT total_idle_cash, total_invested, COALESCE(last_close_date::text, 'None') FROM fund_registry")
+                idle, invested, last_close = cur.fetchone()
+                cur.execute("SELECT id, principal FROM portfolio")
+                lots = dict(cur.fetchall())
+                cur.execute("SELECT COUNT(*), COALESCE(SUM(accrued_interest), 0) FROM portfolio_archive")
+                archived_lots, archived_accrued = cur.fetchone()
+
+                def owned(shard, shard_conn):
+                    with shard_conn.cursor() as shard_cur:
+                        shard_cur.execute("SELECT portfolio_id, SUM(principal_owned) FROM user_shares GROUP BY portfolio_id")
+                        return shard_cur.fetchall()
+
+                if is_sharded():
+                    parts = fan_out(owned, read_only=self.use_replica)
+                else:
+                    parts = [owned(0, conn)]
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+        return {
+            "idle": idle,
+            "invested": invested,
+            "last_close": last_close,
+            "lots": len(lots),
+            "bank_assets": sum(lots.values(), Decimal(0)),
+            "claims": sum((amt for part in parts for pid, amt in part if pid in lots), Decimal(0)),
+            "archived_lots": archived_lots,
+            "archived_accrued": archived_accrued
+        }
+
+    def get_full_audit_data(self):
+        """Fetches raw data for both CLI and API consumption."""
+        users, ports, registry, archived = self.get_full_audit_rows()
+        return {
+            "users": [dict(zip(self.USER_COLUMNS, r)) for r in users],
+            "portfolios": [dict(zip(self.PORTFOLIO_COLUMNS, r)) for r in ports],
+            "registry": dict(zip(self.REGISTRY_COLUMNS, registry)),
+            "archived": [dict(zip(self.ARCHIVE_COLUMNS, r)) for r in archived]
+        }
@@ -0,0 +1,231 @@
+from datetime import timedelta
+import time
+
+from psycopg2.extras import execute_values, Json
+from app.core.generation import bump_generation
+from app.core import ledger_events, exposure
+from app.core.ledger_events import event, WITHDRAWAL_APPLIED, LOT_WITHDRAWAL, DEPOSIT_ALLOCATED
+from app.core.money import from_cents, to_rate
+from app.core.close_runs import STARTED, PHASES, normalize_params
+from app.core.daily_engine import (CLOSE_SECONDS, CLOSE_PHASE, CLOSE_RUNS, CLOSE_ERRORS,
+                                   CLOSE_PENDING_ROWS)
+
+class CheckpointedDailyClose:
+    """
+    run_daily_close as one committed transaction per phase (withdrawals, accrual,
+    investment, report) on an unsharded fund; same results as the single-transaction close.
+    Each phase locks the registry, checks close_runs is still at the phase before it,
+    does its work, then advances close_runs in the same commit. A failed close is
+    resumed by the next call for that date from the last durable phase; params given
+    to a resume replace the stored ones until the investment phase has committed,
+    otherwise the first attempt's are used. A finished close returns success.
+    Investment params are validated before anything commits.
+    Between phases the registry totals already match the lots; last_close_date and
+    the daily report only move in the report phase.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+
+    def run(self, close_date, new_inv_params=None):
+        conn = self.engine.get_connection()
+        started = time.perf_counter()
+        phase = "guard"
+        try:
+            with CLOSE_PHASE.time(phase):
+                begun = self._begin(conn, close_date, new_inv_params)
+            if isinstance(begun[0], bool):
+                return begun
+            done, inv_params = begun
+            resumed = done != STARTED
+
+            rows = 0
+            for phase in PHASES[PHASES.index(done) + 1 if resumed else 0:]:
+                with CLOSE_PHASE.time(phase):
+                    rows += self._step(conn, close_date, phase, inv_params)
+            CLOSE_PENDING_ROWS.observe(rows)
+
+            bump_generation(conn)
+            CLOSE_RUNS.inc("resumed" if resumed else "success")
+            return True, f"Day {close_date} successfully closed." + (f" (resumed after {done})" if resumed else "")
+        except Exception as e:
+            CLOSE_RUNS.inc("error")
+            CLOSE_ERRORS.inc(phase)
+            return False, str(e)
+        finally:
+            CLOSE_SECONDS.observe(time.perf_counter() - started)
+            conn.close()
+
+    def _begin(self, conn, close_date, new_inv_params):
+        """Timeline guard. Returns (ok, message) to stop, or (last durable phase, investment params) to run."""
+        try:
+            new_inv_params = normalize_params(close_date, new_inv_params)
+        except ValueError as e:
+            CLOSE_RUNS.inc("rejected")
+            return False, str(e)
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT last_close_date FROM fund_registry FOR UPDATE")
+                last_date = cur.fetchone()[0]
+                cur.execute("SELECT phase, inv_params, completed_at FROM close_runs WHERE close_date = %s FOR UPDATE",
+                            (close_date,))
+                run = cur.fetchone()
+
+                if run and run[2]:
+                    CLOSE_RUNS.inc("replayed")
+                    return True, f"Day {close_date} already closed."
+                if run:
+                    done, inv_params = run[0], run[1]
+                    if done == STARTED or PHASES.index(done) < PHASES.index("investment"):
+                        try:
+                            inv_params = new_inv_params or normalize_params(close_date, inv_params)
+                        except ValueError as e:
+                            CLOSE_RUNS.inc("rejected")
+                            return False, f"Stored investment params of the unfinished close are invalid ({e}); retry with corrected ones."
+                    cur.execute("""
+                        UPDATE close_runs SET attempts = attempts + 1, inv_params = %s, updated_at = CURRENT_TIMESTAMP
+                        WHERE close_date = %s
+                    """, (Json(inv_params), close_date))
+                    return done, inv_params
+
+                if last_date:
+                    # Prevent duplicate or past dates
+                    if close_date <= last_date:
+                        CLOSE_RUNS.inc("rejected")
+                        return False, f"Date {close_date} is already closed."
+                    # Prevent Calendar Gaps (e.g., jumping from Day 1 to Day 5)
+                    if close_date > last_date + timedelta(days=1):
+                        CLOSE_RUNS.inc("rejected")
+                        return False, f"Gap detected. Next expected date: {last_date + timedelta(days=1)}"
+
+                cur.execute("INSERT INTO close_runs (close_date, phase, inv_params) VALUES (%s, %s, %s)",
+                            (close_date, STARTED, Json(new_inv_params)))
+                return STARTED, new_inv_params
+
+    def _step(self, conn, close_date, phase, inv_params):
+        """One phase in its own transaction; returns the pending rows it completed."""
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT (total_idle_cash * 100)::bigint, (total_invested * 100)::bigint
+                    FROM fund_registry FOR UPDATE
+                """)
+                idle_cash, invested = cur.fetchone()
+                cur.execute("SELECT phase, deposit_cents, withdrawal_cents FROM close_runs WHERE close_date = %s FOR UPDATE",
+                            (close_date,))
+                done, total_dep, total_wit = cur.fetchone()
+                if done != (PHASES[PHASES.index(phase) - 1] if phase != PHASES[0] else STARTED):
+                    return 0 # A concurrent retry already committed this phase
+
+                rows = 0
+                if phase == "withdrawals":
+                    rows, total_wit = self._withdrawals(cur, close_date)
+                    idle_cash -= total_wit
+                    invested -= total_wit
+                elif phase == "accrual":
+                    ledger_events.accrue(cur, close_date)
+                elif phase == "investment":
+                    rows, total_dep, lot_principal = self._investment(cur, close_date, inv_params)
+                    idle_cash += total_dep - lot_principal
+                    invested += lot_principal
+                else:
+                    report = (close_date, from_cents(total_dep), from_cents(total_wit),
+                              from_cents(idle_cash), from_cents(invested))
+                    cur.execute("""
+                        INSERT INTO daily_reports (report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, report)
+                    cur.execute("UPDATE fund_registry SET last_close_date = %s", (close_date,))
+                    ledger_events.record(cur, [ledger_events.day_closed(*report)])
+                    ledger_events.delete_zeroed_lots(cur, close_date) # Cleanup zeroed lots
+
+                cur.execute("UPDATE fund_registry SET total_idle_cash = %s, total_invested = %s",
+                            (from_cents(idle_cash), from_cents(invested)))
+                cur.execute("""
+                    UPDATE close_runs
+                    SET phase = %s, deposit_cents = %s, withdrawal_cents = %s, updated_at = CURRENT_TIMESTAMP,
+                        completed_at = CASE WHEN %s THEN CURRENT_TIMESTAMP END
+                    WHERE close_date = %s
+                """, (phase, total_dep, total_wit, phase == PHASES[-1], close_date))
+                return rows
+
+    def _withdrawals(self, cur, close_date):
+        """Applies and completes every PENDING withdrawal; returns (rows, total cents)."""
+        # FOR UPDATE: a cancel or amendment waits, then finds the row no longer PENDING
+        cur.execute("""
+            SELECT id, user_id, amount_cents, portfolio_id FROM pending_ledger
+            WHERE status = 'PENDING' AND type = 'WITHDRAWAL' ORDER BY id FOR UPDATE
+        """)
+        pending = cur.fetchall()
+        if not pending:
+            return 0, 0
+
+        per_share = {}
+        per_lot = {}
+        for _, user_id, amount, port_id in pending:
+            per_share[(user_id, port_id)] = per_share.get((user_id, port_id), 0) + amount
+            per_lot[port_id] = per_lot.get(port_id, 0) + amount
+
+        execute_values(cur, """
+            UPDATE user_shares s SET principal_owned = s.principal_owned - v.amount
+            FROM (VALUES %s) AS v(user_id, portfolio_id, amount)
+            WHERE s.user_id = v.user_id AND s.portfolio_id = v.portfolio_id
+        """, [(u, p, from_cents(a)) for (u, p), a in per_share.items()], template="(%s, %s::int, %s::numeric)")
+        for port_id, amount in per_lot.items():
+            cur.execute("UPDATE portfolio SET principal = principal - %s WHERE id = %s", (from_cents(amount), port_id))
+            self.engine._touch_lot(cur, port_id, -from_cents(amount))
+
+        ledger_events.record(cur, [event(WITHDRAWAL_APPLIED, close_date, tx_id, user_id, port_id, from_cents(amount))
+                                   for tx_id, user_id, amount, port_id in pending] +
+                                  [event(LOT_WITHDRAWAL, close_date, portfolio_id=p, amount=from_cents(a))
+                                   for p, a in per_lot.items()])
+        exposure.withdraw(cur, per_lot)
+        ledger_events.settle(cur, close_date, [r[0] for r in pending])
+        return len(pending), sum(per_lot.values())
+
+    def _investment(self, cur, close_date, inv_params):
+        """
+        Completes every PENDING deposit and, with investment params, buys one lot with them.
+        Returns (rows, deposited cents, cents moved into the new lot).
+        """
+        cur.execute("""
+            SELECT id, user_id, amount_cents FROM pending_ledger
+            WHERE status = 'PENDING' AND type <> 'WITHDRAWAL' ORDER BY id FOR UPDATE
+        """)
+        pending = cur.fetchall()
+        total_dep = sum(r[2] for r in pending)
+        if not pending:
+            return 0, 0, 0
+
+        lot_principal = 0
+        if inv_params and total_dep > 0:
+            # Arguments: bank, rate (yield), early_rate (exit), duration (tenor)
+            bank = inv_params.get('bank')
+            rate = to_rate(inv_params.get('rate'))
+            exit_rate = to_rate(inv_params.get('early_rate'))
+            m_date = close_date + timedelta(days=int(inv_params.get('duration')))
+            cur.execute("""
+                INSERT INTO portfolio (bank_name, principal, annual_rate_m, annual_rate_n, purchase_date, maturity_date)
+                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+            """, (bank, from_cents(total_dep), rate, exit_rate, close_date, m_date))
+            new_port_id = cur.fetchone()[0]
+            self.engine._touch_lot(cur, new_port_id, from_cents(total_dep))
+            exposure.lot_opened(cur, new_port_id)
+
+            # Map Depositing Users to the new Lot
+            per_user = {}
+            for _, user_id, amount in pending:
+                per_user[user_id] = per_user.get(user_id, 0) + amount
+            execute_values(cur, """
+                INSERT INTO user_shares (user_id, portfolio_id, principal_owned)
+                VALUES %s
+                ON CONFLICT (user_id, portfolio_id) DO UPDATE
+                SET principal_owned = user_shares.principal_owned + EXCLUDED.principal_owned
+            """, [(u, new_port_id, from_cents(a)) for u, a in per_user.items()])
+            ledger_events.record(cur, [ledger_events.lot_created(close_date, new_port_id, bank, from_cents(total_dep),
+                                                                 rate, exit_rate, m_date)] +
+                                      [event(DEPOSIT_ALLOCATED, close_date, tx_id, user_id, new_port_id, from_cents(amount))
+                                       for tx_id, user_id, amount in pending])
+            lot_principal = total_dep
+
+        ledger_events.settle(cur, close_date, [r[0] for r in pending])
+        return len(pending), total_dep, lot_principal
@@ -0,0 +1,72 @@
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from psycopg2.extras import Json
+from app.core.money import to_rate
+
+# Progress of each daily close (close_runs, one row per date). The checkpointed close
+# (checkpointed_close.py) advances `phase` in the same commit as the phase's work;
+# the single-transaction closes write the finished row in their own commit.
+
+# close_runs.phase is the last phase whose transaction committed ('started' = none yet)
+STARTED = "started"
+PHASES = ("withdrawals", "accrual", "investment", "report")
+
+def params_json(inv_params):
+    """Investment params as stored in close_runs.inv_params (a resumed close reuses them)."""
+    return {k: str(v) for k, v in inv_params.items()} if inv_params else None
+
+BANK_NAME_MAX_LENGTH = 255 # portfolio.bank_name VARCHAR(255)
+RATE_LIMIT = Decimal(10) ** 5 # DECIMAL(10, 5) holds rates below this
+
+def normalize_params(close_date, inv_params):
+    """
+    Checks investment params against the portfolio columns before a checkpointed close
+    commits anything, and returns them as close_runs.inv_params stores them.
+    Raises ValueError: a bad value would otherwise only fail the investment phase,
+    after the withdrawals and accrual are already durable.
+    """
+    if not inv_params:
+        return None
+    bank = str(inv_params.get('bank') or '').strip()
+    if not bank or len(bank) > BANK_NAME_MAX_LENGTH:
+        raise ValueError(f"Investment bank must be 1-{BANK_NAME_MAX_LENGTH} characters.")
+
+    params = {'bank': bank}
+    for key in ('rate', 'early_rate'):
+        try:
+            rate = to_rate(inv_params.get(key))
+        except (InvalidOperation, ValueError, TypeError):
+            raise ValueError(f"Investment {key} must be a number.")
+        if not (rate.is_finite() and 0 <= rate < RATE_LIMIT):
+            raise ValueError(f"Investment {key} must be between 0 and {RATE_LIMIT}.")
+        params[key] = str(rate)
+
+    try:
+        duration = int(str(inv_params.get('duration')))
+        close_date + timedelta(days=duration)
+    except (ValueError, TypeError, OverflowError):
+        duration = 0
+    if duration <= 0:
+        raise ValueError("Investment duration must be a positive number of days.")
+    params['duration'] = str(duration)
+    return params
+
+def completed_run(cur, close_date):
+    """True when close_runs holds a finished close for this date (a retry is a no-op)."""
+    cur.execute("SELECT completed_at IS NOT NULL FROM close_runs WHERE close_date = %s", (close_date,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+def unfinished_run(cur):
+    """Date of a checkpointed close that stopped part-way, if any (at most one: the next date)."""
+    cur.execute("SELECT close_date FROM close_runs WHERE completed_at IS NULL")
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def record_completed(cur, close_date, inv_params, deposits, withdrawals):
+    """Written by the all-or-nothing closes inside their own transaction, so retries are idempotent there too."""
+    cur.execute("""
+        INSERT INTO close_runs (close_date, phase, inv_params, deposit_cents, withdrawal_cents, completed_at)
+        VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+    """, (close_date, PHASES[-1], Json(params_json(inv_params)), deposits, withdrawals))
@@ -1,12 +1,23 @@
-import psycopg2
 from datetime import datetime, timedelta, date
-from decimal import Decimal
-import os
-import sys
+import time
 
-# Ensure config is accessible
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from app.config import PSYCOPG2_CONFIG
+from app.config import PSYCOPG2_CONFIG, CLOSE_WORKERS, CLOSE_CHECKPOINTS
+from app.database.connection import get_connection
+from app.core.generation import bump_generation
+from app.core import ledger_events, exposure
+from app.core.ledger_events import event, WITHDRAWAL_APPLIED, LOT_WITHDRAWAL, DEPOSIT_ALLOCATED
+from app.core.metrics import metrics
+from app.core.money import from_cents, to_rate
+from app.core.close_runs import completed_run, unfinished_run, record_completed
+from app.core.ingest_limits import close_in_progress
+from app.database.sharding import is_sharded
+
+CLOSE_SECONDS = metrics.histogram("ledger_close_seconds", "End-to-end run_daily_close latency")
+CLOSE_PHASE = metrics.histogram("ledger_close_phase_seconds", "Time spent in each daily close phase", ("phase",))
+CLOSE_RUNS = metrics.counter("ledger_close_runs_total", "Daily close attempts by outcome", ("outcome",))
+CLOSE_ERRORS = metrics.counter("ledger_close_errors_total", "Daily close failures by the phase that raised", ("phase",))
+CLOSE_PENDING_ROWS = metrics.histogram("ledger_close_pending_rows", "Pending ledger rows processed per close",
+                                       buckets=(10, 100, 1000, 10000, 100000, 1000000))
 
 class DailyEngine:
     """
@@ -14,100 +25,208 @@ class DailyEngine:
     1. Timeline Locking: Prevents duplicate dates and calendar gaps.
     2. Mandatory 4-Pillar Portfolios: Bank, Yield, Exit, and Tenor.
     3. Atomic Reconciliation: Ensures User Claims == Bank Assets.
+    4. Event Journal: every change is appended to ledger_events in the same transaction.
+    5. Checkpoints: with CLOSE_CHECKPOINTS each phase commits on its own (checkpointed_close.py).
+    6. Back-pressure: while it runs, the ledger API admits intake at its close-time limits.
+    Amounts are aggregated as integer cents (money.py) and only become Decimal as SQL parameters.
     """
-    def __init__(self):
+    def __init__(self, workers=CLOSE_WORKERS):
         self.conn_params = PSYCOPG2_CONFIG
+        self.workers = workers
 
     def get_connection(self):
-        return psycopg2.connect(**self.conn_params)
+        return get_connection(self.conn_params)
+
+    def _touch_lot(self, cur, portfolio_id, delta):
+        """Applies a share delta to the lot's running total and flags it for reconciliation."""
+        cur.execute("""
+            INSERT INTO lot_share_totals (portfolio_id, shares_total)
+            VALUES (%s, %s)
+            ON CONFLICT (portfolio_id) DO UPDATE
+            SET shares_total = lot_share_totals.shares_total + EXCLUDED.shares_total,
+                dirty = TRUE,
+                touched_at = CURRENT_TIMESTAMP
+        """, (portfolio_id, delta))
+
+    def _unfinished_run(self):
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cur:
+                return unfinished_run(cur)
+        finally:
+            conn.close()
 
     def run_daily_close(self, close_date, new_inv_params=None):
+        # The ledger API runs on its close-time limits until this returns
+        with close_in_progress():
+            return self._run_daily_close(close_date, new_inv_params)
+
+    def _run_daily_close(self, close_date, new_inv_params):
+        if not is_sharded() and ((CLOSE_CHECKPOINTS and self.workers <= 1) or self._unfinished_run()):
+            # One commit per phase; a checkpointed close that stopped part-way is always resumed this way
+            from app.core.checkpointed_close import CheckpointedDailyClose
+            return CheckpointedDailyClose(self).run(close_date, new_inv_params)
+        if self.workers > 1 or is_sharded():
+            return self._run_two_phase_close(close_date, new_inv_params)
+
         conn = self.get_connection()
+        started = time.perf_counter()
+        phase = "guard"
         try:
             with conn:
                 with conn.cursor() as cur:
                     # 1. Timeline Guard (Meticulous Check)
-                    cur.execute("SELECT total_idle_cash, total_invested, last_close_date FROM fund_registry FOR UPDATE")
-                    reg = cur.fetchone()
-                    idle_cash, invested, last_date = reg
+                    phase = "guard"
+                    with CLOSE_PHASE.time(phase):
+                        cur.execute("""
+                            SELECT (total_idle_cash * 100)::bigint, (total_invested * 100)::bigint, last_close_date
+                            FROM fund_registry FOR UPDATE
+                        """)
+                        idle_cash, invested, last_date = cur.fetchone()
 
                     if last_date:
-                        # Prevent duplicate or past dates
+                        # Prevent duplicate or past dates (a retry of a finished close is a no-op)
+                        if close_date <= last_date and completed_run(cur, close_date):
+                            CLOSE_RUNS.inc("replayed")
+                            return True, f"Day {close_date} already closed."
                         if close_date <= last_date:
+                            CLOSE_RUNS.inc("rejected")
                             return False, f"Date {close_date} is already closed."
                         
                         # FIX: Prevent Calendar Gaps (e.g., jumping from Day 1 to Day 5)
                         if close_date > last_date + timedelta(days=1):
+                            CLOSE_RUNS.inc("rejected")
                             return False, f"Gap detected. Next expected date: {last_date + timedelta(days=1)}"
 
                     # 2. Process Pending Ledger Queue
-                    cur.execute("SELECT user_id, type, amount, portfolio_id FROM pending_ledger WHERE status = 'PENDING'")
-                    pending_txs = cur.fetchall()
+                    phase = "load_pending"
+                    with CLOSE_PHASE.time(phase):
+                        cur.execute("SELECT id, user_id, type, amount_cents, portfolio_id FROM pending_ledger WHERE status = 'PENDING'")
+                        pending_txs = cur.fetchall()
+                    CLOSE_PENDING_ROWS.observe(len(pending_txs))
                     
-                    total_dep = Decimal('0')
-                    total_wit = Decimal('0')
+                    total_dep = 0
+                    total_wit = 0
 
                     # 3. Handle Withdrawals (Asset Reduction)
-                    for user_id, tx_type, amount, port_id in pending_txs:
-                        if tx_type == 'WITHDRAWAL':
-                            total_wit += amount
-                            # Atomic reduction of user share and bank principal
-                            cur.execute("""
-                                UPDATE user_shares SET principal_owned = principal_owned - %s 
-                                WHERE user_id = %s AND portfolio_id = %s
-                            """, (amount, user_id, port_id))
-                            cur.execute("UPDATE portfolio SET principal = principal - %s WHERE id = %s", (amount, port_id))
-                            invested -= amount
-                        else:
-                            total_dep += amount
+                    phase = "withdrawals"
+                    with CLOSE_PHASE.time(phase):
+                        events = []
+                        per_lot = {}
+                        for tx_id, user_id, tx_type, amount, port_id in pending_txs:
+                            if tx_type == 'WITHDRAWAL':
+                                total_wit += amount
+                                value = from_cents(amount)
+                                # Atomic reduction of user share and bank principal
+                                cur.execute("""
+                                    UPDATE user_shares SET principal_owned = principal_owned - %s 
+                                    WHERE user_id = %s AND portfolio_id = %s
+                                """, (value, user_id, port_id))
+                                cur.execute("UPDATE portfolio SET principal = principal - %s WHERE id = %s", (value, port_id))
+                                self._touch_lot(cur, port_id, -value)
+                                invested -= amount
+                                events.append(event(WITHDRAWAL_APPLIED, close_date, tx_id, user_id, port_id, value))
+                                per_lot[port_id] = per_lot.get(port_id, 0) + amount
+                            else:
+                                total_dep += amount
+                        events += [event(LOT_WITHDRAWAL, close_date, portfolio_id=p, amount=from_cents(a))
+                                   for p, a in per_lot.items()]
+                        ledger_events.record(cur, events)
+                        exposure.withdraw(cur, per_lot)
 
                     # 4. Accrue Interest (Daily)
-                    cur.execute("UPDATE portfolio SET accrued_interest = accrued_interest + (principal * (annual_rate_m / 100 / 365)) WHERE status = 'ACTIVE'")
+                    phase = "accrual"
+                    with CLOSE_PHASE.time(phase):
+                        ledger_events.accrue(cur, close_date)
 
                     # 5. Handle New Investment (Mandatory 4 Pillars)
                     current_idle = idle_cash + total_dep - total_wit
                     current_invested = invested
 
                     if new_inv_params and total_dep > 0:
-                        # Arguments: bank, rate (yield), early_rate (exit), duration (tenor)
-                        bank = new_inv_params.get('bank')
-                        rate = Decimal(str(new_inv_params.get('rate')))
-                        exit_rate = Decimal(str(new_inv_params.get('early_rate')))
-                        tenor = int(new_inv_params.get('duration'))
-                        
-                        m_date = close_date + timedelta(days=tenor)
+                        phase = "investment"
+                        with CLOSE_PHASE.time(phase):
+                            # Arguments: bank, rate (yield), early_rate (exit), duration (tenor)
+                            bank = new_inv_params.get('bank')
+                            rate = to_rate(new_inv_params.get('rate'))
+                            exit_rate = to_rate(new_inv_params.get('early_rate'))
+                            tenor = int(new_inv_params.get('duration'))
+                            
+                            m_date = close_date + timedelta(days=tenor)
 
-                        cur.execute("""
-                            INSERT INTO portfolio (bank_name, principal, annual_rate_m, annual_rate_n, purchase_date, maturity_date)
-                            VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
-                        """, (bank, total_dep, rate, exit_rate, close_date, m_date))
-                        new_port_id = cur.fetchone()[0]
+                            cur.execute("""
+                                INSERT INTO portfolio (bank_name, principal, annual_rate_m, annual_rate_n, purchase_date, maturity_date)
+                                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+                            """, (bank, from_cents(total_dep), rate, exit_rate, close_date, m_date))
+                            new_port_id = cur.fetchone()[0]
+                            self._touch_lot(cur, new_port_id, from_cents(total_dep))
+                            exposure.lot_opened(cur, new_port_id)
 
-                        current_idle -= total_dep
-                        current_invested += total_dep
+                            current_idle -= total_dep
+                            current_invested += total_dep
 
                         # Map Depositing Users to the new Lot
-                        for user_id, tx_type, amt, _ in pending_txs:
-                            if tx_type == 'DEPOSIT':
-                                cur.execute("""
-                                    INSERT INTO user_shares (user_id, portfolio_id, principal_owned)
-                                    VALUES (%s, %s, %s)
-                                    ON CONFLICT (user_id, portfolio_id) DO UPDATE 
-                                    SET principal_owned = user_shares.principal_owned + EXCLUDED.principal_owned
-                                """, (user_id, new_port_id, amt))
+                        phase = "share_mapping"
+                        with CLOSE_PHASE.time(phase):
+                            events = [ledger_events.lot_created(close_date, new_port_id, bank, from_cents(total_dep),
+                                                                rate, exit_rate, m_date)]
+                            for tx_id, user_id, tx_type, amt, _ in pending_txs:
+                                if tx_type == 'DEPOSIT':
+                                    cur.execute("""
+                                        INSERT INTO user_shares (user_id, portfolio_id, principal_owned)
+                                        VALUES (%s, %s, %s)
+                                        ON CONFLICT (user_id, portfolio_id) DO UPDATE 
+                                        SET principal_owned = user_shares.principal_owned + EXCLUDED.principal_owned
+                                    """, (user_id, new_port_id, from_cents(amt)))
+                                    events.append(event(DEPOSIT_ALLOCATED, close_date, tx_id, user_id, new_port_id, from_cents(amt)))
+                            ledger_events.record(cur, events)
 
                     # 6. Final Sync & Audit Report
-                    cur.execute("""
-                        INSERT INTO daily_reports (report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close) 
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (close_date, total_dep, total_wit, current_idle, current_invested))
-                    
-                    cur.execute("UPDATE fund_registry SET total_idle_cash = %s, total_invested = %s, last_close_date = %s", (current_idle, current_invested, close_date))
-                    cur.execute("UPDATE pending_ledger SET status = 'COMPLETED' WHERE status = 'PENDING'")
-                    cur.execute("DELETE FROM portfolio WHERE principal <= 0") # Cleanup zeroed lots
-                    
+                    phase = "report"
+                    with CLOSE_PHASE.time(phase):
+                        report = (close_date, from_cents(total_dep), from_cents(total_wit),
+                                  from_cents(current_idle), from_cents(current_invested))
+                        cur.execute("""
+                            INSERT INTO daily_reports (report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close) 
+                            VALUES (%s, %s, %s, %s, %s)
+                        """, report)
+                        
+                        cur.execute("UPDATE fund_registry SET total_idle_cash = %s, total_invested = %s, last_close_date = %s", (report[3], report[4], close_date))
+                        ledger_events.record(cur, [ledger_events.day_closed(*report)])
+                        ledger_events.settle(cur, close_date)
+                        record_completed(cur, close_date, new_inv_params, total_dep, total_wit)
+
+                    phase = "cleanup"
+                    with CLOSE_PHASE.time(phase):
+                        ledger_events.delete_zeroed_lots(cur, close_date) # Cleanup zeroed lots
+
+                # Commit explicitly so its cost shows up as its own phase
+                phase = "commit"
+                with CLOSE_PHASE.time(phase):
+                    conn.commit()
+
+            bump_generation(conn)
+            CLOSE_RUNS.inc("success")
             return True, f"Day {close_date} successfully closed."
         except Exception as e:
+            CLOSE_RUNS.inc("error")
+            CLOSE_ERRORS.inc(phase)
             return False, str(e)
         finally:
-            conn.close()
\ No newline at end of file
+            CLOSE_SECONDS.observe(time.perf_counter() - started)
+            conn.close()
+
+    def _run_two_phase_close(self, close_date, new_inv_params):
+        from app.core.sharded_close import ShardedDailyClose, coordinator_lock, resolve_in_doubt
+        with coordinator_lock():
+            # Branches a crashed coordinator left prepared still hold the fund_registry row lock
+            try:
+                resolve_in_doubt(locked=True)
+            except Exception as e:
+                return False, f"Could not resolve in-doubt close transactions: {e}"
+            if self.workers > 1:
+                # Partitions on a process pool, committed together with two-phase commit
+                from app.core.parallel_close import ParallelDailyClose
+                return ParallelDailyClose(self, self.workers).run(close_date, new_inv_params)
+            # User tables live on the shards: coordinate the close with two-phase commit
+            return ShardedDailyClose(self).run(close_date, new_inv_params)
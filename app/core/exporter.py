@@ -0,0 +1,262 @@
+import pyarrow as pa # You may need to: pip install pyarrow
+import pyarrow.parquet as pq
+from datetime import datetime
+from itertools import chain, islice
+import heapq
+import json
+import os
+import shutil
+
+from app.config import PSYCOPG2_CONFIG
+from app.database.connection import get_connection
+from app.database.sharding import SHARD_COUNT, is_sharded, shard_connection, shard_for_tx
+
+MONEY = pa.decimal128(20, 2)
+RATE = pa.decimal128(10, 5)
+
+# Column layouts mirror app/database/schema.py; decimals stay exact (no float round-trip)
+SCHEMAS = {
+    "daily_reports": pa.schema([
+        ("report_date", pa.date32()),
+        ("daily_deposit", MONEY),
+        ("daily_withdrawal", MONEY),
+        ("idle_cash_at_close", MONEY),
+        ("invested_at_close", MONEY),
+    ]),
+    "ledger": pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.string()),
+        ("type", pa.string()),
+        ("amount", MONEY),
+        ("portfolio_id", pa.int64()),
+        ("created_at", pa.timestamp("us")),
+    ]),
+    "portfolio": pa.schema([
+        ("id", pa.int64()),
+        ("bank_name", pa.string()),
+        ("principal", MONEY),
+        ("accrued_interest", MONEY),
+        ("annual_rate_m", RATE),
+        ("annual_rate_n", RATE),
+        ("purchase_date", pa.date32()),
+        ("maturity_date", pa.date32()),
+        ("status", pa.string()),
+    ]),
+    "user_shares": pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.string()),
+        ("portfolio_id", pa.int64()),
+        ("principal_owned", MONEY),
+    ]),
+}
+
+class ColumnarExporter:
+    """
+    Streams fund history and positions into date-partitioned columnar files.
+    1. History (daily_reports, completed ledger): appended incrementally past a watermark.
+    2. Positions (portfolio, user_shares): one snapshot per close date.
+    Rows are pulled through server-side cursors in fixed-size batches, so memory
+    stays bounded regardless of table size.
+    Sharded: the ledger and user_shares are read from every shard (the ledger merged in
+    date/id order, with one watermark per shard); fund tables come from the primary.
+    """
+    STATE_FILE = "_export_state.json"
+
+    def __init__(self, out_dir, fmt="parquet", batch_size=50000):
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.conn_params = PSYCOPG2_CONFIG
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.run_tag = datetime.now().strftime("%Y%m%dT%H%M%S")
+
+    # --- State (the "since last export" watermarks) ---
+
+    def load_state(self):
+        path = os.path.join(self.out_dir, self.STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, self.STATE_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, path)
+
+    # --- Entry point ---
+
+    def run(self, tables=None, full=False):
+        """Exports the requested tables. Returns {table: rows_written}."""
+        tables = tables or list(SCHEMAS)
+        state = self.load_state()
+        summary = {}
+
+        if full:
+            # A full run re-exports the selected tables, so drop their partitions and watermarks
+            for table in tables:
+                shutil.rmtree(os.path.join(self.out_dir, table), ignore_errors=True)
+                state.pop(table, None)
+
+        conn = get_connection(self.conn_params)
+        # One consistent snapshot across all tables (per database when sharded)
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        user_conns = [conn]
+        try:
+            if is_sharded():
+                user_conns = [shard_connection(i) for i in range(SHARD_COUNT)]
+                for shard_conn in user_conns:
+                    shard_conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT last_close_date FROM fund_registry")
+                    snapshot_date = cur.fetchone()[0]
+
+                if "daily_reports" in tables:
+                    since = state.get("daily_reports")
+                    summary["daily_reports"], last = self._export_history("daily_reports", self._stream(conn, "daily_reports", """
+                        SELECT report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close
+                        FROM daily_reports WHERE report_date > %s ORDER BY report_date
+                    """, (since or "1900-01-01",)), date_col=0, mark_col=0)
+                    if last is not None:
+                        state["daily_reports"] = str(last)
+
+                if "ledger" in tables:
+                    summary["ledger"], state["ledger"] = self._export_ledger(user_conns, state.get("ledger", 0))
+
+                for table, conns, sql in (
+                    ("portfolio", [conn], """
+                        SELECT id, bank_name, principal, accrued_interest, annual_rate_m, annual_rate_n,
+                               purchase_date, maturity_date, status
+                        FROM portfolio ORDER BY id
+                    """),
+                    ("user_shares", user_conns, """
+                        SELECT id, user_id, portfolio_id, principal_owned
+                        FROM user_shares ORDER BY id
+                    """),
+                ):
+                    if table not in tables or snapshot_date is None:
+                        continue
+                    if not full and state.get(table) == str(snapshot_date):
+                        summary[table] = 0 # Snapshot for this close already exported
+                        continue
+                    batches = chain.from_iterable(self._stream(c, f"{table}_{i}", sql, ()) for i, c in enumerate(conns))
+                    summary[table] = self._export_snapshot(table, batches, snapshot_date)
+                    state[table] = str(snapshot_date)
+        finally:
+            for c in user_conns:
+                if c is not conn:
+                    c.close()
+            conn.close()
+
+        self.save_state(state)
+        return summary
+
+    # --- Streaming writers ---
+
+    def _export_ledger(self, conns, since):
+        """
+        COMPLETED ledger rows past each shard's watermark, merged across shards in
+        (date, id) order. Returns (rows written, new watermark: an id, or {shard: id} when sharded).
+        """
+        marks = [since.get(str(i), 0) for i in range(len(conns))] if isinstance(since, dict) else [since] * len(conns)
+        streams = [chain.from_iterable(self._stream(c, f"ledger_{i}", """
+            SELECT id, user_id, type, amount, portfolio_id, created_at
+            FROM pending_ledger
+            WHERE status = 'COMPLETED' AND id > %s
+            ORDER BY created_at::date, id
+        """, (marks[i],))) for i, c in enumerate(conns)]
+
+        def tracked(rows):
+            for row in rows:
+                shard = shard_for_tx(row[0])
+                marks[shard] = max(marks[shard], row[0])
+                yield row
+
+        merged = heapq.merge(*streams, key=lambda r: (self._day(r[5]), r[0]))
+        written, _ = self._export_history("ledger", self._batches(tracked(merged)), date_col=5, mark_col=0)
+        return written, marks[0] if len(conns) == 1 else {str(i): m for i, m in enumerate(marks)}
+
+    def _batches(self, rows):
+        """Regroups a row iterator into lists of batch_size."""
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _export_history(self, table, batches, date_col, mark_col):
+        """Streams row batches ordered by date, rolling to a new partition file on each date change."""
+        schema = SCHEMAS[table]
+        written = 0
+        last_mark = None
+        current_day, writer = None, None
+        try:
+            for rows in batches:
+                # Split the batch at partition boundaries
+                start = 0
+                for i in range(len(rows) + 1):
+                    day = self._day(rows[i][date_col]) if i < len(rows) else None
+                    if i < len(rows) and day == current_day:
+                        continue
+                    if i > start:
+                        writer.write_batch(self._to_batch(rows[start:i], schema))
+                    if i < len(rows):
+                        if writer:
+                            writer.close()
+                        current_day = day
+                        writer = self._open_writer(table, current_day, schema)
+                        start = i
+                written += len(rows)
+                batch_mark = max(r[mark_col] for r in rows)
+                last_mark = batch_mark if last_mark is None else max(last_mark, batch_mark)
+        finally:
+            if writer:
+                writer.close()
+        return written, last_mark
+
+    def _export_snapshot(self, table, batches, snapshot_date):
+        schema = SCHEMAS[table]
+        written = 0
+        writer = self._open_writer(table, snapshot_date, schema, name="snapshot")
+        try:
+            for rows in batches:
+                writer.write_batch(self._to_batch(rows, schema))
+                written += len(rows)
+        finally:
+            writer.close()
+        return written
+
+    def _stream(self, conn, table, sql, params):
+        """Yields fixed-size row batches from a named (server-side) cursor."""
+        with conn.cursor(name=f"export_{table}") as cur:
+            cur.itersize = self.batch_size
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    def _open_writer(self, table, day, schema, name=None):
+        part_dir = os.path.join(self.out_dir, table, f"date={day}")
+        os.makedirs(part_dir, exist_ok=True)
+        ext = "parquet" if self.fmt == "parquet" else "arrow"
+        path = os.path.join(part_dir, f"{name or 'part-' + self.run_tag}.{ext}")
+        if self.fmt == "parquet":
+            return pq.ParquetWriter(path, schema, compression="zstd")
+        return pa.ipc.new_file(path, schema)
+
+    def _to_batch(self, rows, schema):
+        columns = list(zip(*rows))
+        return pa.RecordBatch.from_arrays(
+            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+            schema=schema
+        )
+
+    def _day(self, value):
+        return value.date() if isinstance(value, datetime) else value
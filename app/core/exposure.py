@@ -0,0 +1,129 @@
+from decimal import Decimal
+
+from psycopg2.extras import execute_values
+
+from app.core.money import from_cents
+
+# bank_exposure: one row per (bank, maturity month) over the ACTIVE lots, moved by the
+# close from the day's deltas in the same transaction as the lots themselves.
+# rate_weighted = SUM(principal_cents * annual_rate_m), so a bucket's weighted-average
+# yield is rate_weighted / principal_cents without touching portfolio.
+
+def maturity_month(column="maturity_date"):
+    return f"date_trunc('month', {column})::date"
+
+EXPOSURE_FIELDS = ("lots", "principal_cents", "accrued_cents", "rate_weighted")
+
+def upsert_sql(select):
+    """Adds the (bank_name, maturity_month, *EXPOSURE_FIELDS) rows of `select` to bank_exposure."""
+    return f"""
+        INSERT INTO bank_exposure (bank_name, maturity_month, {', '.join(EXPOSURE_FIELDS)})
+        {select}
+        ON CONFLICT (bank_name, maturity_month) DO UPDATE
+        SET {', '.join(f"{f} = bank_exposure.{f} + EXCLUDED.{f}" for f in EXPOSURE_FIELDS)},
+            updated_at = CURRENT_TIMESTAMP
+    """
+
+RECOMPUTE_SQL = f"""
+    SELECT bank_name, {maturity_month()}, COUNT(*), SUM(principal_cents), SUM(accrued_cents),
+           SUM(principal_cents * annual_rate_m)
+    FROM portfolio WHERE status = 'ACTIVE'
+    GROUP BY 1, 2
+"""
+
+def lot_opened(cur, lot_id):
+    """Adds a lot that has just become ACTIVE."""
+    cur.execute(upsert_sql(f"""
+        SELECT bank_name, {maturity_month()}, 1, principal_cents, accrued_cents, principal_cents * annual_rate_m
+        FROM portfolio WHERE id = %s AND status = 'ACTIVE'
+    """), (lot_id,))
+
+def withdraw(cur, per_lot):
+    """Takes the day's withdrawals ({lot id: cents}) out of their lots' buckets."""
+    if not per_lot:
+        return
+    execute_values(cur, upsert_sql(f"""
+        SELECT p.bank_name, {maturity_month('p.maturity_date')}, 0, -SUM(v.cents), 0, -SUM(v.cents * p.annual_rate_m)
+        FROM (VALUES %s) AS v(id, cents)
+        JOIN portfolio p ON p.id = v.id AND p.status = 'ACTIVE'
+        GROUP BY 1, 2
+    """), list(per_lot.items()), template="(%s::int, %s::bigint)", page_size=1000)
+
+# Folded into ledger_events.accrue / delete_zeroed_lots as one more CTE over their RETURNING rows
+def accrued_cte(source):
+    return f"""
+    exposure AS ({upsert_sql(f'''
+        SELECT bank_name, {maturity_month()}, 0, 0, SUM(accrued_delta), 0
+        FROM {source} GROUP BY 1, 2
+    ''')})
+"""
+
+def deleted_cte(source):
+    return f"""
+    exposure AS ({upsert_sql(f'''
+        SELECT bank_name, {maturity_month()}, -COUNT(*), -SUM(principal_cents), -SUM(accrued_cents),
+               -SUM(principal_cents * annual_rate_m)
+        FROM {source} WHERE status = 'ACTIVE' GROUP BY 1, 2
+    ''')})
+"""
+
+def prune(cur):
+    """Drops buckets whose last lot is gone (matured months stop showing up)."""
+    cur.execute("DELETE FROM bank_exposure WHERE lots = 0 AND principal_cents = 0 AND accrued_cents = 0 AND rate_weighted = 0")
+
+def verify(cur):
+    """Buckets where bank_exposure differs from a full recompute over portfolio, as drift dicts."""
+    cur.execute(f"""
+        SELECT COALESCE(e.bank_name, r.bank_name), COALESCE(e.maturity_month, r.maturity_month),
+               {', '.join(f'e.{f}' for f in EXPOSURE_FIELDS)}, {', '.join(f'r.{f}' for f in EXPOSURE_FIELDS)}
+        FROM bank_exposure e
+        FULL OUTER JOIN ({RECOMPUTE_SQL}) AS r (bank_name, maturity_month, {', '.join(EXPOSURE_FIELDS)})
+          ON r.bank_name = e.bank_name AND r.maturity_month = e.maturity_month
+        WHERE ({', '.join(f'e.{f}' for f in EXPOSURE_FIELDS)}) IS DISTINCT FROM
+              ({', '.join(f'r.{f}' for f in EXPOSURE_FIELDS)})
+        ORDER BY 1, 2
+    """)
+    width = len(EXPOSURE_FIELDS)
+    return [{
+        "bank": row[0],
+        "maturity_month": str(row[1]),
+        "tracked": dict(zip(EXPOSURE_FIELDS, row[2:2 + width])),
+        "actual": dict(zip(EXPOSURE_FIELDS, row[2 + width:]))
+    } for row in cur.fetchall()]
+
+def rebuild(cur):
+    """Replaces bank_exposure with a full recompute over portfolio."""
+    cur.execute("DELETE FROM bank_exposure")
+    cur.execute(f"INSERT INTO bank_exposure (bank_name, maturity_month, {', '.join(EXPOSURE_FIELDS)}) {RECOMPUTE_SQL}")
+
+def summarize(rows):
+    """
+    bank_exposure rows (bank, maturity month, *EXPOSURE_FIELDS), ordered by bank, as the
+    /exposure payload: per-bank totals and weighted yield with their maturity ladder.
+    """
+    banks = []
+    total = {"lots": 0, "principal_cents": 0, "accrued_cents": 0, "rate_weighted": Decimal(0)}
+    for bank, month, lots, principal, accrued, weighted in rows:
+        if not banks or banks[-1]["bank"] != bank:
+            banks.append({"bank": bank, "lots": 0, "principal_cents": 0, "accrued_cents": 0,
+                          "rate_weighted": Decimal(0), "maturities": []})
+        entry = banks[-1]
+        entry["maturities"].append({"month": str(month)[:7], "lots": lots, "principal": from_cents(principal),
+                                    "accrued": from_cents(accrued), "weighted_rate": _weighted_rate(weighted, principal)})
+        for target in (entry, total):
+            target["lots"] += lots
+            target["principal_cents"] += principal
+            target["accrued_cents"] += accrued
+            target["rate_weighted"] += weighted
+    return {"banks": [_finish(b) for b in banks], "total": _finish(total)}
+
+def _weighted_rate(weighted, principal_cents):
+    if not principal_cents:
+        return None
+    return (Decimal(weighted) / principal_cents).quantize(Decimal("0.00001"))
+
+def _finish(entry):
+    principal, accrued, weighted = entry.pop("principal_cents"), entry.pop("accrued_cents"), entry.pop("rate_weighted")
+    entry.update(principal=from_cents(principal), accrued=from_cents(accrued),
+                 weighted_rate=_weighted_rate(weighted, principal))
+    return entry
@@ -0,0 +1,209 @@
+from decimal import Decimal
+from datetime import timedelta
+
+from app.core.money import to_cents, from_cents, to_rate, rate_units, daily_interest
+
+INITIAL_IDLE_CASH = 100000000 # 1,000,000.00 in cents, as seeded by schema.py / db_reset.py
+
+class Lot:
+    __slots__ = ("id", "bank_name", "principal", "accrued", "rate_m", "rate_n",
+                 "purchase_date", "maturity_date", "status", "rate_units")
+
+    def __init__(self, lot_id, bank_name, principal, rate_m, rate_n, purchase_date, maturity_date):
+        self.id = lot_id
+        self.bank_name = bank_name
+        self.principal = principal # cents
+        self.accrued = 0 # cents
+        self.rate_m = rate_m
+        self.rate_n = rate_n
+        self.purchase_date = purchase_date
+        self.maturity_date = maturity_date
+        self.status = 'ACTIVE'
+        self.rate_units = rate_units(rate_m)
+
+class FundModel:
+    """
+    In-memory twin of the ledger for what-if simulation: LedgerManager intake,
+    DailyEngine.run_daily_close, ReconciliationEngine and SystemAuditor in one object.
+    Money is held as integer cents and interest follows the accrual policy in money.py,
+    as the database does, so a seeded run ends in the same state as the database engine.
+    Shares: dict keyed by (user_id, lot_id). Lots: __slots__ records keyed by id.
+    """
+    def __init__(self, idle_cash=INITIAL_IDLE_CASH):
+        self.idle_cash = idle_cash
+        self.invested = 0
+        self.last_close_date = None
+        self.lots = {}
+        self.shares = {}
+        self.lot_totals = {} # lot_id -> shares_total (cents), as in lot_share_totals
+        self.reports = []
+        self.archived = [] # (lot, close date) as portfolio_archive keeps them
+        self.pending = []
+        self._next_lot_id = 1
+        self._next_tx_id = 1
+
+    # --- Intake (LedgerManager) ---
+    def queue_request(self, user_id, req_type, amount, portfolio_id=None):
+        tx_id = self._next_tx_id
+        self._next_tx_id += 1
+        self.pending.append((tx_id, user_id, req_type.upper(), to_cents(amount), portfolio_id))
+        return tx_id
+
+    def get_daily_aggregation(self):
+        dep = sum(a for _, _, t, a, _ in self.pending if t == 'DEPOSIT')
+        wit = sum(a for _, _, t, a, _ in self.pending if t == 'WITHDRAWAL')
+        return {
+            "total_deposit": from_cents(dep),
+            "total_withdrawal": from_cents(wit),
+            "net_flow": from_cents(dep - wit),
+            "count": len(self.pending)
+        }
+
+    # --- Daily close (DailyEngine.run_daily_close) ---
+    def _touch_lot(self, lot_id, delta):
+        self.lot_totals[lot_id] = self.lot_totals.get(lot_id, 0) + delta
+
+    def run_daily_close(self, close_date, new_inv_params=None):
+        last_date = self.last_close_date
+        if last_date:
+            if close_date <= last_date and any(r[0] == close_date for r in self.reports):
+                return True, f"Day {close_date} already closed." # Retries are no-ops, as in close_runs
+            if close_date <= last_date:
+                return False, f"Date {close_date} is already closed."
+            if close_date > last_date + timedelta(days=1):
+                return False, f"Gap detected. Next expected date: {last_date + timedelta(days=1)}"
+        unowned = next((tx_id for tx_id, _, t, _, p in self.pending if t == 'WITHDRAWAL' and p is None), None)
+        if unowned is not None:
+            # A withdrawal must name its lot; like the database close, the whole day is refused
+            return False, f"Withdrawal {unowned}: Security Error: No ownership record found."
+
+        shares, lots = self.shares, self.lots
+        invested = self.invested
+        total_dep = 0
+        total_wit = 0
+
+        # Withdrawals: user share, lot principal and running lot total, row by row
+        for _, user_id, tx_type, amount, port_id in self.pending:
+            if tx_type == 'WITHDRAWAL':
+                total_wit += amount
+                key = (user_id, port_id)
+                if key in shares:
+                    shares[key] -= amount
+                lot = lots.get(port_id)
+                if lot is not None:
+                    lot.principal -= amount
+                self._touch_lot(port_id, -amount)
+                invested -= amount
+            else:
+                total_dep += amount
+
+        # Accrual on every ACTIVE lot (the new lot starts accruing tomorrow)
+        for lot in lots.values():
+            if lot.status == 'ACTIVE':
+                lot.accrued += daily_interest(lot.principal, lot.rate_units)
+
+        current_idle = self.idle_cash + total_dep - total_wit
+        current_invested = invested
+
+        if new_inv_params and total_dep > 0:
+            rate = to_rate(new_inv_params.get('rate'))
+            exit_rate = to_rate(new_inv_params.get('early_rate'))
+            tenor = int(new_inv_params.get('duration'))
+            lot = Lot(self._next_lot_id, new_inv_params.get('bank'), total_dep, rate, exit_rate,
+                      close_date, close_date + timedelta(days=tenor))
+            self._next_lot_id += 1
+            lots[lot.id] = lot
+            self._touch_lot(lot.id, total_dep)
+            current_idle -= total_dep
+            current_invested += total_dep
+
+            for _, user_id, tx_type, amount, _ in self.pending:
+                if tx_type == 'DEPOSIT':
+                    key = (user_id, lot.id)
+                    shares[key] = shares.get(key, 0) + amount
+
+        self.reports.append((close_date, total_dep, total_wit, current_idle, current_invested))
+        self.idle_cash = current_idle
+        self.invested = current_invested
+        self.last_close_date = close_date
+        self.pending = []
+
+        # Cleanup zeroed lots into the archive (shares rows stay, as in a sharded fund without the FK)
+        for lot_id in [l.id for l in lots.values() if l.principal <= 0]:
+            self.archived.append((lots.pop(lot_id), close_date))
+        return True, f"Day {close_date} successfully closed."
+
+    # --- Queries used by the simulator ---
+    def get_users_with_balances(self, min_balance=Decimal('10')):
+        floor = to_cents(min_balance)
+        return [(u, p, from_cents(c)) for (u, p), c in self.shares.items() if c > floor]
+
+    def reconcile(self):
+        """ReconciliationEngine.run_full() over the model (the model has no stale totals to skip)."""
+        owned = {}
+        for (_, lot_id), cents in self.shares.items():
+            owned[lot_id] = owned.get(lot_id, 0) + cents
+
+        lot_ids = set(self.lots) | set(owned) | set(self.lot_totals)
+        discrepancies = []
+        claims = 0
+        drained = set()
+        for lot_id in lot_ids:
+            actual = owned.get(lot_id, 0)
+            tracked = self.lot_totals.get(lot_id, actual) # A missing totals entry is seeded, not reported
+            lot = self.lots.get(lot_id)
+            principal = lot.principal if lot else 0
+            claims += actual
+            if lot is None and actual == 0:
+                drained.add(lot_id)
+            if not (tracked == actual == principal):
+                discrepancies.append({
+                    "portfolio_id": lot_id,
+                    "tracked_shares": from_cents(tracked) if tracked is not None else None,
+                    "actual_shares": from_cents(actual),
+                    "principal": from_cents(principal),
+                    "lot_exists": lot is not None
+                })
+        # Re-anchor, like the nightly full scan; archived lots lose their zero shares and totals
+        self.shares = {k: v for k, v in self.shares.items() if k[1] not in drained}
+        self.lot_totals = {lot_id: cents for lot_id, cents in owned.items() if lot_id not in drained}
+        fund_diff = from_cents(claims - self.invested)
+        return {
+            "mode": "full",
+            "lots_checked": len(lot_ids),
+            "discrepancies": discrepancies,
+            "claims_total": from_cents(claims),
+            "registry_invested": from_cents(self.invested),
+            "fund_diff": fund_diff,
+            "exposure_drift": [], # get_exposure() always aggregates the live lots
+            "clean": not discrepancies and fund_diff == 0
+        }
+
+    def get_exposure(self):
+        """bank_exposure rows (bank, maturity month, lots, principal, accrued, rate-weighted principal), as the index holds them."""
+        buckets = {}
+        for lot in self.lots.values():
+            if lot.status == 'ACTIVE':
+                key = (lot.bank_name, lot.maturity_date.replace(day=1))
+                b = buckets.setdefault(key, [0, 0, 0, 0])
+                b[0] += 1
+                b[1] += lot.principal
+                b[2] += lot.accrued
+                b[3] += lot.principal * lot.rate_m
+        return [k + tuple(v) for k, v in sorted(buckets.items())]
+
+    def get_full_audit_data(self):
+        """Same shape as SystemAuditor.get_full_audit_data()."""
+        users = sorted((u, p, c) for (u, p), c in self.shares.items() if p in self.lots)
+        return {
+            "users": [{"uid": u, "bank": self.lots[p].bank_name, "pid": p, "amt": from_cents(c),
+                       "rate": self.lots[p].rate_m} for u, p, c in users],
+            "portfolios": [{"id": l.id, "bank": l.bank_name, "principal": from_cents(l.principal),
+                            "accrued": from_cents(l.accrued), "start": str(l.purchase_date),
+                            "end": str(l.maturity_date)} for l in self.lots.values()],
+            "registry": {"idle": from_cents(self.idle_cash), "invested": from_cents(self.invested),
+                         "last_close": str(self.last_close_date)},
+            "archived": [{"id": l.id, "bank": l.bank_name, "accrued": from_cents(l.accrued),
+                          "start": str(l.purchase_date), "end": str(l.maturity_date), "archived_on": str(d)}
+                         for l, d in self.archived]
+        }
@@ -0,0 +1,34 @@
+
+from app.database.connection import get_connection
+
+def bump_generation(conn=None):
+    """
+    Advances the fund generation. Call only AFTER the write has committed:
+    readers that observe the new number must also observe the new data.
+    The sequence lives on the primary; pass conn only if it points there.
+    """
+    own = conn is None
+    if own:
+        conn = get_connection()
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT nextval('fund_generation')")
+                return cur.fetchone()[0]
+    finally:
+        if own:
+            conn.close()
+
+def current_generation(conn=None):
+    """Reads the generation without advancing it (no locks, one round-trip)."""
+    own = conn is None
+    if own:
+        conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            # A fresh sequence reports last_value 1 before and after its first nextval
+            cur.execute("SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM fund_generation")
+            return cur.fetchone()[0]
+    finally:
+        if own:
+            conn.close()
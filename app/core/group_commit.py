@@ -0,0 +1,56 @@
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+from app.core.metrics import metrics
+
+BATCH_ROWS = metrics.histogram("ledger_group_commit_rows", "Rows per group commit",
+                               buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+BATCH_SECONDS = metrics.histogram("ledger_group_commit_seconds", "Insert + commit time per group")
+
+class GroupCommitBatcher:
+    """
+    Collects items from many threads and hands them to flush_fn in groups.
+    A group closes when it reaches max_rows or when window_ms has passed since
+    its first item. flush_fn(items) must return one result per item, in order;
+    every caller's Future resolves with its own result (or the group's exception).
+    """
+    def __init__(self, flush_fn, max_rows, window_ms, name="group-commit"):
+        self.flush_fn = flush_fn
+        self.max_rows = max_rows
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self):
+        group = [self._queue.get()] # Block until there is work
+        deadline = time.perf_counter() + self.window
+        while len(group) < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                group.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        while True:
+            group = self._collect()
+            items = [item for item, _ in group]
+            try:
+                with BATCH_SECONDS.time():
+                    results = self.flush_fn(items)
+                BATCH_ROWS.observe(len(items))
+            except Exception as e:
+                for _, future in group:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(group, results):
+                future.set_result(result)
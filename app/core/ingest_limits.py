@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app.config import RATE_LIMIT_STORE_PATH, RATE_LIMIT_MAX_CLIENTS
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+def _decide(tokens, rate):
+    """(allowed, tokens left, seconds until the next token) for one request against a refilled bucket."""
+    if tokens >= 1.0:
+        return True, tokens - 1.0, 0.0
+    return False, tokens, (1.0 - tokens) / rate if rate > 0 else float("inf")
+
+class MemoryLimitStore:
+    """Token buckets, in-flight slots and close markers for this process only. Idle clients are evicted LRU-first."""
+    name = "memory"
+
+    def __init__(self, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._closes = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def take(self, client, rate, burst, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._take(client, rate, burst, now)
+
+    def _take(self, client, rate, burst, now):
+        tokens, updated = self._buckets.pop(client, (burst, now))
+        allowed, tokens, wait = _decide(_refill(tokens, updated, now, rate, burst), rate)
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return allowed, wait
+
+    def enter(self, client, rate, burst, max_in_flight, now=None):
+        """(None, 0) and a held slot, or (reason, seconds until a token) without one."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._in_flight >= max_in_flight:
+                return "concurrency", 0.0
+            allowed, wait = self._take(client, rate, burst, now)
+            if not allowed:
+                return "rate", wait
+            self._in_flight += 1
+        return None, 0.0
+
+    def leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def in_flight(self):
+        return self._in_flight
+
+    def mark_close(self, running):
+        with self._lock:
+            self._closes += 1 if running else -1
+
+    def close_running(self):
+        return self._closes > 0
+
+    def clients(self):
+        return len(self._buckets)
+
+class SQLiteLimitStore:
+    """
+    Shares buckets, in-flight slots and close markers between the workers of one host
+    through a local SQLite (WAL) file. Each enter() is one BEGIN IMMEDIATE
+    read-modify-write, so two workers can't both spend a client's last token or the last
+    slot. Slots and close markers are keyed by pid and ignored once that process is gone,
+    so a killed worker never holds slots and a killed close never leaves the API throttled.
+    """
+    name = "sqlite"
+
+    def __init__(self, path=RATE_LIMIT_STORE_PATH, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.path = path
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=OFF") # Throttle state: losing it on power loss is harmless
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                client TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS buckets_updated_idx ON buckets (updated)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS closes (pid INTEGER PRIMARY KEY, running INTEGER NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS in_flight (pid INTEGER PRIMARY KEY, requests INTEGER NOT NULL)")
+
+    def take(self, client, rate, burst, now=None):
+        # Wall clock: monotonic clocks aren't comparable across processes
+        now = time.time() if now is None else now
+        with self._lock, self._immediate():
+            return self._take(client, rate, burst, now)
+
+    def _take(self, client, rate, burst, now):
+        row = self.db.execute("SELECT tokens, updated FROM buckets WHERE client = ?", (client,)).fetchone()
+        tokens, updated = row if row else (burst, now)
+        allowed, tokens, wait = _decide(_refill(tokens, min(updated, now), now, rate, burst), rate)
+        self.db.execute("INSERT OR REPLACE INTO buckets (client, tokens, updated) VALUES (?, ?, ?)",
+                        (client, tokens, now))
+        if not row and self.db.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] > self.max_clients:
+            self.db.execute("""
+                DELETE FROM buckets WHERE client IN
+                    (SELECT client FROM buckets ORDER BY updated LIMIT ?)
+            """, (max(1, self.max_clients // 10),))
+        return allowed, wait
+
+    def enter(self, client, rate, burst, max_in_flight, now=None):
+        """(None, 0) and a held slot, or (reason, seconds until a token) without one."""
+        now = time.time() if now is None else now
+        with self._lock, self._immediate():
+            if self._live_in_flight() >= max_in_flight:
+                return "concurrency", 0.0
+            allowed, wait = self._take(client, rate, burst, now)
+            if not allowed:
+                return "rate", wait
+            self.db.execute("""
+                INSERT INTO in_flight (pid, requests) VALUES (?, 1)
+                ON CONFLICT (pid) DO UPDATE SET requests = requests + 1
+            """, (os.getpid(),))
+        return None, 0.0
+
+    def leave(self):
+        with self._lock, self._immediate():
+            self.db.execute("UPDATE in_flight SET requests = requests - 1 WHERE pid = ?", (os.getpid(),))
+            self.db.execute("DELETE FROM in_flight WHERE requests <= 0")
+
+    def _live_in_flight(self):
+        """Slots held by running workers; a dead worker's slots are dropped."""
+        rows = self.db.execute("SELECT pid, requests FROM in_flight").fetchall()
+        dead = [pid for pid, _ in rows if not _alive(pid)]
+        if dead:
+            self.db.executemany("DELETE FROM in_flight WHERE pid = ?", [(pid,) for pid in dead])
+        return sum(n for pid, n in rows if pid not in dead)
+
+    def in_flight(self):
+        with self._lock:
+            return self.db.execute("SELECT COALESCE(SUM(requests), 0) FROM in_flight").fetchone()[0]
+
+    @contextmanager
+    def _immediate(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def mark_close(self, running):
+        pid = os.getpid()
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("INSERT OR IGNORE INTO closes (pid, running) VALUES (?, 0)", (pid,))
+            self.db.execute("UPDATE closes SET running = running + ? WHERE pid = ?", (1 if running else -1, pid))
+            self.db.execute("DELETE FROM closes WHERE running <= 0")
+            self.db.execute("COMMIT")
+
+    def close_running(self):
+        with self._lock:
+            pids = [r[0] for r in self.db.execute("SELECT pid FROM closes WHERE running > 0")]
+        return any(_alive(pid) for pid in pids)
+
+    def clients(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # Exists, owned by another user
+    return True
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_limit_store():
+    """Process-wide store: SQLite when RATE_LIMIT_STORE_PATH is set, otherwise in-process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteLimitStore() if RATE_LIMIT_STORE_PATH else MemoryLimitStore()
+        return _store
+
+@contextmanager
+def close_in_progress():
+    """Marks a daily close as running so the ledger API switches to its close-time limits."""
+    store = get_limit_store()
+    store.mark_close(True)
+    try:
+        yield
+    finally:
+        store.mark_close(False)
@@ -0,0 +1,198 @@
+import sqlite3
+import threading
+import time
+import uuid
+from decimal import Decimal
+import os
+
+import psycopg2
+from app.config import INTAKE_JOURNAL_PATH, INTAKE_SYNC, INTAKE_FLUSH_INTERVAL_MS, INTAKE_FLUSH_BATCH
+from app.core.ledger_manager import LedgerManager
+from app.core.validators import refused_withdrawals
+from app.core.metrics import metrics
+
+FLUSHED = metrics.counter("intake_flushed_total", "Journal entries drained into pending_ledger")
+FLUSH_ERRORS = metrics.counter("intake_flush_errors_total", "Failed journal drain attempts")
+FLUSH_SECONDS = metrics.histogram("intake_flush_seconds", "Time to drain one journal batch")
+DEAD_LETTERED = metrics.counter("intake_dead_lettered_total", "Journal entries Postgres rejected on their own, set aside")
+
+# What a single row can be rejected for (bad value, constraint); anything else, such as a
+# lost connection, is the database's problem and the entry stays queued
+POISON_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError, ArithmeticError, ValueError)
+
+class IntakeJournal:
+    """
+    Write-ahead intake buffer for the external ledger API.
+    1. append(): one local SQLite (WAL) insert; the API answers 202 with the intake id.
+    2. Flusher thread: drains batches into pending_ledger via LedgerManager.queue_batch.
+    Exactly-once: pending_ledger.intake_id is UNIQUE and inserts skip conflicts, so a
+    crash between the Postgres commit and the local delete only causes a harmless replay.
+    Poison entries: a batch Postgres rejects is retried row by row, and rows rejected on
+    their own move to the local dead_letter table, so one bad entry can't stall the queue.
+    Withdrawals are accepted without touching Postgres; the ownership/balance check runs
+    here, and a refused one is dead-lettered with the reason the API would have given.
+    """
+    def __init__(self, path=INTAKE_JOURNAL_PATH, sync=INTAKE_SYNC,
+                 interval_ms=INTAKE_FLUSH_INTERVAL_MS, batch_size=INTAKE_FLUSH_BATCH):
+        self.path = path
+        self.interval = interval_ms / 1000.0
+        self.batch_size = batch_size
+        self.ledger = LedgerManager()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"PRAGMA synchronous={'FULL' if sync == 'FULL' else 'NORMAL'}")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS intake (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                intake_id TEXT UNIQUE NOT NULL,
+                user_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                amount TEXT NOT NULL,
+                portfolio_id INTEGER,
+                received_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                seq INTEGER PRIMARY KEY,
+                intake_id TEXT UNIQUE NOT NULL,
+                user_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                amount TEXT NOT NULL,
+                portfolio_id INTEGER,
+                received_at REAL NOT NULL,
+                error TEXT NOT NULL,
+                failed_at REAL NOT NULL
+            )
+        """)
+
+    def append(self, user_id, req_type, amount, portfolio_id=None):
+        """Durably records a request. Returns its intake id."""
+        intake_id = uuid.uuid4().hex
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO intake (intake_id, user_id, type, amount, portfolio_id, received_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (intake_id, user_id, req_type.upper(), str(amount), portfolio_id, time.time())
+            )
+        return intake_id
+
+    def depth(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM intake").fetchone()[0]
+
+    def dead_letter_depth(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    def lag_seconds(self):
+        """Age of the oldest entry still waiting for Postgres."""
+        with self._lock:
+            oldest = self.db.execute("SELECT MIN(received_at) FROM intake").fetchone()[0]
+        return time.time() - oldest if oldest else 0.0
+
+    def flush_once(self):
+        """Drains up to one batch. Returns the number of journal entries removed."""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT seq, intake_id, user_id, type, amount, portfolio_id FROM intake ORDER BY seq LIMIT ?",
+                (self.batch_size,)
+            ).fetchall()
+        if not rows:
+            return 0
+
+        with FLUSH_SECONDS.time():
+            refused = self._refused_withdrawals(rows)
+            queued = [r for r in rows if r[0] not in refused]
+            try:
+                self.ledger.queue_batch([self._entry(r) for r in queued])
+                rejected = []
+            except POISON_ERRORS:
+                rejected = self._flush_rows(queued)
+            rejected += refused.items()
+            # Only after Postgres has committed may the journal forget the entries
+            with self._lock:
+                self.db.execute("BEGIN")
+                try:
+                    self.db.executemany("""
+                        INSERT OR IGNORE INTO dead_letter (seq, intake_id, user_id, type, amount, portfolio_id,
+                                                           received_at, error, failed_at)
+                        SELECT seq, intake_id, user_id, type, amount, portfolio_id, received_at, ?, ? FROM intake WHERE seq = ?
+                    """, [(error, time.time(), seq) for seq, error in rejected])
+                    self.db.execute("DELETE FROM intake WHERE seq <= ?", (rows[-1][0],))
+                    self.db.execute("COMMIT")
+                except Exception:
+                    self.db.execute("ROLLBACK")
+                    raise
+        FLUSHED.inc(amount=len(rows) - len(rejected))
+        DEAD_LETTERED.inc(amount=len(rejected))
+        return len(rows)
+
+    @staticmethod
+    def _entry(row):
+        return (row[1], row[2], row[3], Decimal(row[4]), row[5])
+
+    @staticmethod
+    def _refused_withdrawals(rows):
+        """{seq: reason} for journaled withdrawals the lot ownership check refuses."""
+        withdrawals = [r for r in rows if r[3] == 'WITHDRAWAL']
+        if not withdrawals:
+            return {}
+        refused = refused_withdrawals([(r[2], r[5], Decimal(r[4])) for r in withdrawals])
+        return {withdrawals[i][0]: f"Unauthorized: {reason}" for i, reason in refused.items()}
+
+    def _flush_rows(self, rows):
+        """Queues a rejected batch one row at a time; returns (seq, error) for the rows rejected on their own."""
+        rejected = []
+        for row in rows:
+            try:
+                self.ledger.queue_batch([self._entry(row)])
+            except POISON_ERRORS as e:
+                rejected.append((row[0], f"{type(e).__name__}: {e}".strip()))
+        return rejected
+
+    def dead_letters(self, limit=100):
+        """Entries set aside by the flusher, oldest first."""
+        with self._lock:
+            return self.db.execute(
+                "SELECT intake_id, user_id, type, amount, portfolio_id, error FROM dead_letter ORDER BY seq LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+    def _run(self):
+        while True:
+            try:
+                while self.flush_once() == self.batch_size:
+                    pass # Backlog: keep draining without sleeping
+            except Exception:
+                FLUSH_ERRORS.inc()
+                time.sleep(min(1.0, self.interval * 10)) # Database stalled; back off, entries stay journaled
+            time.sleep(self.interval)
+
+    def start(self):
+        """Starts the background flusher once per process (also replays entries left by a restart)."""
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="intake-flusher", daemon=True)
+                self._flusher.start()
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_journal():
+    """Process-wide journal, created (and its flusher started) on first use."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = IntakeJournal()
+            _journal.start()
+            metrics.gauge("intake_journal_depth", "Entries accepted but not yet in pending_ledger",
+                          callback=lambda: [((), _journal.depth())])
+            metrics.gauge("intake_journal_lag_seconds", "Age of the oldest undrained entry",
+                          callback=lambda: [((), _journal.lag_seconds())])
+            metrics.gauge("intake_dead_letter_depth", "Entries set aside because Postgres rejected them",
+                          callback=lambda: [((), _journal.dead_letter_depth())])
+        return _journal
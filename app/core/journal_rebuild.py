@@ -0,0 +1,337 @@
+import io
+import json
+import os
+import time
+
+from app.config import PSYCOPG2_CONFIG, SHARD_CONFIGS, REBUILD_WORKERS
+from app.database.connection import get_connection
+from app.core.generation import bump_generation
+from app.core.fund_model import INITIAL_IDLE_CASH
+from app.core.money import format_cents, from_cents
+from app.core.parallel_close import _get_pool
+from app.core.close_runs import unfinished_run
+from app.core import exposure
+from app.core.ledger_events import (QUEUED, CANCELED, AMENDED, SETTLED, WITHDRAWAL_APPLIED, DEPOSIT_ALLOCATED,
+                                    LOT_CREATED, LOT_WITHDRAWAL, ACCRUAL, LOT_DELETED, DAY_CLOSED)
+
+LOT_EVENTS = [LOT_CREATED, LOT_WITHDRAWAL, ACCRUAL, LOT_DELETED, WITHDRAWAL_APPLIED, DEPOSIT_ALLOCATED]
+PENDING_EVENTS = [QUEUED, CANCELED, AMENDED, SETTLED]
+
+# Tables each database is rebuilt for: fund side on the primary, user side on every shard
+FUND_TABLES = ("portfolio", "lot_share_totals", "daily_reports", "bank_exposure")
+USER_TABLES = ("pending_ledger", "user_shares")
+
+# COPY column lists, in load order (portfolio before user_shares: it is a foreign key on a single database)
+COPY_COLUMNS = {
+    "portfolio": "id, bank_name, principal, accrued_interest, annual_rate_m, annual_rate_n, purchase_date, maturity_date, status",
+    "lot_share_totals": "portfolio_id, shares_total",
+    "pending_ledger": "id, user_id, type, amount, portfolio_id, status, created_at, intake_id",
+    "user_shares": "user_id, portfolio_id, principal_owned"
+}
+
+# --- COPY text format ---
+
+_UNESCAPE = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", "v": "\v"}
+
+def _field(s):
+    """One column of COPY text output -> str (None for \\N)."""
+    if s == "\\N":
+        return None
+    if "\\" not in s:
+        return s
+    out = []
+    chars = iter(s)
+    for ch in chars:
+        if ch == "\\":
+            ch = next(chars)
+            ch = _UNESCAPE.get(ch, ch)
+        out.append(ch)
+    return "".join(out)
+
+def _text(value):
+    """A value -> one column of COPY text input."""
+    if value is None:
+        return "\\N"
+    s = str(value)
+    if "\\" in s or "\t" in s or "\n" in s or "\r" in s:
+        s = s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return s
+
+def _cents(s):
+    """DECIMAL(20, 2) text (always two decimals) -> integer cents, without going through Decimal."""
+    return int(s.replace(".", ""))
+
+class _RowSink:
+    """copy_expert target that replays each row as it arrives instead of buffering the stream."""
+    def __init__(self, apply):
+        self.apply = apply
+        self.tail = b""
+        self.rows = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        lines = (self.tail + data).split(b"\n")
+        self.tail = lines.pop()
+        for line in lines:
+            self.apply(line.decode().split("\t"))
+        self.rows += len(lines)
+
+def _stream(conn_params, columns, where, params, apply):
+    """COPY ... TO STDOUT of the matching events in seq order into apply(row). Returns the row count."""
+    conn = get_connection(conn_params)
+    try:
+        with conn.cursor() as cur:
+            query = cur.mogrify(f"SELECT {columns} FROM ledger_events WHERE {where} ORDER BY seq", params).decode()
+            sink = _RowSink(apply)
+            cur.copy_expert(f"COPY ({query}) TO STDOUT", sink)
+        conn.rollback()
+        return sink.rows
+    finally:
+        conn.close()
+
+# --- Worker-process bodies ---
+
+def _replay_lots(conn_params, upto, parts, k):
+    """
+    Replays lot and share events with portfolio_id % parts == k.
+    Returns the event count and COPY text for portfolio, lot_share_totals and user_shares.
+    Events of a lot created before the journal existed (no LOT_CREATED) are skipped.
+    """
+    lots = {} # id -> [bank, principal, accrued, rate_m, rate_n, purchase, maturity, shares_total] (cents)
+    shares = {} # (user_id as COPY text, lot id) -> cents
+
+    def apply(row):
+        event_type, user_id, port_id, amount, detail = row
+        pid = int(port_id)
+        if event_type == DEPOSIT_ALLOCATED:
+            key = (user_id, pid)
+            shares[key] = shares.get(key, 0) + _cents(amount)
+        elif event_type == WITHDRAWAL_APPLIED:
+            key = (user_id, pid)
+            if key in shares: # The close's UPDATE matches no row either
+                shares[key] -= _cents(amount)
+        elif event_type == LOT_CREATED:
+            d = json.loads(_field(detail))
+            principal = _cents(amount)
+            lots[pid] = [d["bank"], principal, 0, d["rate_m"], d["rate_n"],
+                         d["purchase_date"], d["maturity_date"], principal]
+        elif pid in lots:
+            lot = lots[pid]
+            if event_type == LOT_WITHDRAWAL:
+                lot[1] -= _cents(amount)
+                lot[7] -= _cents(amount)
+            elif event_type == ACCRUAL:
+                lot[2] = _cents(amount)
+            elif event_type == LOT_DELETED:
+                del lots[pid]
+
+    count = _stream(conn_params, "event_type, user_id, portfolio_id, amount, detail",
+                    "event_type = ANY(%s) AND mod(portfolio_id, %s) = %s AND seq <= %s",
+                    (LOT_EVENTS, parts, k, upto), apply)
+    return count, {
+        "portfolio": "".join(
+            f"{pid}\t{_text(l[0])}\t{format_cents(l[1])}\t{format_cents(l[2])}\t{l[3]}\t{l[4]}\t{l[5]}\t{l[6]}\tACTIVE\n"
+            for pid, l in lots.items()),
+        # Rebuilt dirty with verified_total 0: the next reconciliation checks every lot
+        "lot_share_totals": "".join(f"{pid}\t{format_cents(l[7])}\n" for pid, l in lots.items()),
+        "user_shares": "".join(f"{u}\t{pid}\t{format_cents(c)}\n" for (u, pid), c in shares.items())
+    }
+
+def _replay_pending(conn_params, upto, parts, k):
+    """Replays pending_ledger events with tx_id % parts == k. Returns the event count and its COPY text."""
+    rows = {} # id -> [user_id, type, amount, portfolio_id, status, created_at, intake_id] (COPY text)
+
+    def apply(row):
+        event_type, tx_id, user_id, port_id, amount, detail, recorded_at = row
+        tx = int(tx_id)
+        if event_type == QUEUED:
+            d = json.loads(_field(detail))
+            rows[tx] = [user_id, _text(d["type"]), amount, port_id, "PENDING", recorded_at, _text(d.get("intake_id"))]
+        elif tx in rows:
+            if event_type == CANCELED:
+                del rows[tx]
+            elif event_type == AMENDED:
+                rows[tx][2] = amount
+            elif event_type == SETTLED:
+                rows[tx][4] = "COMPLETED"
+
+    count = _stream(conn_params, "event_type, tx_id, user_id, portfolio_id, amount, detail, recorded_at",
+                    "event_type = ANY(%s) AND mod(tx_id, %s) = %s AND seq <= %s",
+                    (PENDING_EVENTS, parts, k, upto), apply)
+    return count, {"pending_ledger": "".join(f"{tx}\t" + "\t".join(r) + "\n" for tx, r in rows.items())}
+
+class JournalRebuilder:
+    """
+    Reconstructs the derived tables from ledger_events, one database at a time:
+    1. Locks the database's derived tables, then its journal (writers can't append meanwhile).
+    2. Replays in parallel on a process pool: partitions by lot id (portfolio, share totals,
+       user shares) and by tx id (pending ledger), each streaming its events with COPY.
+    3. TRUNCATEs the derived tables and COPYs the replayed rows back, then daily_reports
+       and fund_registry from the DAY_CLOSED events, in the same transaction.
+    Retention tiers are left as they are: days already rolled up into daily_reports_monthly
+    are not restored, and portfolio_archive keeps the lots LOT_DELETED removed.
+    lot_share_totals comes back dirty, so the next reconciliation re-verifies every lot;
+    bank_exposure is recomputed from the replayed portfolio.
+    """
+    def __init__(self, workers=REBUILD_WORKERS):
+        self.workers = workers or os.cpu_count() or 1
+
+    def _databases(self):
+        """(config, has fund tables, has user tables) for every distinct database."""
+        configs = [PSYCOPG2_CONFIG] + [c for c in SHARD_CONFIGS if c != PSYCOPG2_CONFIG]
+        return [(c, c == PSYCOPG2_CONFIG, c in SHARD_CONFIGS) for c in configs]
+
+    def run(self):
+        started = time.perf_counter()
+        databases = [self._rebuild(config, fund, users) for config, fund, users in self._databases()]
+        bump_generation(None)
+        return {
+            "databases": databases,
+            "events": sum(d["events"] for d in databases),
+            "seconds": time.perf_counter() - started
+        }
+
+    def _rebuild(self, config, fund, users):
+        started = time.perf_counter()
+        tables = (FUND_TABLES if fund else ()) + (USER_TABLES if users else ())
+        conn = get_connection(config)
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    # Derived tables before the journal: the order every journaled write takes them in
+                    cur.execute(f"LOCK TABLE {', '.join(tables + (('fund_registry',) if fund else ()))} IN ACCESS EXCLUSIVE MODE")
+                    cur.execute("LOCK TABLE ledger_events IN SHARE MODE")
+                    # Mid-close the registry already reflects committed phases that no DAY_CLOSED covers yet
+                    unfinished = unfinished_run(cur) if fund else None
+                    if unfinished:
+                        raise RuntimeError(f"Close of {unfinished} stopped part-way; resume it before rebuilding.")
+                    cur.execute("SELECT COALESCE(MAX(seq), 0) FROM ledger_events")
+                    upto = cur.fetchone()[0]
+
+                    pool = _get_pool(self.workers)
+                    futures = [pool.submit(_replay_lots, config, upto, self.workers, k) for k in range(self.workers)]
+                    if users:
+                        futures += [pool.submit(_replay_pending, config, upto, self.workers, k)
+                                    for k in range(self.workers)]
+                    results = [f.result() for f in futures]
+                    replayed = time.perf_counter()
+
+                    # CASCADE: user_shares from before schema.py dropped its foreign key still references portfolio
+                    cur.execute(f"TRUNCATE {', '.join(tables)} CASCADE")
+                    rows = {}
+                    for table, columns in COPY_COLUMNS.items():
+                        if table not in tables:
+                            continue
+                        for _, copies in results:
+                            if copies.get(table):
+                                cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN", io.StringIO(copies[table]))
+                                rows[table] = rows.get(table, 0) + copies[table].count("\n")
+
+                    if fund:
+                        cur.execute("""
+                            INSERT INTO daily_reports (report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close)
+                            SELECT business_date, (detail->>'deposit')::numeric, (detail->>'withdrawal')::numeric,
+                                   (detail->>'idle_cash')::numeric, (detail->>'invested')::numeric
+                            FROM ledger_events WHERE event_type = %s AND seq <= %s
+                              AND business_date > (SELECT COALESCE(MAX(last_date), '-infinity') FROM daily_reports_monthly)
+                            ORDER BY seq
+                        """, (DAY_CLOSED, upto))
+                        rows["daily_reports"] = cur.rowcount
+                        # The registry is the last close's report (in either tier); with no close yet, the seeded state
+                        cur.execute("""
+                            SELECT idle_cash_at_close, invested_at_close, report_date FROM daily_reports
+                            UNION ALL
+                            SELECT idle_cash_at_close, invested_at_close, last_date FROM daily_reports_monthly
+                            ORDER BY 3 DESC LIMIT 1
+                        """)
+                        registry = cur.fetchone() or (from_cents(INITIAL_IDLE_CASH), from_cents(0), None)
+                        cur.execute("UPDATE fund_registry SET total_idle_cash = %s, total_invested = %s, last_close_date = %s",
+                                    registry)
+                        # The exposure index is a pure aggregate of the replayed lots
+                        exposure.rebuild(cur)
+                        rows["bank_exposure"] = cur.rowcount
+
+                    # Never move a sequence backwards: ids of rolled-back or staged rows stay burnt
+                    for table in ("portfolio", "pending_ledger"):
+                        if table in tables:
+                            cur.execute(f"""
+                                SELECT setval('{table}_id_seq', m) FROM (SELECT MAX(id) AS m FROM {table}) x
+                                WHERE m > (SELECT last_value FROM {table}_id_seq)
+                            """)
+            return {
+                "database": config["database"],
+                "events": sum(count for count, _ in results),
+                "rows": rows,
+                "replay_seconds": replayed - started,
+                "seconds": time.perf_counter() - started
+            }
+        finally:
+            conn.close()
+
+    def baseline(self):
+        """
+        Journals the current state of a fund that predates ledger_events, so that a rebuild
+        reproduces it. Only databases whose journal is still empty are touched.
+        Returns {database: events written}.
+        """
+        written = {}
+        for config, fund, users in self._databases():
+            tables = (FUND_TABLES if fund else ()) + (USER_TABLES if users else ())
+            conn = get_connection(config)
+            try:
+                with conn:
+                    with conn.cursor() as cur:
+                        cur.execute(f"LOCK TABLE {', '.join(tables)} IN SHARE MODE")
+                        cur.execute("LOCK TABLE ledger_events IN EXCLUSIVE MODE")
+                        cur.execute("SELECT EXISTS (SELECT 1 FROM ledger_events)")
+                        if cur.fetchone()[0]:
+                            written[config["database"]] = 0
+                            continue
+                        count = 0
+                        for statement in (_BASELINE_FUND if fund else ()) + (_BASELINE_USERS if users else ()):
+                            cur.execute(statement)
+                            count += cur.rowcount
+                        written[config["database"]] = count
+            finally:
+                conn.close()
+        return written
+
+_BASELINE_FUND = (
+    """
+    INSERT INTO ledger_events (event_type, business_date, portfolio_id, amount, detail)
+    SELECT 'LOT_CREATED', purchase_date, id, principal,
+           jsonb_build_object('bank', bank_name, 'rate_m', annual_rate_m::text, 'rate_n', annual_rate_n::text,
+                              'purchase_date', purchase_date::text, 'maturity_date', maturity_date::text)
+    FROM portfolio WHERE status = 'ACTIVE' ORDER BY id
+    """,
+    """
+    INSERT INTO ledger_events (event_type, portfolio_id, amount)
+    SELECT 'ACCRUAL', id, accrued_interest FROM portfolio
+    WHERE status = 'ACTIVE' AND accrued_interest <> 0 ORDER BY id
+    """,
+    """
+    INSERT INTO ledger_events (event_type, business_date, detail)
+    SELECT 'DAY_CLOSED', report_date,
+           jsonb_build_object('deposit', daily_deposit::text, 'withdrawal', daily_withdrawal::text,
+                              'idle_cash', idle_cash_at_close::text, 'invested', invested_at_close::text)
+    FROM daily_reports ORDER BY report_date
+    """
+)
+
+_BASELINE_USERS = (
+    """
+    INSERT INTO ledger_events (event_type, tx_id, user_id, portfolio_id, amount, detail, recorded_at)
+    SELECT 'QUEUED', id, user_id, portfolio_id, amount, jsonb_build_object('type', type, 'intake_id', intake_id),
+           COALESCE(created_at, CURRENT_TIMESTAMP)
+    FROM pending_ledger ORDER BY id
+    """,
+    """
+    INSERT INTO ledger_events (event_type, tx_id)
+    SELECT 'SETTLED', id FROM pending_ledger WHERE status = 'COMPLETED' ORDER BY id
+    """,
+    """
+    INSERT INTO ledger_events (event_type, user_id, portfolio_id, amount)
+    SELECT 'DEPOSIT_ALLOCATED', user_id, portfolio_id, principal_owned FROM user_shares ORDER BY id
+    """
+)
@@ -0,0 +1,129 @@
+from psycopg2.extras import execute_values, Json
+
+from app.core.money import ACCRUAL_CENTS_SQL
+from app.core import exposure
+
+# Append-only journal (ledger_events) of every change to the derived tables, written
+# in the same transaction as the change itself. Events live next to the rows they
+# describe, so on a sharded fund each shard journals its own pending_ledger and
+# user_shares while the primary journals portfolio, reports and the registry.
+
+# User side: pending_ledger / user_shares
+QUEUED = "QUEUED" # tx_id, user_id, portfolio_id, amount; detail: type, intake_id
+CANCELED = "CANCELED" # tx_id
+AMENDED = "AMENDED" # tx_id, amount (new)
+SETTLED = "SETTLED" # tx_id: completed by the close of business_date
+WITHDRAWAL_APPLIED = "WITHDRAWAL_APPLIED" # tx_id, user_id, portfolio_id, amount: share reduced
+DEPOSIT_ALLOCATED = "DEPOSIT_ALLOCATED" # user_id, portfolio_id, amount: share increased
+
+# Fund side: portfolio / lot_share_totals / daily_reports / fund_registry
+LOT_CREATED = "LOT_CREATED" # portfolio_id, amount (principal); detail: bank, rates, dates
+LOT_WITHDRAWAL = "LOT_WITHDRAWAL" # portfolio_id, amount: principal reduced
+ACCRUAL = "ACCRUAL" # portfolio_id, amount: accrued_interest after the day's accrual
+LOT_DELETED = "LOT_DELETED" # portfolio_id
+DAY_CLOSED = "DAY_CLOSED" # detail: the daily_reports row (and so the registry)
+
+EVENT_COLUMNS = ("event_type", "business_date", "tx_id", "user_id", "portfolio_id", "amount", "detail")
+
+# Journals rows inserted by `WITH ins AS (INSERT INTO pending_ledger ... RETURNING PENDING_RETURNING)`.
+# recorded_at takes created_at so a rebuild restores it exactly.
+PENDING_RETURNING = "id, user_id, type, amount, portfolio_id, intake_id, created_at"
+QUEUED_CTE = """
+    queued AS (
+        INSERT INTO ledger_events (event_type, tx_id, user_id, portfolio_id, amount, detail, recorded_at)
+        SELECT 'QUEUED', id, user_id, portfolio_id, amount,
+               jsonb_build_object('type', type, 'intake_id', intake_id), created_at
+        FROM ins
+    )
+"""
+
+def event(event_type, business_date=None, tx_id=None, user_id=None, portfolio_id=None, amount=None, detail=None):
+    return (event_type, business_date, tx_id, user_id, portfolio_id, amount,
+            Json(detail) if detail is not None else None)
+
+def record(cur, events):
+    """Appends event() tuples in one multi-row INSERT."""
+    if events:
+        execute_values(cur, f"INSERT INTO ledger_events ({', '.join(EVENT_COLUMNS)}) VALUES %s",
+                       events, page_size=1000)
+
+def lot_created(close_date, lot_id, bank, principal, rate, exit_rate, maturity_date):
+    return event(LOT_CREATED, close_date, portfolio_id=lot_id, amount=principal, detail={
+        "bank": bank,
+        "rate_m": str(rate),
+        "rate_n": str(exit_rate),
+        "purchase_date": str(close_date),
+        "maturity_date": str(maturity_date)
+    })
+
+def day_closed(close_date, deposit, withdrawal, idle_cash, invested):
+    return event(DAY_CLOSED, close_date, detail={
+        "deposit": str(deposit),
+        "withdrawal": str(withdrawal),
+        "idle_cash": str(idle_cash),
+        "invested": str(invested)
+    })
+
+# --- Journaled statements (the change and its events in one round trip) ---
+
+def cancel(cur, tx_id):
+    cur.execute("""
+        WITH gone AS (
+            DELETE FROM pending_ledger WHERE id = %s AND status = 'PENDING' RETURNING id
+        )
+        INSERT INTO ledger_events (event_type, tx_id) SELECT 'CANCELED', id FROM gone
+    """, (tx_id,))
+
+def amend(cur, tx_id, new_amount):
+    cur.execute("""
+        WITH amended AS (
+            UPDATE pending_ledger SET amount = %s WHERE id = %s AND status = 'PENDING' RETURNING id, amount
+        )
+        INSERT INTO ledger_events (event_type, tx_id, amount) SELECT 'AMENDED', id, amount FROM amended
+    """, (new_amount, tx_id))
+
+def settle(cur, close_date, ids=None):
+    """Completes the given pending rows (all PENDING rows when ids is None)."""
+    where, params = ("id = ANY(%s)", [ids]) if ids is not None else ("status = 'PENDING'", [])
+    cur.execute(f"""
+        WITH done AS (
+            UPDATE pending_ledger SET status = 'COMPLETED' WHERE {where} RETURNING id
+        )
+        INSERT INTO ledger_events (event_type, business_date, tx_id) SELECT 'SETTLED', %s, id FROM done
+    """, params + [close_date])
+
+def accrue(cur, close_date):
+    """
+    Daily accrual on every ACTIVE lot (money.py rounding policy); journals each lot's
+    resulting accrued_interest and adds the day's interest to bank_exposure.
+    """
+    cur.execute(f"""
+        WITH accrued AS (
+            UPDATE portfolio SET accrued_interest = accrued_interest + {ACCRUAL_CENTS_SQL} * 0.01
+            WHERE status = 'ACTIVE'
+            RETURNING id, accrued_interest, bank_name, maturity_date, {ACCRUAL_CENTS_SQL} AS accrued_delta
+        ), {exposure.accrued_cte("accrued")}
+        INSERT INTO ledger_events (event_type, business_date, portfolio_id, amount)
+        SELECT 'ACCRUAL', %s, id, accrued_interest FROM accrued
+    """, (close_date,))
+
+def delete_zeroed_lots(cur, close_date):
+    """
+    Moves lots whose principal reached zero to portfolio_archive (leftover STAGED placeholders
+    just go) and out of bank_exposure.
+    """
+    cur.execute(f"""
+        WITH gone AS (
+            DELETE FROM portfolio WHERE principal <= 0
+            RETURNING id, bank_name, principal, accrued_interest, annual_rate_m, annual_rate_n,
+                      purchase_date, maturity_date, status, principal_cents, accrued_cents
+        ), archived AS (
+            INSERT INTO portfolio_archive (id, bank_name, principal, accrued_interest, annual_rate_m, annual_rate_n,
+                                           purchase_date, maturity_date, status, archived_on)
+            SELECT id, bank_name, principal, accrued_interest, annual_rate_m, annual_rate_n,
+                   purchase_date, maturity_date, status, %s
+            FROM gone WHERE status <> 'STAGED'
+        ), {exposure.deleted_cte("gone")}
+        INSERT INTO ledger_events (event_type, business_date, portfolio_id) SELECT 'LOT_DELETED', %s, id FROM gone
+    """, (close_date, close_date))
+    exposure.prune(cur)
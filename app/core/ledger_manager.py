@@ -1,95 +1,207 @@
-import psycopg2
-from decimal import Decimal
+from psycopg2.extras import execute_values
 from datetime import date
-import os
-import sys
+import heapq
+import threading
 
-# Ensure config is accessible
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app.config import PSYCOPG2_CONFIG
+from app.config import PSYCOPG2_CONFIG, LEDGER_GROUP_COMMIT, LEDGER_GROUP_COMMIT_MAX_ROWS, LEDGER_GROUP_COMMIT_WINDOW_MS
+from app.database.connection import get_connection
+from app.core.generation import bump_generation
+from app.core.metrics import metrics
+from app.core.group_commit import GroupCommitBatcher
+from app.core import ledger_events
+from app.core.money import from_cents
+from app.database.sharding import is_sharded, shard_for_user, shard_for_tx, shard_config, fan_out
+
+QUEUED = metrics.counter("ledger_requests_queued_total", "Requests written to the pending ledger", ("type",))
+
+def _bump(conn):
+    """The generation sequence lives on the primary; shard connections can't advance it."""
+    bump_generation(None if is_sharded() else conn)
+
+class _GroupWriter:
+    """Flush target for the group-commit batcher: one multi-row INSERT, one commit, on a reused connection."""
+    def __init__(self, conn_params):
+        self.conn_params = conn_params
+        self.conn = None
+
+    def write(self, rows):
+        if self.conn is None or self.conn.closed:
+            self.conn = get_connection(self.conn_params)
+        with self.conn:
+            with self.conn.cursor() as cur:
+                # Postgres returns RETURNING rows of a single VALUES insert in input order
+                ids = execute_values(cur, f"""
+                    WITH ins AS (
+                        INSERT INTO pending_ledger (user_id, type, amount, portfolio_id)
+                        VALUES %s
+                        RETURNING {ledger_events.PENDING_RETURNING}
+                    ), {ledger_events.QUEUED_CTE}
+                    SELECT id FROM ins
+                """, rows, page_size=len(rows), fetch=True)
+        _bump(self.conn)
+        return [r[0] for r in ids]
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+def _get_batcher(shard, max_rows, window_ms):
+    """One shared batcher per (shard, rows, window), so every LedgerManager in the process groups together."""
+    key = (shard, max_rows, window_ms)
+    with _batchers_lock:
+        if key not in _batchers:
+            writer = _GroupWriter(shard_config(shard))
+            _batchers[key] = GroupCommitBatcher(writer.write, max_rows, window_ms,
+                                                name=f"ledger-group-commit-s{shard}-{window_ms}ms")
+        return _batchers[key]
 
 class LedgerManager:
     """
     Handles the Transaction Queue (Pending Ledger) and daily aggregation.
     Updated V3.1: Includes granular management for editing/canceling pending entries.
+    Sharded: writes route by user_id (or by the strided tx id); reads fan out and merge.
+    Every write journals its ledger_events row in the same statement.
     """
-    def __init__(self):
+    def __init__(self, group_commit=LEDGER_GROUP_COMMIT,
+                 group_max_rows=LEDGER_GROUP_COMMIT_MAX_ROWS, group_window_ms=LEDGER_GROUP_COMMIT_WINDOW_MS):
         self.conn_params = PSYCOPG2_CONFIG
+        self.group_commit = group_commit
+        self.group_max_rows = group_max_rows
+        self.group_window_ms = group_window_ms
 
     def queue_request(self, user_id, req_type, amount, portfolio_id=None):
-        """Adds a request to the queue for later aggregation."""
-        conn = psycopg2.connect(**self.conn_params)
+        """Adds a request to the queue for later aggregation. Returns the new row id."""
+        req_type = req_type.upper()
+        shard = shard_for_user(user_id)
+        if self.group_commit:
+            # Blocks until the shared group containing this row has committed
+            batcher = _get_batcher(shard, self.group_max_rows, self.group_window_ms)
+            row_id = batcher.submit((user_id, req_type, amount, portfolio_id)).result()
+            QUEUED.inc(req_type)
+            return row_id
+
+        conn = get_connection(shard_config(shard))
         with conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO pending_ledger (user_id, type, amount, portfolio_id)
-                    VALUES (%s, %s, %s, %s)
-                """, (user_id, req_type.upper(), amount, portfolio_id))
+                cur.execute(f"""
+                    WITH ins AS (
+                        INSERT INTO pending_ledger (user_id, type, amount, portfolio_id)
+                        VALUES (%s, %s, %s, %s)
+                        RETURNING {ledger_events.PENDING_RETURNING}
+                    ), {ledger_events.QUEUED_CTE}
+                    SELECT id FROM ins
+                """, (user_id, req_type, amount, portfolio_id))
+                row_id = cur.fetchone()[0]
+        _bump(conn)
         conn.close()
-        return True
+        QUEUED.inc(req_type)
+        return row_id
 
-    def get_pending_list(self):
-        """Fetches individual pending transactions for the FrontOffice UI."""
-        conn = psycopg2.connect(**self.conn_params)
-        with conn:
+    PENDING_COLUMNS = ("id", "user_id", "type", "amount", "portfolio_id", "created_at")
+
+    def queue_batch(self, entries):
+        """
+        Inserts many requests in one statement and one commit.
+        entries: (intake_id, user_id, req_type, amount, portfolio_id) tuples. Rows whose
+        intake_id already exists are skipped, so replaying a batch is harmless.
+        Returns the number of rows actually inserted.
+        """
+        if not entries:
+            return 0
+        by_shard = {}
+        for i, u, t, a, p in entries:
+            by_shard.setdefault(shard_for_user(u), []).append((i, u, t.upper(), a, p))
+
+        count = 0
+        bump_conn = None # Last connection that inserted rows, kept open for the one bump after every commit
+        for shard, rows in by_shard.items():
+            conn = get_connection(shard_config(shard))
+            with conn:
+                with conn.cursor() as cur:
+                    inserted = execute_values(cur, f"""
+                        WITH ins AS (
+                            INSERT INTO pending_ledger (intake_id, user_id, type, amount, portfolio_id)
+                            VALUES %s
+                            ON CONFLICT (intake_id) DO NOTHING
+                            RETURNING {ledger_events.PENDING_RETURNING}
+                        ), {ledger_events.QUEUED_CTE}
+                        SELECT type FROM ins
+                    """, rows, page_size=len(rows), fetch=True)
+            for (req_type,) in inserted:
+                QUEUED.inc(req_type)
+            count += len(inserted)
+            if inserted:
+                if bump_conn is not None:
+                    bump_conn.close()
+                bump_conn = conn
+            else:
+                conn.close()
+        if bump_conn is not None:
+            # A fully replayed batch (every intake_id already queued) changes nothing to invalidate
+            _bump(bump_conn)
+            bump_conn.close()
+        return count
+
+    def get_pending_rows(self):
+        """Raw pending rows (amounts stay Decimal) in PENDING_COLUMNS order, for direct serialization."""
+        def fetch(shard, conn):
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT id, user_id, type, amount, portfolio_id, created_at 
+                    SELECT id, user_id, type, amount, portfolio_id, to_char(created_at, 'HH24:MI:SS'), created_at
                     FROM pending_ledger 
                     WHERE status = 'PENDING' 
                     ORDER BY created_at DESC
                 """)
-                rows = cur.fetchall()
-        conn.close()
-        return [{
-            "id": r[0], 
-            "user_id": r[1], 
-            "type": r[2], 
-            "amount": float(r[3]), 
-            "portfolio_id": r[4], 
-            "created_at": r[5].strftime("%H:%M:%S")
-        } for r in rows]
+                return cur.fetchall()
+
+        # Each shard is already newest-first; merge keeps the global order
+        merged = heapq.merge(*fan_out(fetch, read_only=True), key=lambda r: r[6], reverse=True)
+        return [r[:6] for r in merged]
+
+    def get_pending_list(self):
+        """Fetches individual pending transactions for the FrontOffice UI."""
+        return [dict(zip(self.PENDING_COLUMNS, r)) for r in self.get_pending_rows()]
 
     def cancel_pending(self, tx_id):
         """Removes a specific transaction from the pending queue."""
-        conn = psycopg2.connect(**self.conn_params)
+        conn = get_connection(shard_config(shard_for_tx(tx_id)))
         with conn:
             with conn.cursor() as cur:
-                cur.execute("DELETE FROM pending_ledger WHERE id = %s AND status = 'PENDING'", (tx_id,))
+                ledger_events.cancel(cur, tx_id)
+        _bump(conn)
         conn.close()
         return True
 
     def update_pending(self, tx_id, new_amount):
         """Updates the amount for an existing pending entry."""
-        conn = psycopg2.connect(**self.conn_params)
+        conn = get_connection(shard_config(shard_for_tx(tx_id)))
         with conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE pending_ledger 
-                    SET amount = %s 
-                    WHERE id = %s AND status = 'PENDING'
-                """, (new_amount, tx_id))
+                ledger_events.amend(cur, tx_id, new_amount)
+        _bump(conn)
         conn.close()
         return True
 
     def get_daily_aggregation(self):
         """Aggregates all PENDING requests for the Treasury summary."""
-        conn = psycopg2.connect(**self.conn_params)
-        with conn:
+        def aggregate(shard, conn):
             with conn.cursor() as cur:
+                # SUM(bigint) is numeric; cast back so the driver hands over plain ints
                 cur.execute("""
                     SELECT 
-                        SUM(CASE WHEN type = 'DEPOSIT' THEN amount ELSE 0 END) as total_dep,
-                        SUM(CASE WHEN type = 'WITHDRAWAL' THEN amount ELSE 0 END) as total_wit,
+                        COALESCE(SUM(CASE WHEN type = 'DEPOSIT' THEN amount_cents ELSE 0 END), 0)::bigint as total_dep,
+                        COALESCE(SUM(CASE WHEN type = 'WITHDRAWAL' THEN amount_cents ELSE 0 END), 0)::bigint as total_wit,
                         COUNT(*) as request_count
                     FROM pending_ledger 
                     WHERE status = 'PENDING'
                 """)
-                res = cur.fetchone()
-        conn.close()
+                return cur.fetchone()
+
+        parts = fan_out(aggregate)
+        total_dep = sum(p[0] for p in parts)
+        total_wit = sum(p[1] for p in parts)
         return {
-            "total_deposit": res[0] or Decimal('0'),
-            "total_withdrawal": res[1] or Decimal('0'),
-            "net_flow": (res[0] or Decimal('0')) - (res[1] or Decimal('0')),
-            "count": res[2]
+            "total_deposit": from_cents(total_dep),
+            "total_withdrawal": from_cents(total_wit),
+            "net_flow": from_cents(total_dep - total_wit),
+            "count": sum(p[2] for p in parts)
         }
\ No newline at end of file
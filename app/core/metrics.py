@@ -0,0 +1,165 @@
+import threading
+import time
+from bisect import bisect_left
+
+from app.config import METRICS_ENABLED
+
+# Seconds. Covers single-row queries through multi-minute closes.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class _NoopTimer:
+    """Shared do-nothing context manager returned while metrics are disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_TIMER = _NoopTimer()
+
+class _Timer:
+    __slots__ = ("metric", "labels", "start")
+
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metric.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name, help_text, labelnames):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _label_str(self, labels, extra=None):
+        pairs = list(zip(self.labelnames, labels))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.registry.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{self._label_str(labels)} {value}"
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by a callback yielding (labels, value)."""
+    kind = "gauge"
+
+    def __init__(self, registry, name, help_text, labelnames, callback=None):
+        super().__init__(registry, name, help_text, labelnames)
+        self.callback = callback
+
+    def set(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        with self.registry.lock:
+            self.values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.registry.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def samples(self):
+        items = list(self.callback()) if self.callback else list(self.values.items())
+        for labels, value in items:
+            yield f"{self.name}{self._label_str(labels)} {value}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        idx = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            state = self.values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts + overflow slot, sum, count
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, *labels):
+        """Context manager observing elapsed seconds. Free when metrics are disabled."""
+        if not self.registry.enabled:
+            return _NOOP_TIMER
+        return _Timer(self, labels)
+
+    def samples(self):
+        for labels, (counts, total, count) in self.values.items():
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                yield f"{self.name}_bucket{self._label_str(labels, ('le', bound))} {running}"
+            yield f"{self.name}_bucket{self._label_str(labels, ('le', '+Inf'))} {count}"
+            yield f"{self.name}_sum{self._label_str(labels)} {total}"
+            yield f"{self.name}_count{self._label_str(labels)} {count}"
+
+class MetricsRegistry:
+    """
+    Process-local metrics in the Prometheus text exposition format.
+    When disabled, every recording call returns before taking the lock.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.RLock() # Gauge callbacks may record while rendering
+        self.metrics = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=(), callback=None):
+        return self._add(Gauge(self, name, help_text, labelnames, callback))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self, name, help_text, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for m in self.metrics:
+                lines.append(f"# HELP {m.name} {m.help}")
+                lines.append(f"# TYPE {m.name} {m.kind}")
+                lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
@@ -0,0 +1,69 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Money in process is an int count of cents (the minor unit of DECIMAL(20, 2)); Decimal
+# only appears at the edges: parsing free-form input, SQL parameters, JSON output.
+# The BIGINT *_cents columns (schema.py) let hot reads skip numeric -> Decimal as well.
+
+CENTS = 100
+CENT = Decimal('0.01')
+RATE_SCALE = 100000 # annual_rate_m / annual_rate_n are DECIMAL(10, 5)
+RATE_QUANTUM = Decimal('0.00001')
+# Largest amount a BIGINT *_cents column holds (~9.2e16 units; DECIMAL(20, 2) alone would allow 1e18)
+MAX_CENTS = 2 ** 63 - 1
+
+def to_cents(amount):
+    """
+    Cents for an int, str, Decimal or float amount, rounded half away from zero like a
+    DECIMAL(20, 2) assignment. Canonical strings ("1234.50", "1234") skip Decimal entirely.
+    Raises ValueError for anything that is not a finite number.
+    """
+    if type(amount) is int:
+        return amount * CENTS
+    if isinstance(amount, str):
+        whole, dot, frac = amount.partition(".")
+        if len(frac) == 2 and whole.isdecimal() and frac.isdecimal() and amount.isascii():
+            return int(whole + frac)
+        if not dot and amount.isdecimal() and amount.isascii():
+            return int(amount) * CENTS
+    elif isinstance(amount, float):
+        amount = repr(amount) # Shortest round-trip text: 0.1 -> '0.1', never 0.1000000000000000055...
+    try:
+        value = amount if isinstance(amount, Decimal) else Decimal(amount if isinstance(amount, str) else str(amount))
+        return int(value.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Not an amount: {amount!r}") from None
+
+def from_cents(cents):
+    """Exact Decimal with two places (12345 -> Decimal('123.45')), for SQL parameters and JSON."""
+    return Decimal(cents).scaleb(-2)
+
+def format_cents(cents):
+    """Plain text with two places (-5 -> '-0.05'), e.g. for COPY."""
+    sign = "-" if cents < 0 else ""
+    whole, frac = divmod(abs(cents), CENTS)
+    return f"{sign}{whole}.{frac:02d}"
+
+def to_rate(rate):
+    """A rate as the database stores it (DECIMAL(10, 5))."""
+    return Decimal(str(rate)).quantize(RATE_QUANTUM, rounding=ROUND_HALF_UP)
+
+def rate_units(rate):
+    """A rate as an int count of 0.00001 (Decimal('8.5') -> 850000)."""
+    return int(to_rate(rate).scaleb(5))
+
+# --- Accrual rounding policy ---
+# One day's interest on a lot is principal * annual_rate_m / 100 / 365, rounded half away
+# from zero to the cent, per lot per day. It is computed on integers, so there is no
+# intermediate rounding: the close (ACCRUAL_CENTS_SQL), FundModel and any replay agree exactly.
+ACCRUAL_DIVISOR = 100 * 365 * RATE_SCALE
+
+def daily_interest(principal_cents, rate):
+    """Cents of interest for one day; rate in rate_units()."""
+    n = principal_cents * rate
+    q = (2 * abs(n) + ACCRUAL_DIVISOR) // (2 * ACCRUAL_DIVISOR)
+    return q if n >= 0 else -q
+
+# Same policy over portfolio columns. numeric arithmetic on integral values is exact and
+# div() truncates, so this is the integer formula above, evaluated by PostgreSQL.
+ACCRUAL_CENTS_SQL = (f"(sign(principal_cents) * div(2 * abs(principal_cents) * annual_rate_m * {RATE_SCALE} "
+                     f"+ {ACCRUAL_DIVISOR}, {2 * ACCRUAL_DIVISOR}))")
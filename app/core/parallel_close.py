@@ -0,0 +1,293 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from datetime import timedelta
+import threading
+import time
+import uuid
+
+from app.config import CLOSE_LOCK_TIMEOUT_MS
+from app.database.connection import get_connection
+from app.database.sharding import SHARD_COUNT, shard_config, fan_out
+from app.core.generation import bump_generation
+from app.core.money import from_cents, to_rate
+from app.core.close_runs import completed_run, record_completed
+from app.core import ledger_events, exposure
+from app.core.ledger_events import event, LOT_WITHDRAWAL
+from app.core.sharded_close import GTRID_PREFIX, COORDINATOR_BRANCH, collect_pending, settle_pending
+from app.core.daily_engine import (CLOSE_SECONDS, CLOSE_PHASE, CLOSE_RUNS, CLOSE_ERRORS,
+                                   CLOSE_PENDING_ROWS)
+
+def _close_partition(conn_params, gtrid, bqual, close_date, lower, upper, new_port_id, lock_timeout_ms):
+    """
+    Worker-process body: closes one user_id range and PREPAREs it.
+    The prepared transaction outlives this connection; the coordinator commits it by xid.
+    """
+    started = time.perf_counter()
+    conn = get_connection(conn_params)
+    try:
+        conn.tpc_begin(conn.xid(0, gtrid, bqual))
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}")
+            ids, per_lot, deposits = collect_pending(conn, close_date, lower, upper)
+            settle_pending(conn, close_date, ids, deposits, new_port_id)
+            conn.tpc_prepare()
+        except Exception:
+            conn.tpc_rollback()
+            raise
+        return {
+            "rows": len(ids),
+            "per_lot": per_lot,
+            "deposits": sum(deposits.values()),
+            "seconds": time.perf_counter() - started
+        }
+    finally:
+        conn.close()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(workers):
+    with _pools_lock:
+        if workers not in _pools:
+            # Never fork: a forked child would share the coordinator's open libpq socket
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _pools[workers]
+
+class ParallelDailyClose:
+    """
+    run_daily_close on a process pool (same semantics as DailyEngine).
+    1. Coordinator: registry lock + guards, then splits every shard's pending batch
+       into user_id ranges (percentile boundaries, so partitions are balanced).
+    2. Workers: one process + one connection per range; withdrawals, deposit mapping
+       and completion for that range only, then PREPARE TRANSACTION.
+    3. Coordinator: lot principals, accrual, new lot, report, registry; PREPARE; then
+       COMMIT PREPARED for itself first and every partition after it.
+    The new lot is staged (status 'STAGED', principal 0) before the workers start so
+    their user_shares rows can reference it; a failed close deletes it again, and any
+    leftover is swept by the next close's zero-principal cleanup.
+    """
+    def __init__(self, engine, workers):
+        self.engine = engine
+        self.workers = workers
+
+    def _plan(self):
+        """(shard, lower, upper) ranges covering every user_id; None = unbounded."""
+        per_shard = max(1, self.workers // SHARD_COUNT)
+        fractions = [i / per_shard for i in range(1, per_shard)]
+
+        def boundaries(shard, conn):
+            if not fractions:
+                return []
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY user_id)
+                    FROM pending_ledger WHERE status = 'PENDING'
+                """, (fractions,))
+                points = cur.fetchone()[0] or []
+            return sorted(set(p for p in points if p is not None))
+
+        plan = []
+        for shard, points in enumerate(fan_out(boundaries)):
+            edges = [None] + points + [None]
+            plan += [(shard, edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+        return plan
+
+    def _stage_lot(self, close_date, new_inv_params):
+        conn = get_connection(self.engine.conn_params)
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        INSERT INTO portfolio (bank_name, principal, annual_rate_m, annual_rate_n, purchase_date, maturity_date, status)
+                        VALUES (%s, 0, %s, %s, %s, %s, 'STAGED') RETURNING id
+                    """, (new_inv_params.get('bank'),
+                          to_rate(new_inv_params.get('rate')),
+                          to_rate(new_inv_params.get('early_rate')),
+                          close_date,
+                          close_date + timedelta(days=int(new_inv_params.get('duration')))))
+                    return cur.fetchone()[0]
+        finally:
+            conn.close()
+
+    def _unstage_lot(self, lot_id):
+        conn = get_connection(self.engine.conn_params)
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM portfolio WHERE id = %s AND status = 'STAGED'", (lot_id,))
+        finally:
+            conn.close()
+
+    def _finish_branches(self, gtrid, branches, commit):
+        """COMMIT/ROLLBACK PREPARED for each (shard, bqual); returns the first error, if any."""
+        error = None
+        for shard, bqual in branches:
+            conn = get_connection(shard_config(shard))
+            try:
+                xid = conn.xid(0, gtrid, bqual)
+                if commit:
+                    conn.tpc_commit(xid)
+                else:
+                    conn.tpc_rollback(xid)
+            except Exception as e:
+                error = error or e # Left for resolve_in_doubt(); keep finishing the others
+            finally:
+                conn.close()
+        return error
+
+    def run(self, close_date, new_inv_params=None):
+        started = time.perf_counter()
+        gtrid = f"{GTRID_PREFIX}:{close_date}:{uuid.uuid4().hex[:12]}"
+        conn = self.engine.get_connection()
+        staged_id = None
+        prepared = [] # (shard, bqual) of partitions that reached PREPARE
+        coordinator_done = False
+        phase = "guard"
+        try:
+            conn.tpc_begin(conn.xid(0, gtrid, COORDINATOR_BRANCH))
+            with conn.cursor() as cur:
+                # 1. Timeline Guard
+                with CLOSE_PHASE.time(phase):
+                    cur.execute("""
+                        SELECT (total_idle_cash * 100)::bigint, (total_invested * 100)::bigint, last_close_date
+                        FROM fund_registry FOR UPDATE
+                    """)
+                    idle_cash, invested, last_date = cur.fetchone()
+
+                if last_date:
+                    if close_date <= last_date and completed_run(cur, close_date):
+                        CLOSE_RUNS.inc("replayed")
+                        conn.tpc_rollback()
+                        return True, f"Day {close_date} already closed."
+                    if close_date <= last_date:
+                        CLOSE_RUNS.inc("rejected")
+                        conn.tpc_rollback()
+                        return False, f"Date {close_date} is already closed."
+                    if close_date > last_date + timedelta(days=1):
+                        CLOSE_RUNS.inc("rejected")
+                        conn.tpc_rollback()
+                        return False, f"Gap detected. Next expected date: {last_date + timedelta(days=1)}"
+
+                phase = "plan"
+                with CLOSE_PHASE.time(phase):
+                    plan = self._plan()
+                    if new_inv_params:
+                        staged_id = self._stage_lot(close_date, new_inv_params)
+
+                # 2-3. Partitions in parallel (withdrawals, deposit mapping, completion)
+                phase = "partitions"
+                with CLOSE_PHASE.time(phase):
+                    pool = _get_pool(self.workers)
+                    futures = [(shard, f"part-{k}", pool.submit(_close_partition, shard_config(shard), gtrid,
+                                                                f"part-{k}", close_date, lower, upper, staged_id,
+                                                                CLOSE_LOCK_TIMEOUT_MS))
+                               for k, (shard, lower, upper) in enumerate(plan)]
+                    results = []
+                    failure = None
+                    for shard, bqual, future in futures:
+                        try:
+                            results.append(future.result())
+                            prepared.append((shard, bqual))
+                        except Exception as e:
+                            failure = failure or e
+                    if failure:
+                        raise failure
+                CLOSE_PENDING_ROWS.observe(sum(r["rows"] for r in results))
+                for r in results:
+                    CLOSE_PHASE.observe(r["seconds"], "partition_worker")
+
+                # Lock waits against prepared partitions would never resolve on their own
+                cur.execute(f"SET LOCAL lock_timeout = {int(CLOSE_LOCK_TIMEOUT_MS)}")
+
+                phase = "withdrawals"
+                with CLOSE_PHASE.time(phase):
+                    per_lot = {}
+                    for r in results:
+                        for port_id, amount in r["per_lot"].items():
+                            per_lot[port_id] = per_lot.get(port_id, 0) + amount
+                    total_wit = 0
+                    for port_id, amount in per_lot.items():
+                        cur.execute("UPDATE portfolio SET principal = principal - %s WHERE id = %s", (from_cents(amount), port_id))
+                        self.engine._touch_lot(cur, port_id, -from_cents(amount))
+                        total_wit += amount
+                    total_dep = sum(r["deposits"] for r in results)
+                    invested -= total_wit
+                    ledger_events.record(cur, [event(LOT_WITHDRAWAL, close_date, portfolio_id=p, amount=from_cents(a))
+                                               for p, a in per_lot.items()])
+                    exposure.withdraw(cur, per_lot)
+
+                # 4. Accrue Interest (Daily) - the staged lot is not ACTIVE yet
+                phase = "accrual"
+                with CLOSE_PHASE.time(phase):
+                    ledger_events.accrue(cur, close_date)
+
+                # 5. Activate the new lot (or drop it when nothing was deposited)
+                current_idle = idle_cash + total_dep - total_wit
+                current_invested = invested
+                if staged_id is not None:
+                    phase = "investment"
+                    with CLOSE_PHASE.time(phase):
+                        if total_dep > 0:
+                            cur.execute("UPDATE portfolio SET principal = %s, status = 'ACTIVE' WHERE id = %s",
+                                        (from_cents(total_dep), staged_id))
+                            self.engine._touch_lot(cur, staged_id, from_cents(total_dep))
+                            exposure.lot_opened(cur, staged_id)
+                            # Journaled on activation: the staged row is only a placeholder
+                            ledger_events.record(cur, [ledger_events.lot_created(
+                                close_date, staged_id, new_inv_params.get('bank'), from_cents(total_dep),
+                                to_rate(new_inv_params.get('rate')), to_rate(new_inv_params.get('early_rate')),
+                                close_date + timedelta(days=int(new_inv_params.get('duration'))))])
+                            current_idle -= total_dep
+                            current_invested += total_dep
+                        else:
+                            cur.execute("DELETE FROM portfolio WHERE id = %s", (staged_id,))
+
+                # 6. Final Sync & Audit Report
+                phase = "report"
+                with CLOSE_PHASE.time(phase):
+                    report = (close_date, from_cents(total_dep), from_cents(total_wit),
+                              from_cents(current_idle), from_cents(current_invested))
+                    cur.execute("""
+                        INSERT INTO daily_reports (report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, report)
+                    cur.execute("UPDATE fund_registry SET total_idle_cash = %s, total_invested = %s, last_close_date = %s", (report[3], report[4], close_date))
+                    ledger_events.record(cur, [ledger_events.day_closed(*report)])
+                    record_completed(cur, close_date, new_inv_params, total_dep, total_wit)
+
+                phase = "cleanup"
+                with CLOSE_PHASE.time(phase):
+                    ledger_events.delete_zeroed_lots(cur, close_date)
+
+            # Coordinator commits first: from here on the close has happened, and
+            # resolve_in_doubt() would commit any partition this process fails to.
+            phase = "commit"
+            with CLOSE_PHASE.time(phase):
+                conn.tpc_prepare()
+                conn.tpc_commit()
+                coordinator_done = True
+                error = self._finish_branches(gtrid, prepared, commit=True)
+            if error:
+                CLOSE_ERRORS.inc(phase)
+
+            bump_generation(None)
+            CLOSE_RUNS.inc("success")
+            return True, f"Day {close_date} successfully closed."
+        except Exception as e:
+            if not coordinator_done:
+                try:
+                    conn.tpc_rollback()
+                except Exception:
+                    pass
+                self._finish_branches(gtrid, prepared, commit=False)
+                if staged_id is not None:
+                    self._unstage_lot(staged_id)
+            CLOSE_RUNS.inc("error")
+            CLOSE_ERRORS.inc(phase)
+            return False, str(e)
+        finally:
+            CLOSE_SECONDS.observe(time.perf_counter() - started)
+            conn.close()
@@ -0,0 +1,77 @@
+from collections import deque
+from datetime import datetime
+import json
+import threading
+import os
+
+from app.config import (QUERY_PROFILING, SLOW_QUERY_MS, SLOW_QUERY_LOG,
+                        SLOW_QUERY_LOG_MAX_BYTES, SLOW_QUERY_LOG_BACKUPS, SLOW_QUERY_BUFFER)
+
+def params_shape(params):
+    """Describes bound parameters by type only; values never reach the log."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: _type_name(v) for k, v in params.items()}
+    return [_type_name(v) for v in params]
+
+def _type_name(value):
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+class SlowQueryLog:
+    """
+    Slow statements captured by the profiling cursor.
+    Kept in a bounded in-memory ring (for the dashboard view) and appended as
+    JSON lines to a size-rotated local log file.
+    """
+    def __init__(self, enabled, threshold_ms, path, max_bytes, backups, buffer_size):
+        self.enabled = enabled
+        self.threshold = threshold_ms / 1000.0
+        self.path = path
+        self.entries = deque(maxlen=buffer_size)
+        self.captured = 0
+        self._lock = threading.Lock()
+        self._logger = None
+        self._log_args = (max_bytes, backups)
+
+    def _get_logger(self):
+        # Created on first capture so merely importing never touches the filesystem
+        # (or pays for importing logging)
+        if self._logger is None:
+            import logging.handlers
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self._log_args[0], backupCount=self._log_args[1])
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("ledger.slow_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def record(self, statement, params, duration, rows, plan):
+        entry = {
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "statement": " ".join(statement.split())[:2000],
+            "params": params_shape(params),
+            "duration_ms": round(duration * 1000, 3),
+            "rows": rows,
+            "plan": plan
+        }
+        with self._lock:
+            self.entries.append(entry)
+            self.captured += 1
+            self._get_logger().info(json.dumps(entry, default=str))
+        return entry
+
+    def recent(self, limit=None):
+        with self._lock:
+            items = list(self.entries)
+        items.reverse() # Newest first
+        return items[:limit] if limit else items
+
+slow_queries = SlowQueryLog(QUERY_PROFILING, SLOW_QUERY_MS, SLOW_QUERY_LOG,
+                            SLOW_QUERY_LOG_MAX_BYTES, SLOW_QUERY_LOG_BACKUPS, SLOW_QUERY_BUFFER)
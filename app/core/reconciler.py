@@ -0,0 +1,210 @@
+from decimal import Decimal
+
+from app.config import PSYCOPG2_CONFIG
+from psycopg2.extras import execute_values
+from app.database.connection import get_connection
+from app.database.sharding import is_sharded, fan_out
+from app.core import exposure
+
+class ReconciliationEngine:
+    """
+    Proves SUM(user_shares) == SUM(portfolio.principal) == registry.total_invested.
+    1. Incremental: Verifies only lots flagged dirty by the close (O(changed lots)).
+    2. Full: Rescans every lot for nightly runs and re-anchors the fund baseline. It also
+       checks bank_exposure against a recompute over portfolio and resyncs any drift.
+    Sharded: share sums come from every shard's user_shares; lot bookkeeping stays on the primary.
+    """
+    def __init__(self):
+        self.conn_params = PSYCOPG2_CONFIG
+
+    def run_incremental(self):
+        """Checks lots touched since the last run. Falls back to a full scan without a baseline."""
+        conn = get_connection(self.conn_params)
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    # Serialize with run_daily_close, which locks the registry first
+                    cur.execute("SELECT total_invested FROM fund_registry FOR UPDATE")
+                    registry_invested = cur.fetchone()[0]
+
+                    cur.execute("SELECT claims_total FROM reconciliation_runs ORDER BY id DESC LIMIT 1")
+                    baseline = cur.fetchone()
+                    if baseline is None:
+                        return self._full_scan(cur, registry_invested)
+                    baseline = baseline[0]
+
+                    cur.execute("""
+                        SELECT t.portfolio_id, t.shares_total, t.verified_total, p.principal
+                        FROM lot_share_totals t
+                        LEFT JOIN portfolio p ON p.id = t.portfolio_id
+                        WHERE t.dirty
+                    """)
+                    rows = cur.fetchall()
+                    owned_by_lot = self._owned_by_lot(cur, [r[0] for r in rows]) if rows else {}
+
+                    discrepancies = []
+                    cleared = []
+                    claims_now = baseline
+                    claims_verified = baseline
+                    for pid, tracked, verified, principal in rows:
+                        owned = owned_by_lot.get(pid, Decimal('0'))
+                        delta = tracked - verified
+                        claims_now += delta
+                        issue = self._check_lot(pid, tracked, owned, principal)
+                        if issue:
+                            discrepancies.append(issue)
+                        else:
+                            cleared.append(pid)
+                            claims_verified += delta
+
+                    self._clear_lots(cur, cleared)
+                    return self._record(cur, "incremental", len(rows), discrepancies,
+                                        claims_now, claims_verified, registry_invested)
+        finally:
+            conn.close()
+
+    def run_full(self):
+        """Nightly mode: rescans all lots and rebuilds the per-lot totals baseline."""
+        conn = get_connection(self.conn_params)
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT total_invested FROM fund_registry FOR UPDATE")
+                    registry_invested = cur.fetchone()[0]
+                    return self._full_scan(cur, registry_invested)
+        finally:
+            conn.close()
+
+    def _owned_by_lot(self, cur, portfolio_ids=None):
+        """SUM(principal_owned) per lot (all lots, or just portfolio_ids), summed across shards."""
+        sql = "SELECT portfolio_id, SUM(principal_owned) FROM user_shares"
+        params = None
+        if portfolio_ids is not None:
+            sql += " WHERE portfolio_id = ANY(%s)"
+            params = (list(portfolio_ids),)
+        sql += " GROUP BY portfolio_id"
+
+        if not is_sharded():
+            cur.execute(sql, params)
+            return dict(cur.fetchall())
+
+        def fetch(shard, conn):
+            with conn.cursor() as shard_cur:
+                shard_cur.execute(sql, params)
+                return shard_cur.fetchall()
+
+        owned = {}
+        for rows in fan_out(fetch):
+            for pid, amount in rows:
+                owned[pid] = owned.get(pid, Decimal('0')) + amount
+        return owned
+
+    def _full_scan(self, cur, registry_invested):
+        cur.execute("""
+            SELECT COALESCE(p.id, t.portfolio_id), t.shares_total, p.principal
+            FROM portfolio p
+            FULL OUTER JOIN lot_share_totals t ON t.portfolio_id = p.id
+        """)
+        lots = {pid: (tracked, principal) for pid, tracked, principal in cur.fetchall()}
+        owned_by_lot = self._owned_by_lot(cur)
+        for pid in owned_by_lot:
+            lots.setdefault(pid, (None, None))
+
+        discrepancies = []
+        drained = []
+        claims_total = Decimal('0')
+        for pid, (tracked, principal) in lots.items():
+            owned = owned_by_lot.get(pid, Decimal('0'))
+            claims_total += owned
+            if principal is None and owned == 0:
+                drained.append(pid) # Archived by the close; only zero shares point at it
+            # A lot that predates lot_share_totals has no row yet: it is seeded below, not reported
+            issue = self._check_lot(pid, owned if tracked is None else tracked, owned, principal)
+            if issue:
+                discrepancies.append(issue)
+        self._drop_drained(cur, drained)
+        for pid in drained:
+            owned_by_lot.pop(pid, None)
+
+        # Re-anchor: running totals restart from what the shares tables actually hold
+        if owned_by_lot:
+            execute_values(cur, """
+                INSERT INTO lot_share_totals (portfolio_id, shares_total, verified_total, dirty)
+                VALUES %s
+                ON CONFLICT (portfolio_id) DO UPDATE
+                SET shares_total = EXCLUDED.shares_total,
+                    verified_total = EXCLUDED.verified_total,
+                    dirty = FALSE
+            """, [(pid, amount, amount, False) for pid, amount in owned_by_lot.items()])
+        cur.execute("DELETE FROM lot_share_totals WHERE NOT (portfolio_id = ANY(%s))", (list(owned_by_lot),))
+
+        # The exposure index is derived from portfolio alone: drift is reported, then recomputed
+        drift = exposure.verify(cur)
+        if drift:
+            exposure.rebuild(cur)
+        result = self._record(cur, "full", len(lots), discrepancies,
+                              claims_total, claims_total, registry_invested)
+        result["exposure_drift"] = drift
+        result["clean"] = result["clean"] and not drift
+        return result
+
+    def _check_lot(self, pid, tracked, owned, principal):
+        """Returns discrepancy details for one lot, or None if it balances."""
+        lot_exists = principal is not None
+        principal = principal if lot_exists else Decimal('0')
+        if tracked == owned == principal:
+            return None
+        return {
+            "portfolio_id": pid,
+            "tracked_shares": tracked,
+            "actual_shares": owned,
+            "principal": principal,
+            "lot_exists": lot_exists
+        }
+
+    def _clear_lots(self, cur, portfolio_ids):
+        if not portfolio_ids:
+            return
+        cur.execute("""
+            UPDATE lot_share_totals SET verified_total = shares_total, dirty = FALSE
+            WHERE portfolio_id = ANY(%s)
+        """, (portfolio_ids,))
+        # Drop bookkeeping for lots the close has deleted and fully drained
+        cur.execute("""
+            DELETE FROM lot_share_totals t
+            WHERE t.portfolio_id = ANY(%s) AND t.shares_total = 0
+              AND NOT EXISTS (SELECT 1 FROM portfolio p WHERE p.id = t.portfolio_id)
+            RETURNING t.portfolio_id
+        """, (portfolio_ids,))
+        self._drop_drained(cur, [r[0] for r in cur.fetchall()])
+
+    def _drop_drained(self, cur, portfolio_ids):
+        """Deletes the zero user_shares rows of archived lots, so a full scan doesn't track them again."""
+        if not portfolio_ids:
+            return
+        sql = "DELETE FROM user_shares WHERE portfolio_id = ANY(%s) AND principal_owned = 0"
+        if not is_sharded():
+            cur.execute(sql, (list(portfolio_ids),))
+            return
+
+        def drop(shard, conn):
+            with conn:
+                with conn.cursor() as shard_cur:
+                    shard_cur.execute(sql, (list(portfolio_ids),))
+        fan_out(drop)
+
+    def _record(self, cur, mode, lots_checked, discrepancies, claims_now, claims_verified, registry_invested):
+        cur.execute("""
+            INSERT INTO reconciliation_runs (mode, lots_checked, discrepancies, claims_total, registry_invested)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (mode, lots_checked, len(discrepancies), claims_verified, registry_invested))
+        fund_diff = claims_now - registry_invested
+        return {
+            "mode": mode,
+            "lots_checked": lots_checked,
+            "discrepancies": discrepancies,
+            "claims_total": claims_now,
+            "registry_invested": registry_invested,
+            "fund_diff": fund_diff,
+            "clean": not discrepancies and fund_diff == 0
+        }
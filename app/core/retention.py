@@ -0,0 +1,164 @@
+from datetime import date, timedelta
+import time
+
+from psycopg2 import errors
+from app.config import PSYCOPG2_CONFIG, REPORT_RETENTION_DAYS, REPORT_PARTITIONS_AHEAD, MAINTENANCE_LOCK_TIMEOUT_MS
+from app.database.connection import get_connection
+from app.core.generation import bump_generation
+
+# daily_reports partitions are named by the month they hold: daily_reports_p202601
+PARTITION_PREFIX = "daily_reports_p"
+DEFAULT_PARTITION = "daily_reports_default"
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def rolls_up_on(month, retention_days=REPORT_RETENTION_DAYS):
+    """First last-close date at which maintain rolls `month` up (see RetentionManager.plan)."""
+    return next_month(month) + timedelta(days=retention_days)
+
+def partition_name(month):
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+def partition_month(name):
+    return date(int(name[-6:-2]), int(name[-2:]), 1)
+
+class RetentionManager:
+    """
+    Keeps the hot daily_reports bounded, online:
+    1. Partitions: one per month, from the oldest day still in the default partition
+       up to REPORT_PARTITIONS_AHEAD months past the last close. Rows already in the
+       default partition are moved into the new partition before it is attached.
+    2. Roll-up: a month that ended more than REPORT_RETENTION_DAYS before the last close
+       becomes one daily_reports_monthly row (flows summed, balances at month end) and
+       its partition is dropped, in the same transaction.
+    Every step is its own short transaction under MAINTENANCE_LOCK_TIMEOUT_MS: if the
+    close or a long reader holds daily_reports, the step is deferred to the next run
+    instead of queueing everyone else behind its lock.
+    """
+    def __init__(self, retention_days=REPORT_RETENTION_DAYS, ahead=REPORT_PARTITIONS_AHEAD,
+                 lock_timeout_ms=MAINTENANCE_LOCK_TIMEOUT_MS):
+        self.conn_params = PSYCOPG2_CONFIG
+        self.retention_days = retention_days
+        self.ahead = ahead
+        self.lock_timeout_ms = lock_timeout_ms
+
+    def plan(self, conn):
+        """(months to partition, months to roll up, last close) from the current catalog."""
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT last_close_date FROM fund_registry")
+                last_close = cur.fetchone()[0]
+                cur.execute("""
+                    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'daily_reports'::regclass AND c.relname LIKE %s
+                """, (PARTITION_PREFIX + "%",))
+                existing = {partition_month(r[0]) for r in cur.fetchall()}
+                cur.execute(f"SELECT DISTINCT date_trunc('month', report_date)::date FROM {DEFAULT_PARTITION}")
+                stray = {r[0] for r in cur.fetchall()}
+
+        anchor = last_close or date.today()
+        wanted = set(stray)
+        month = anchor.replace(day=1)
+        for _ in range(self.ahead + 1):
+            wanted.add(month)
+            month = next_month(month)
+        # Whole months only, and never the month of the last close
+        horizon = anchor - timedelta(days=self.retention_days)
+        expired = {m for m in existing | wanted if next_month(m) <= min(horizon, anchor.replace(day=1))}
+        # Expired months still in the default partition get a partition first, then roll up
+        return sorted(wanted - existing), sorted(expired), last_close
+
+    def run(self, dry_run=False):
+        started = time.perf_counter()
+        conn = get_connection(self.conn_params)
+        summary = {"created": [], "moved_rows": 0, "rolled_up": [], "dropped_rows": 0, "deferred": []}
+        try:
+            create, expired, last_close = self.plan(conn)
+            summary["last_close"] = last_close
+            if dry_run:
+                summary["created"] = [partition_name(m) for m in create]
+                summary["rolled_up"] = [partition_name(m) for m in expired]
+            else:
+                for month in create:
+                    moved = self._attempt(conn, self._create_partition, month, summary)
+                    if moved is not None:
+                        summary["created"].append(partition_name(month))
+                        summary["moved_rows"] += moved
+                deferred = {name for name, _ in summary["deferred"]}
+                for month in expired:
+                    if partition_name(month) in deferred:
+                        continue
+                    dropped = self._attempt(conn, self._roll_up, month, summary)
+                    if dropped is not None:
+                        summary["rolled_up"].append(partition_name(month))
+                        summary["dropped_rows"] += dropped
+
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT COUNT(*) FROM daily_reports")
+                    summary["hot_rows"] = cur.fetchone()[0]
+                    cur.execute("SELECT COUNT(*) FROM daily_reports_monthly")
+                    summary["archived_months"] = cur.fetchone()[0]
+                    cur.execute("SELECT COUNT(*) FROM portfolio_archive")
+                    summary["archived_lots"] = cur.fetchone()[0]
+        finally:
+            conn.close()
+
+        if summary["moved_rows"] or summary["rolled_up"]:
+            bump_generation(None) # /reports now answers from the other tier
+        summary["seconds"] = time.perf_counter() - started
+        return summary
+
+    def _attempt(self, conn, step, month, summary):
+        """Runs one step in its own transaction; None when it had to be deferred."""
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}")
+                    return step(cur, month)
+        except errors.LockNotAvailable:
+            summary["deferred"].append((partition_name(month), "lock timeout"))
+        except errors.CheckViolation:
+            # A close wrote into the default partition for this month meanwhile
+            summary["deferred"].append((partition_name(month), "new rows in the default partition"))
+        return None
+
+    def _create_partition(self, cur, month):
+        """Creates and attaches one month's partition; returns the rows moved out of the default partition."""
+        name, upper = partition_name(month), next_month(month)
+        cur.execute(f"CREATE TABLE {name} (LIKE daily_reports INCLUDING DEFAULTS)")
+        # Matching CHECK: ATTACH trusts it instead of scanning the new table
+        cur.execute(f"""
+            ALTER TABLE {name} ADD CONSTRAINT {name}_bounds
+            CHECK (report_date >= DATE '{month}' AND report_date < DATE '{upper}')
+        """)
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE report_date >= %s AND report_date < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, (month, upper))
+        moved = cur.rowcount
+        cur.execute(f"ALTER TABLE daily_reports ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{upper}')")
+        cur.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds")
+        return moved
+
+    def _roll_up(self, cur, month):
+        """Folds one month into daily_reports_monthly and drops its partition; returns the daily rows dropped."""
+        name = partition_name(month)
+        cur.execute(f"""
+            INSERT INTO daily_reports_monthly (month, first_date, last_date, days, total_deposit, total_withdrawal,
+                                               idle_cash_at_close, invested_at_close)
+            SELECT %s, MIN(report_date), MAX(report_date), COUNT(*),
+                   COALESCE(SUM(daily_deposit), 0), COALESCE(SUM(daily_withdrawal), 0),
+                   (ARRAY_AGG(idle_cash_at_close ORDER BY report_date DESC))[1],
+                   (ARRAY_AGG(invested_at_close ORDER BY report_date DESC))[1]
+            FROM {name}
+            HAVING COUNT(*) > 0
+        """, (month,))
+        cur.execute(f"SELECT COUNT(*) FROM {name}")
+        dropped = cur.fetchone()[0]
+        # No DETACH CONCURRENTLY with a default partition: a plain DROP, bounded by lock_timeout
+        cur.execute(f"DROP TABLE {name}")
+        return dropped
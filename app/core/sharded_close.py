@@ -0,0 +1,290 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import time
+import uuid
+from contextlib import contextmanager
+
+from psycopg2.extras import execute_values
+from app.config import PSYCOPG2_CONFIG, SHARD_CONFIGS
+from app.database.connection import get_connection
+from app.database.sharding import SHARD_COUNT, shard_connection
+from app.core.generation import bump_generation
+from app.core.money import from_cents, to_rate
+from app.core.close_runs import completed_run, record_completed
+from app.core import ledger_events, exposure
+from app.core.ledger_events import event, WITHDRAWAL_APPLIED, LOT_WITHDRAWAL, DEPOSIT_ALLOCATED
+from app.core.daily_engine import (CLOSE_SECONDS, CLOSE_PHASE, CLOSE_RUNS, CLOSE_ERRORS,
+                                   CLOSE_PENDING_ROWS)
+
+GTRID_PREFIX = "ledger-close"
+COORDINATOR_BRANCH = "primary"
+
+def collect_pending(conn, close_date, lower=None, upper=None):
+    """
+    Loads PENDING rows (optionally only user_id in [lower, upper)) and applies their
+    withdrawals to user_shares. Returns (row ids, withdrawals per lot, deposits per user), in cents.
+    """
+    where = "status = 'PENDING'"
+    params = []
+    if lower is not None:
+        where += " AND user_id >= %s"
+        params.append(lower)
+    if upper is not None:
+        where += " AND user_id < %s"
+        params.append(upper)
+
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT id, user_id, type, amount_cents, portfolio_id FROM pending_ledger WHERE {where}", params)
+        pending = cur.fetchall()
+
+        withdrawals = {}
+        deposits = {}
+        for _, user_id, tx_type, amount, port_id in pending:
+            if tx_type == 'WITHDRAWAL':
+                key = (user_id, port_id)
+                withdrawals[key] = withdrawals.get(key, 0) + amount
+            else:
+                deposits[user_id] = deposits.get(user_id, 0) + amount
+
+        if withdrawals:
+            execute_values(cur, """
+                UPDATE user_shares s SET principal_owned = s.principal_owned - v.amount
+                FROM (VALUES %s) AS v(user_id, portfolio_id, amount)
+                WHERE s.user_id = v.user_id AND s.portfolio_id = v.portfolio_id
+            """, [(u, p, from_cents(a)) for (u, p), a in withdrawals.items()], template="(%s, %s::int, %s::numeric)")
+            ledger_events.record(cur, [event(WITHDRAWAL_APPLIED, close_date, tx_id, user_id, port_id, from_cents(amount))
+                                       for tx_id, user_id, tx_type, amount, port_id in pending
+                                       if tx_type == 'WITHDRAWAL'])
+
+    per_lot = {}
+    for (_, port_id), amount in withdrawals.items():
+        per_lot[port_id] = per_lot.get(port_id, 0) + amount
+    return [r[0] for r in pending], per_lot, deposits
+
+def settle_pending(conn, close_date, ids, deposits, new_port_id):
+    """Maps depositors to the new lot and completes exactly the rows collect_pending loaded."""
+    with conn.cursor() as cur:
+        if new_port_id is not None and deposits:
+            execute_values(cur, """
+                INSERT INTO user_shares (user_id, portfolio_id, principal_owned)
+                VALUES %s
+                ON CONFLICT (user_id, portfolio_id) DO UPDATE
+                SET principal_owned = user_shares.principal_owned + EXCLUDED.principal_owned
+            """, [(u, new_port_id, from_cents(a)) for u, a in deposits.items()])
+            ledger_events.record(cur, [event(DEPOSIT_ALLOCATED, close_date, user_id=u, portfolio_id=new_port_id, amount=from_cents(a))
+                                       for u, a in deposits.items()])
+        # Requests queued meanwhile stay PENDING for the next close
+        if ids:
+            ledger_events.settle(cur, close_date, ids)
+
+class ShardedDailyClose:
+    """
+    run_daily_close for a hash-sharded fund (same semantics as DailyEngine).
+    The primary (coordinator) holds portfolio / registry / reports; each shard holds
+    its users' pending_ledger and user_shares. Every participant joins one two-phase
+    transaction, so a close lands on all databases or on none.
+    Requires max_prepared_transactions > 0 on every server.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+
+    def _parallel(self, fn, shard_conns):
+        with ThreadPoolExecutor(max_workers=len(shard_conns)) as pool:
+            return list(pool.map(fn, range(len(shard_conns)), shard_conns))
+
+    def run(self, close_date, new_inv_params=None):
+        started = time.perf_counter()
+        gtrid = f"{GTRID_PREFIX}:{close_date}:{uuid.uuid4().hex[:12]}"
+        primary = self.engine.get_connection()
+        shards = [shard_connection(i) for i in range(SHARD_COUNT)]
+        participants = [primary] + shards
+        phase = "guard"
+        try:
+            for i, conn in enumerate(participants):
+                conn.tpc_begin(conn.xid(0, gtrid, COORDINATOR_BRANCH if i == 0 else f"shard-{i - 1}"))
+
+            with primary.cursor() as cur:
+                # 1. Timeline Guard
+                with CLOSE_PHASE.time(phase):
+                    cur.execute("""
+                        SELECT (total_idle_cash * 100)::bigint, (total_invested * 100)::bigint, last_close_date
+                        FROM fund_registry FOR UPDATE
+                    """)
+                    idle_cash, invested, last_date = cur.fetchone()
+
+                if last_date:
+                    if close_date <= last_date and completed_run(cur, close_date):
+                        CLOSE_RUNS.inc("replayed")
+                        self._rollback(participants)
+                        return True, f"Day {close_date} already closed."
+                    if close_date <= last_date:
+                        CLOSE_RUNS.inc("rejected")
+                        self._rollback(participants)
+                        return False, f"Date {close_date} is already closed."
+                    if close_date > last_date + timedelta(days=1):
+                        CLOSE_RUNS.inc("rejected")
+                        self._rollback(participants)
+                        return False, f"Gap detected. Next expected date: {last_date + timedelta(days=1)}"
+
+                # 2-3. Pending queue + withdrawals, every shard at once
+                phase = "withdrawals"
+                with CLOSE_PHASE.time(phase):
+                    collected = self._parallel(lambda i, conn: collect_pending(conn, close_date), shards)
+                    CLOSE_PENDING_ROWS.observe(sum(len(ids) for ids, _, _ in collected))
+
+                    total_wit = 0
+                    total_dep = 0
+                    per_lot = {}
+                    for _, lot_wit, deposits in collected:
+                        for port_id, amount in lot_wit.items():
+                            per_lot[port_id] = per_lot.get(port_id, 0) + amount
+                        total_dep += sum(deposits.values())
+
+                    for port_id, amount in per_lot.items():
+                        cur.execute("UPDATE portfolio SET principal = principal - %s WHERE id = %s", (from_cents(amount), port_id))
+                        self.engine._touch_lot(cur, port_id, -from_cents(amount))
+                        total_wit += amount
+                    invested -= total_wit
+                    ledger_events.record(cur, [event(LOT_WITHDRAWAL, close_date, portfolio_id=p, amount=from_cents(a))
+                                               for p, a in per_lot.items()])
+                    exposure.withdraw(cur, per_lot)
+
+                # 4. Accrue Interest (Daily)
+                phase = "accrual"
+                with CLOSE_PHASE.time(phase):
+                    ledger_events.accrue(cur, close_date)
+
+                # 5. New Investment (Mandatory 4 Pillars)
+                current_idle = idle_cash + total_dep - total_wit
+                current_invested = invested
+                new_port_id = None
+                if new_inv_params and total_dep > 0:
+                    phase = "investment"
+                    with CLOSE_PHASE.time(phase):
+                        rate = to_rate(new_inv_params.get('rate'))
+                        exit_rate = to_rate(new_inv_params.get('early_rate'))
+                        m_date = close_date + timedelta(days=int(new_inv_params.get('duration')))
+                        cur.execute("""
+                            INSERT INTO portfolio (bank_name, principal, annual_rate_m, annual_rate_n, purchase_date, maturity_date)
+                            VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+                        """, (new_inv_params.get('bank'), from_cents(total_dep), rate, exit_rate, close_date, m_date))
+                        new_port_id = cur.fetchone()[0]
+                        self.engine._touch_lot(cur, new_port_id, from_cents(total_dep))
+                        exposure.lot_opened(cur, new_port_id)
+                        ledger_events.record(cur, [ledger_events.lot_created(
+                            close_date, new_port_id, new_inv_params.get('bank'), from_cents(total_dep), rate, exit_rate, m_date)])
+                        current_idle -= total_dep
+                        current_invested += total_dep
+
+                phase = "share_mapping"
+                with CLOSE_PHASE.time(phase):
+                    self._parallel(lambda i, conn: settle_pending(conn, close_date, collected[i][0], collected[i][2],
+                                                                  new_port_id), shards)
+
+                # 6. Final Sync & Audit Report
+                phase = "report"
+                with CLOSE_PHASE.time(phase):
+                    report = (close_date, from_cents(total_dep), from_cents(total_wit),
+                              from_cents(current_idle), from_cents(current_invested))
+                    cur.execute("""
+                        INSERT INTO daily_reports (report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, report)
+                    cur.execute("UPDATE fund_registry SET total_idle_cash = %s, total_invested = %s, last_close_date = %s", (report[3], report[4], close_date))
+                    ledger_events.record(cur, [ledger_events.day_closed(*report)])
+                    record_completed(cur, close_date, new_inv_params, total_dep, total_wit)
+
+                phase = "cleanup"
+                with CLOSE_PHASE.time(phase):
+                    ledger_events.delete_zeroed_lots(cur, close_date)
+
+            # Two-phase commit: any prepare failure rolls everyone back. The primary
+            # commits first, so resolve_in_doubt() can decide leftovers from it alone.
+            phase = "commit"
+            with CLOSE_PHASE.time(phase):
+                for conn in participants:
+                    conn.tpc_prepare()
+                for conn in participants:
+                    conn.tpc_commit()
+
+            bump_generation(None)
+            CLOSE_RUNS.inc("success")
+            return True, f"Day {close_date} successfully closed."
+        except Exception as e:
+            self._rollback(participants)
+            CLOSE_RUNS.inc("error")
+            CLOSE_ERRORS.inc(phase)
+            return False, str(e)
+        finally:
+            CLOSE_SECONDS.observe(time.perf_counter() - started)
+            for conn in participants:
+                conn.close()
+
+    def _rollback(self, participants):
+        for conn in participants:
+            try:
+                conn.tpc_rollback()
+            except Exception:
+                pass # Already gone; a prepared leftover is handled by resolve_in_doubt()
+
+@contextmanager
+def coordinator_lock():
+    """
+    Session advisory lock on the primary, held by the process coordinating a two-phase close.
+    It dies with the coordinator's session, so whoever holds it knows every prepared close
+    transaction is a leftover rather than one a live close is about to commit.
+    """
+    conn = get_connection(PSYCOPG2_CONFIG)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (GTRID_PREFIX,))
+        yield
+    finally:
+        conn.close() # Ending the session releases the lock
+
+def resolve_in_doubt(locked=False):
+    """
+    Settles close transactions left prepared by a crashed coordinator (sharded or parallel close).
+    Coordinator branch still prepared -> nobody committed: roll back every branch.
+    Coordinator gone and the registry reached that date -> commit the remaining branches.
+    Waits for a running close unless the caller already holds coordinator_lock().
+    Returns the number of prepared transactions resolved.
+    """
+    if not locked:
+        with coordinator_lock():
+            return resolve_in_doubt(locked=True)
+    configs = [PSYCOPG2_CONFIG] + [c for c in SHARD_CONFIGS if c != PSYCOPG2_CONFIG]
+    conns = [get_connection(c) for c in configs]
+    resolved = 0
+    try:
+        # pg_prepared_xacts lists the whole cluster: each branch is settled from a
+        # connection to its own database, once
+        prepared = {}
+        for conn in conns:
+            dbname = conn.info.dbname
+            for x in conn.tpc_recover():
+                if str(x.gtrid).startswith(GTRID_PREFIX) and x.database == dbname:
+                    prepared.setdefault((dbname, str(x.gtrid), x.bqual), (conn, x))
+            conn.rollback()
+        prepared = list(prepared.values())
+        undecided = {str(x.gtrid) for _, x in prepared if x.bqual == COORDINATOR_BRANCH}
+
+        with conns[0].cursor() as cur:
+            cur.execute("SELECT last_close_date::text FROM fund_registry")
+            row = cur.fetchone()
+        conns[0].rollback()
+        last_close = row[0] if row else None
+
+        for conn, xid in prepared:
+            gtrid = str(xid.gtrid)
+            close_date = gtrid.split(":")[1]
+            if gtrid not in undecided and last_close and close_date <= last_close:
+                conn.tpc_commit(xid)
+            else:
+                conn.tpc_rollback(xid)
+            resolved += 1
+        return resolved
+    finally:
+        for conn in conns:
+            conn.close()
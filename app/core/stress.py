@@ -0,0 +1,299 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from datetime import date
+import numpy as np # You may need to: pip install numpy
+import os
+
+from app.config import STRESS_PATHS, STRESS_WORKERS, STRESS_HORIZONS
+
+# Columns of the shared lot matrix (float64, one row per lot)
+PRINCIPAL, ACCRUED, RATE_M, RATE_N, DAYS_HELD, DAYS_TO_MATURITY, BANK = range(7)
+LOT_COLUMNS = 7
+CHUNK_PATHS = 1000 # Paths per task; fixed so results don't depend on the worker count
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+# Used when there is too little close history to calibrate from: (mean, lognormal sigma).
+# Withdrawals are a daily share of outstanding claims; deposits are an amount, sized off claims.
+DEFAULT_WITHDRAWAL_RATE = (0.005, 0.8)
+DEFAULT_DEPOSIT_SHARE = (0.007, 0.8)
+MIN_HISTORY_DAYS = 5
+
+def _fit_lognormal(samples, default):
+    """Lognormal (mu, sigma) of the non-zero days, plus the share of days with no flow at all."""
+    samples = np.asarray(samples, dtype=np.float64)
+    positive = samples[samples > 0]
+    zero_share = 1.0 - len(positive) / len(samples) if len(samples) else 0.0
+    if len(samples) < MIN_HISTORY_DAYS or len(positive) < 2:
+        mean, sigma = max(default[0], 1e-9), default[1]
+        return float(np.log(mean) - sigma ** 2 / 2), sigma, zero_share
+    logs = np.log(positive)
+    return float(logs.mean()), float(max(logs.std(), 1e-6)), zero_share
+
+class FundSnapshot:
+    """Current fund state as flat arrays: one row per ACTIVE lot, plus cash, claims and flow history."""
+    def __init__(self, as_of, idle_cash, claims, holders, lots, banks, withdrawal_rates=(), deposits=()):
+        self.as_of = as_of
+        self.idle_cash = float(idle_cash)
+        self.claims = float(claims)
+        self.holders = holders
+        self.lots = lots
+        self.banks = banks
+        self.withdrawal_fit = _fit_lognormal(withdrawal_rates, DEFAULT_WITHDRAWAL_RATE)
+        self.deposit_fit = _fit_lognormal(deposits, (self.claims * DEFAULT_DEPOSIT_SHARE[0], DEFAULT_DEPOSIT_SHARE[1]))
+
+    @staticmethod
+    def _lot_matrix(rows, as_of, banks):
+        """rows: (bank, principal, accrued, rate_m, rate_n, purchase_date, maturity_date)."""
+        lots = np.zeros((len(rows), LOT_COLUMNS), dtype=np.float64)
+        for i, (bank, principal, accrued, rate_m, rate_n, start, end) in enumerate(rows):
+            if bank not in banks:
+                banks.append(bank)
+            lots[i] = (principal, accrued, rate_m, rate_n, (as_of - start).days, (end - as_of).days,
+                       banks.index(bank))
+        return lots
+
+    @staticmethod
+    def _flows(reports):
+        """Daily withdrawals as a share of the previous close's invested total; deposits as amounts."""
+        withdrawals = [float(wit) / float(prev_invested)
+                       for (_, _, prev_invested), (_, wit, _) in zip(reports, reports[1:])
+                       if prev_invested and prev_invested > 0]
+        return withdrawals, [float(dep) for dep, _, _ in reports[1:]]
+
+    @classmethod
+    def from_database(cls, history_days=90):
+        from app.database.replica import read_connection
+        from app.database.sharding import fan_out
+
+        conn = read_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT total_idle_cash, last_close_date FROM fund_registry")
+                idle_cash, last_close = cur.fetchone()
+                cur.execute("""
+                    SELECT bank_name, principal, accrued_interest, annual_rate_m, annual_rate_n,
+                           purchase_date, maturity_date
+                    FROM portfolio WHERE status = 'ACTIVE' ORDER BY id
+                """)
+                rows = cur.fetchall()
+                cur.execute("""
+                    SELECT daily_deposit, daily_withdrawal, invested_at_close FROM (
+                        SELECT * FROM daily_reports ORDER BY report_date DESC LIMIT %s
+                    ) r ORDER BY report_date
+                """, (history_days + 1,))
+                reports = cur.fetchall()
+        finally:
+            conn.close()
+
+        def claims(shard, shard_conn):
+            with shard_conn.cursor() as cur:
+                cur.execute("SELECT COALESCE(SUM(principal_owned), 0), COUNT(DISTINCT user_id) FROM user_shares WHERE principal_owned > 0")
+                return cur.fetchone()
+
+        parts = fan_out(claims, read_only=True)
+        as_of = last_close or date.today()
+        banks = []
+        withdrawals, deposits = cls._flows(reports)
+        return cls(as_of, idle_cash, sum(float(p[0]) for p in parts), sum(p[1] for p in parts),
+                   cls._lot_matrix(rows, as_of, banks), banks, withdrawals, deposits)
+
+    @classmethod
+    def from_model(cls, model):
+        """Snapshot of an in-memory FundModel (what-if runs without a database)."""
+        from app.core.fund_model import from_cents
+
+        as_of = model.last_close_date or date.today()
+        rows = [(l.bank_name, from_cents(l.principal), from_cents(l.accrued), l.rate_m, l.rate_n,
+                 l.purchase_date, l.maturity_date) for l in model.lots.values() if l.status == 'ACTIVE']
+        reports = [(from_cents(dep), from_cents(wit), from_cents(inv)) for _, dep, wit, _, inv in model.reports]
+        positive = [c for c in model.shares.values() if c > 0]
+        holders = len({u for (u, _), c in model.shares.items() if c > 0})
+        banks = []
+        withdrawals, deposits = cls._flows(reports)
+        return cls(as_of, from_cents(model.idle_cash), sum(positive) / 100.0, holders,
+                   cls._lot_matrix(rows, as_of, banks), banks, withdrawals, deposits)
+
+class StressScenario:
+    """
+    Flow assumptions for one stress run. Daily withdrawals are a lognormal fraction of
+    outstanding claims and daily deposits a lognormal amount, both calibrated from
+    daily_reports; a Markov "run" regime multiplies withdrawals and damps deposits.
+    """
+    def __init__(self, horizon_days=None, withdrawal_scale=1.0, run_probability=0.01,
+                 run_exit_probability=0.2, run_multiplier=4.0, run_deposit_factor=0.5):
+        self.horizon_days = horizon_days or max(STRESS_HORIZONS)
+        self.withdrawal_scale = withdrawal_scale
+        self.run_probability = run_probability
+        self.run_exit_probability = run_exit_probability
+        self.run_multiplier = run_multiplier
+        self.run_deposit_factor = run_deposit_factor
+
+def _schedules(lots, n_banks, horizon):
+    """
+    Deterministic per-day cash flows of the book if nothing is broken early:
+    maturing[t, b]: principal + contractual interest released on day t+1;
+    locked[t, b]: principal still locked after day t+1;
+    exit_value[t, b]: cash from breaking all of locked[t, b] at the early-exit rate.
+    """
+    maturing = np.zeros((horizon, n_banks))
+    locked = np.zeros((horizon, n_banks))
+    exit_value = np.zeros((horizon, n_banks))
+    if not len(lots):
+        return maturing, locked, exit_value
+
+    principal = lots[:, PRINCIPAL]
+    bank = lots[:, BANK].astype(np.int64)
+    to_maturity = lots[:, DAYS_TO_MATURITY].astype(np.int64)
+    tenor = lots[:, DAYS_HELD] + lots[:, DAYS_TO_MATURITY]
+
+    # Overdue lots pay out on day 1; lots beyond the horizon never mature inside it
+    due = np.clip(to_maturity, 1, None) - 1
+    inside = due < horizon
+    payout = principal * (1 + lots[:, RATE_M] / 100 * tenor / 365)
+    np.add.at(maturing, (due[inside], bank[inside]), payout[inside])
+
+    days = np.arange(1, horizon + 1)[:, None] # (horizon, 1)
+    still_locked = to_maturity[None, :] > days # (horizon, lots)
+    held = lots[None, :, DAYS_HELD] + days
+    value = principal[None, :] * (1 + lots[None, :, RATE_N] / 100 * held / 365)
+    for b in range(n_banks):
+        in_bank = bank == b
+        locked[:, b] = (still_locked[:, in_bank] * principal[in_bank]).sum(axis=1)
+        exit_value[:, b] = (still_locked[:, in_bank] * value[:, in_bank]).sum(axis=1)
+    return maturing, locked, exit_value
+
+def _run_paths(shm_name, shape, n_banks, state, scenario, horizons, n_paths, seed):
+    """
+    Worker body: simulates n_paths paths, vectorised across paths, one step per day.
+    The lot matrix is read from shared memory, never pickled per task.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        lots = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        maturing, locked, exit_value = _schedules(lots, n_banks, scenario.horizon_days)
+    finally:
+        shm.close()
+
+    rng = np.random.default_rng(seed)
+    idle_cash, claims0, (w_mu, w_sigma, w_zero), (d_mu, d_sigma, d_zero) = state
+    maturing_total = maturing.sum(axis=1)
+    exit_total = exit_value.sum(axis=1)
+
+    claims = np.full(n_paths, claims0)
+    gross = np.full(n_paths, idle_cash) # Cash if no lot is ever broken early
+    cash = np.full(n_paths, idle_cash) # Cash after early exits
+    intact = np.ones(n_paths) # Share of the locked book not yet broken
+    gross_short = np.zeros(n_paths)
+    residual_short = np.zeros(n_paths)
+    exit_draw = np.zeros((n_paths, n_banks))
+    in_run = np.zeros(n_paths, dtype=bool)
+    results = {}
+
+    for t in range(scenario.horizon_days):
+        in_run = np.where(in_run, rng.random(n_paths) >= scenario.run_exit_probability,
+                          rng.random(n_paths) < scenario.run_probability)
+        w_rate = rng.lognormal(w_mu, w_sigma, n_paths) * (rng.random(n_paths) >= w_zero)
+        w_rate *= scenario.withdrawal_scale * np.where(in_run, scenario.run_multiplier, 1.0)
+        deposits = rng.lognormal(d_mu, d_sigma, n_paths) * (rng.random(n_paths) >= d_zero)
+        deposits *= np.where(in_run, scenario.run_deposit_factor, 1.0)
+
+        withdrawals = claims * np.minimum(w_rate, 1.0)
+        claims += deposits - withdrawals
+
+        gross += deposits + maturing_total[t] - withdrawals
+        np.maximum(gross_short, -gross, out=gross_short)
+
+        cash += deposits + intact * maturing_total[t] - withdrawals
+        need = np.maximum(-cash, 0.0)
+        capacity = intact * exit_total[t]
+        broken = np.minimum(need, capacity)
+        if exit_total[t] > 0:
+            # Pro-rata break across every locked lot, so bank shares follow exit_value
+            exit_draw += broken[:, None] * (exit_value[t] / exit_total[t])[None, :]
+            intact -= broken / exit_total[t]
+        cash += broken
+        np.maximum(residual_short, -cash, out=residual_short)
+
+        if t + 1 in horizons:
+            results[t + 1] = {
+                "gross_shortfall": gross_short.copy(),
+                "residual_shortfall": residual_short.copy(),
+                "exit_draw": exit_draw.copy(),
+                "claims": claims.copy()
+            }
+    return results
+
+class LiquidityStressEngine:
+    """
+    Monte Carlo liquidity stress test.
+    1. The lot book is loaded once into a float64 matrix placed in shared memory.
+    2. Paths are split into fixed-size chunks with independent seeds and simulated on
+       a process pool; each worker maps the shared lot matrix instead of copying it.
+    3. Results are merged into shortfall percentiles and per-bank exposure per horizon.
+    Gross shortfall: withdrawals beyond idle cash + deposits + maturing cash.
+    Residual shortfall: what remains after breaking lots early at their exit rate.
+    """
+    def __init__(self, snapshot, scenario=None, paths=STRESS_PATHS, workers=STRESS_WORKERS,
+                 horizons=STRESS_HORIZONS, seed=None):
+        self.snapshot = snapshot
+        self.scenario = scenario or StressScenario(horizon_days=max(horizons))
+        self.paths = paths
+        self.workers = workers or os.cpu_count() or 1
+        self.horizons = sorted(h for h in horizons if h <= self.scenario.horizon_days)
+        self.seed = seed
+
+    def run(self):
+        snap = self.snapshot
+        lots = snap.lots if len(snap.lots) else np.zeros((0, LOT_COLUMNS))
+        shm = shared_memory.SharedMemory(create=True, size=max(lots.nbytes, 1))
+        try:
+            np.ndarray(lots.shape, dtype=np.float64, buffer=shm.buf)[:] = lots
+            state = (snap.idle_cash, snap.claims, snap.withdrawal_fit, snap.deposit_fit)
+            chunks = [min(CHUNK_PATHS, self.paths - start) for start in range(0, self.paths, CHUNK_PATHS)]
+            seeds = np.random.SeedSequence(self.seed).spawn(len(chunks))
+            args = (shm.name, lots.shape, len(snap.banks), state, self.scenario, set(self.horizons))
+
+            if self.workers == 1:
+                parts = [_run_paths(*args, n, s) for n, s in zip(chunks, seeds)]
+            else:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+                    parts = list(pool.map(_run_paths, *zip(*[args + (n, s) for n, s in zip(chunks, seeds)])))
+        finally:
+            shm.close()
+            shm.unlink()
+        return self._report(parts)
+
+    def _report(self, parts):
+        snap = self.snapshot
+        lots = snap.lots
+        report = {
+            "as_of": str(snap.as_of),
+            "paths": self.paths,
+            "idle_cash": snap.idle_cash,
+            "claims": snap.claims,
+            "holders": snap.holders,
+            "horizons": {}
+        }
+        for h in self.horizons:
+            merged = {k: np.concatenate([p[h][k] for p in parts]) for k in parts[0][h]}
+            gross, residual, draw = merged["gross_shortfall"], merged["residual_shortfall"], merged["exit_draw"]
+            banks = []
+            for b, name in enumerate(snap.banks):
+                in_bank = lots[:, BANK] == b
+                banks.append({
+                    "bank": name,
+                    "principal": float(lots[in_bank, PRINCIPAL].sum()),
+                    "maturing": float(lots[in_bank & (lots[:, DAYS_TO_MATURITY] <= h), PRINCIPAL].sum()),
+                    "exit_draw_mean": float(draw[:, b].mean()),
+                    "exit_draw_p95": float(np.percentile(draw[:, b], 95)),
+                    "exit_draw_p99": float(np.percentile(draw[:, b], 99))
+                })
+            report["horizons"][h] = {
+                "shortfall_probability": float((gross > 0).mean()),
+                "shortfall_percentiles": {p: float(np.percentile(gross, p)) for p in PERCENTILES},
+                "residual_probability": float((residual > 0).mean()),
+                "residual_percentiles": {p: float(np.percentile(residual, p)) for p in PERCENTILES},
+                "claims_p5": float(np.percentile(merged["claims"], 5)),
+                "banks": banks
+            }
+        return report
@@ -1,21 +1,22 @@
-import psycopg2
 from decimal import Decimal
-import os
-import sys
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app.config import PSYCOPG2_CONFIG
+from app.database.sharding import shard_for_user, shard_connection
+from psycopg2.extras import execute_values
+from app.core.money import to_cents, from_cents, MAX_CENTS
+
+USER_ID_MAX_LENGTH = 100 # user_id is VARCHAR(100) in pending_ledger and user_shares
+PORTFOLIO_ID_MAX = 2 ** 31 - 1 # portfolio_id is INTEGER
 
 def validate_user_withdrawal(user_id, portfolio_id, amount_to_withdraw):
     """
     Standardized Validator (V3 Logic):
     Verifies user has sufficient principal in the specified lot.
     """
-    conn = psycopg2.connect(**PSYCOPG2_CONFIG)
+    conn = shard_connection(shard_for_user(user_id))
     try:
         with conn.cursor() as cur:
             cur.execute("""
-                SELECT principal_owned FROM user_shares 
+                SELECT owned_cents FROM user_shares 
                 WHERE user_id = %s AND portfolio_id = %s
             """, (user_id, portfolio_id))
             row = cur.fetchone()
@@ -24,17 +25,70 @@ def validate_user_withdrawal(user_id, portfolio_id, amount_to_withdraw):
                 return False, "Security Error: No ownership record found."
             
             owned = row[0]
-            if Decimal(str(amount_to_withdraw)) > owned:
-                return False, f"Insufficient balance. Available: ${owned:,.2f}"
+            if to_cents(amount_to_withdraw) > owned:
+                return False, f"Insufficient balance. Available: ${from_cents(owned):,.2f}"
             
             return True, "Valid"
     finally:
         conn.close()
 
+def refused_withdrawals(requests):
+    """
+    validate_user_withdrawal for many (user_id, portfolio_id, amount) requests, one query
+    per shard. Returns {index in requests: reason} for the ones it would refuse.
+    """
+    by_shard = {}
+    for i, (user_id, portfolio_id, _) in enumerate(requests):
+        by_shard.setdefault(shard_for_user(user_id), []).append((user_id, portfolio_id))
+
+    owned = {}
+    for shard, keys in by_shard.items():
+        conn = shard_connection(shard)
+        try:
+            with conn.cursor() as cur:
+                rows = execute_values(cur, """
+                    SELECT s.user_id, s.portfolio_id, s.owned_cents
+                    FROM user_shares s JOIN (VALUES %s) AS v(user_id, portfolio_id)
+                      ON s.user_id = v.user_id AND s.portfolio_id = v.portfolio_id
+                """, list(set(keys)), template="(%s, %s::int)", fetch=True)
+            owned.update(((u, p), cents) for u, p, cents in rows)
+        finally:
+            conn.close()
+
+    refused = {}
+    for i, (user_id, portfolio_id, amount) in enumerate(requests):
+        cents = owned.get((user_id, portfolio_id))
+        if cents is None:
+            refused[i] = "Security Error: No ownership record found."
+        elif to_cents(amount) > cents:
+            refused[i] = f"Insufficient balance. Available: ${from_cents(cents):,.2f}"
+    return refused
+
 def simple_amount_check(amount):
-    """Numeric check for currency inputs."""
+    """
+    Numeric check for currency inputs. The amount comes back rounded to the cent, as it will
+    be stored, and must fit the BIGINT amount_cents column.
+    """
+    try:
+        cents = to_cents(amount)
+    except ValueError:
+        return False, Decimal('0')
+    return 0 < cents <= MAX_CENTS, from_cents(cents)
+
+def intake_user_id(user_id):
+    """The user id as it will be stored, or None if VARCHAR(100) can't hold it (PostgreSQL also rejects NUL)."""
+    if isinstance(user_id, int) and not isinstance(user_id, bool):
+        user_id = str(user_id)
+    if not isinstance(user_id, str) or not user_id.strip() or len(user_id) > USER_ID_MAX_LENGTH or "\x00" in user_id:
+        return None
+    return user_id
+
+def intake_portfolio_id(portfolio_id):
+    """The lot id as an int in INTEGER range (form posts send it as text), or None."""
+    if isinstance(portfolio_id, bool) or (isinstance(portfolio_id, float) and not portfolio_id.is_integer()):
+        return None
     try:
-        val = Decimal(str(amount))
-        return val > 0, val
-    except:
-        return False, Decimal('0')
\ No newline at end of file
+        portfolio_id = int(portfolio_id)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return portfolio_id if 0 < portfolio_id <= PORTFOLIO_ID_MAX else None
\ No newline at end of file
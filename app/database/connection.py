@@ -0,0 +1,115 @@
+import psycopg2
+import psycopg2.extensions
+import re
+import time
+
+from app.config import PSYCOPG2_CONFIG
+from app.core.metrics import metrics
+from app.core.profiler import slow_queries
+
+QUERY_SECONDS = metrics.histogram("db_query_seconds", "SQL statement latency", ("op", "table"))
+QUERY_ROWS = metrics.counter("db_query_rows_total", "Rows returned or affected by SQL statements", ("op", "table"))
+CONNECT_SECONDS = metrics.histogram("db_connect_seconds", "Time to open a database connection")
+CONNECTIONS_OPENED = metrics.counter("db_connections_opened_total", "Database connections opened")
+CONNECTIONS_OPEN = metrics.gauge("db_connections_open", "Database connections currently open")
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|TRUNCATE)\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+_labels_cache = {}
+
+def statement_labels(query):
+    """(op, table) for a statement, e.g. ('UPDATE', 'portfolio'). Memoized: queries are constants."""
+    labels = _labels_cache.get(query)
+    if labels is None:
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        words = text.split(None, 1)
+        op = words[0].upper() if words else "UNKNOWN"
+        match = _TABLE_RE.search(text)
+        labels = (op, match.group(1).lower() if match else "-")
+        if len(_labels_cache) < 1024:
+            _labels_cache[query] = labels
+    return labels
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """Records latency and row counts for every statement."""
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            labels = statement_labels(query)
+            QUERY_SECONDS.observe(time.perf_counter() - start, *labels)
+            if self.rowcount > 0:
+                QUERY_ROWS.inc(*labels, amount=self.rowcount)
+
+# Statements EXPLAIN accepts; anything else (DDL, SAVEPOINT, TRUNCATE) is logged without a plan
+_EXPLAINABLE = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+class ProfilingCursor(InstrumentedCursor):
+    """
+    Opt-in (QUERY_PROFILING=1). Statements over SLOW_QUERY_MS are recorded with
+    their EXPLAIN (ANALYZE, BUFFERS) plan. The plan comes from a separate cursor,
+    so this cursor's result set is untouched. Writes are explained inside a
+    savepoint that is rolled back, so they are never applied twice.
+    """
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        result = super().execute(query, vars)
+        duration = time.perf_counter() - start
+        if duration >= slow_queries.threshold:
+            statement = query.decode() if isinstance(query, bytes) else str(query)
+            slow_queries.record(statement, vars, duration, self.rowcount, self._explain(query, vars))
+        return result
+
+    def _explain(self, query, vars):
+        op = statement_labels(query)[0]
+        if op not in _EXPLAINABLE or self.name is not None:
+            return None
+        # A savepoint keeps a failed EXPLAIN from aborting the caller's transaction
+        # and undoes the re-run of writes
+        guarded = not self.connection.autocommit
+        if op != "SELECT" and not guarded:
+            return None # No enclosing transaction to roll a re-run write back in
+
+        explain_cur = self.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+        try:
+            if guarded:
+                explain_cur.execute("SAVEPOINT profiler_explain")
+            try:
+                sql_text = query if isinstance(query, bytes) else str(query).encode()
+                explain_cur.execute(b"EXPLAIN (ANALYZE, BUFFERS) " + sql_text, vars)
+                return "\n".join(r[0] for r in explain_cur.fetchall())
+            except psycopg2.Error as e:
+                return f"EXPLAIN failed: {e}"
+            finally:
+                if guarded:
+                    explain_cur.execute("ROLLBACK TO SAVEPOINT profiler_explain")
+                    explain_cur.execute("RELEASE SAVEPOINT profiler_explain")
+        finally:
+            explain_cur.close()
+
+class TrackedConnection(psycopg2.extensions.connection):
+    """Keeps the open-connection gauge honest."""
+    def close(self):
+        if not self.closed:
+            CONNECTIONS_OPEN.dec()
+        super().close()
+
+def get_connection(conn_params=None, **kwargs):
+    """
+    Single entry point for database connections.
+    Adds per-query instrumentation when metrics are enabled, slow-query capture
+    when profiling is on; plain psycopg2 otherwise.
+    """
+    params = dict(conn_params or PSYCOPG2_CONFIG, **kwargs)
+    if slow_queries.enabled:
+        params.setdefault("cursor_factory", ProfilingCursor)
+    if not metrics.enabled:
+        return psycopg2.connect(**params)
+
+    params.setdefault("cursor_factory", InstrumentedCursor)
+    start = time.perf_counter()
+    conn = psycopg2.connect(connection_factory=TrackedConnection, **params)
+    CONNECT_SECONDS.observe(time.perf_counter() - start)
+    CONNECTIONS_OPENED.inc()
+    CONNECTIONS_OPEN.inc()
+    return conn
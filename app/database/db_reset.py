@@ -1,10 +1,6 @@
 import psycopg2
-import os
-import sys
 
-# Ensure config is accessible
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from app.config import PSYCOPG2_CONFIG
+from app.config import PSYCOPG2_CONFIG, SHARD_DATABASES, SHARD_CONFIGS
 
 def reset_database():
     """
@@ -26,7 +22,14 @@ def reset_database():
                         portfolio, 
                         user_shares, 
                         daily_reports, 
-                        transaction_history 
+                        transaction_history,
+                        lot_share_totals,
+                        reconciliation_runs,
+                        close_runs,
+                        daily_reports_monthly,
+                        portfolio_archive,
+                        bank_exposure,
+                        ledger_events
                     RESTART IDENTITY CASCADE;
                 """)
 
@@ -40,13 +43,27 @@ def reset_database():
                         total_invested = 0.00, 
                         last_close_date = NULL;
                 """)
+
+                # 3. Invalidate dashboard caches keyed on the fund generation
+                cur.execute("SELECT nextval('fund_generation')")
                 
         conn.close()
+
+        # 4. Per-user tables on every shard (RESTART IDENTITY keeps the strided ids)
+        for shard in (SHARD_CONFIGS if SHARD_DATABASES else []):
+            print(f"🧹 Truncating shard '{shard['database']}'...")
+            conn = psycopg2.connect(**shard)
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("TRUNCATE pending_ledger, user_shares, ledger_events RESTART IDENTITY")
+            conn.close()
+
         print("✨ Database reset successfully. System is now back to Day Zero.")
         
     except Exception as e:
         print(f"❌ Error during reset: {e}")
 
+# Run as: python -m app.database.db_reset
 if __name__ == "__main__":
     confirm = input("Are you sure you want to wipe ALL data? (y/n): ").lower()
     if confirm == 'y':
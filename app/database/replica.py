@@ -0,0 +1,131 @@
+import atexit
+import threading
+import time
+
+import psycopg2
+
+from app.config import (PSYCOPG2_CONFIG, REPLICA_CONFIG, REPLICA_MAX_WAIT_MS, REPLICA_RETRY_SECONDS,
+                        REPLICA_PROBE_CONNECTIONS)
+from app.database.connection import get_connection
+from app.core.metrics import metrics
+
+REPLICA_READS = metrics.counter("replica_reads_total", "Read connections by where they were served and why",
+                                ("target",))
+REPLICA_WAIT_SECONDS = metrics.histogram("replica_catchup_wait_seconds", "Time spent waiting for the replica to reach the primary LSN")
+
+class ReplicaRouter:
+    """
+    Hands out read-only connections, preferring the streaming replica.
+    Guard: the primary's current WAL LSN is read first (one autocommit round-trip on a
+    small shared pool); the replica is used only once pg_last_wal_replay_lsn() has
+    reached it, so anything committed before the request - a close included - is visible.
+    A request that finds every probe busy waits and reuses the LSN of a probe sent after
+    it arrived: that LSN already covers its commits, so bursts cost one round-trip.
+    """
+    POLL_SECONDS = 0.002
+
+    def __init__(self, replica_config=REPLICA_CONFIG, max_wait_ms=REPLICA_MAX_WAIT_MS,
+                 retry_seconds=REPLICA_RETRY_SECONDS, probe_connections=REPLICA_PROBE_CONNECTIONS):
+        self.replica_config = replica_config
+        self.max_wait = max_wait_ms / 1000.0
+        self.retry_seconds = retry_seconds
+        self.probe_connections = probe_connections
+        self._down_until = 0.0
+        self._probes = [] # Idle autocommit connections to the primary
+        self._probes_open = 0
+        self._latest = (float("-inf"), None) # (monotonic time the probe was sent, its LSN)
+        self._probe_free = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.replica_config is not None
+
+    def _primary_lsn(self):
+        asked = time.monotonic()
+        with self._probe_free:
+            while True:
+                sent, lsn = self._latest
+                if sent >= asked:
+                    return lsn
+                if self._probes or self._probes_open < self.probe_connections:
+                    break
+                self._probe_free.wait()
+            probe = self._probes.pop() if self._probes else None
+            if probe is None:
+                self._probes_open += 1
+
+        try:
+            if probe is None:
+                probe = get_connection(PSYCOPG2_CONFIG)
+                probe.autocommit = True
+            sent = time.monotonic()
+            with probe.cursor() as cur:
+                cur.execute("SELECT pg_current_wal_lsn()::text")
+                lsn = cur.fetchone()[0]
+        except psycopg2.Error:
+            # Reconnect next time; without the LSN freshness is unknown
+            if probe is not None:
+                probe.close()
+            with self._probe_free:
+                self._probes_open -= 1
+                self._probe_free.notify()
+            raise
+
+        with self._probe_free:
+            if sent > self._latest[0]:
+                self._latest = (sent, lsn)
+            self._probes.append(probe)
+            self._probe_free.notify_all()
+        return lsn
+
+    def probes_open(self):
+        return self._probes_open
+
+    def close(self):
+        """Closes the idle probe connections (at exit, or before forking workers)."""
+        with self._probe_free:
+            while self._probes:
+                self._probes.pop().close()
+                self._probes_open -= 1
+
+    def _caught_up(self, conn, target_lsn):
+        deadline = time.perf_counter() + self.max_wait
+        with REPLICA_WAIT_SECONDS.time(), conn.cursor() as cur:
+            while True:
+                cur.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", (target_lsn,))
+                ready = cur.fetchone()[0]
+                conn.rollback() # The caller's reads must take a snapshot after this point
+                if ready:
+                    return True
+                if ready is None or time.perf_counter() >= deadline:
+                    return False # None: not a standby at all
+                time.sleep(self.POLL_SECONDS)
+
+    def read_connection(self):
+        if not self.enabled or time.monotonic() < self._down_until:
+            REPLICA_READS.inc("primary")
+            return get_connection()
+        target = self._primary_lsn()
+        try:
+            conn = get_connection(self.replica_config)
+        except psycopg2.OperationalError:
+            self._down_until = time.monotonic() + self.retry_seconds
+            REPLICA_READS.inc("fallback_down")
+            return get_connection()
+
+        try:
+            if self._caught_up(conn, target):
+                REPLICA_READS.inc("replica")
+                return conn
+        except psycopg2.Error:
+            pass
+        conn.close()
+        REPLICA_READS.inc("fallback_lag")
+        return get_connection()
+
+router = ReplicaRouter()
+atexit.register(router.close)
+
+def read_connection():
+    """Connection for read-only dashboard/audit queries (replica when fresh, primary otherwise)."""
+    return router.read_connection()
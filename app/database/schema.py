@@ -1,11 +1,125 @@
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-import os
-import sys
 
-# Ensure config is accessible
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import MAINTENANCE_CONFIG, PSYCOPG2_CONFIG
+from app.config import MAINTENANCE_CONFIG, PSYCOPG2_CONFIG, SHARD_DATABASES, SHARD_CONFIGS
+from app.core.exposure import RECOMPUTE_SQL, EXPOSURE_FIELDS
+
+def _create_database(db_config):
+    maintenance = dict(MAINTENANCE_CONFIG, host=db_config['host'])
+    conn_m = psycopg2.connect(**maintenance)
+    conn_m.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    cur_m = conn_m.cursor()
+    cur_m.execute("SELECT 1 FROM pg_catalog.pg_database WHERE datname = %s", (db_config['database'],))
+    if not cur_m.fetchone():
+        cur_m.execute(f"CREATE DATABASE {db_config['database']}")
+    cur_m.close()
+    conn_m.close()
+
+def _create_ledger_events(cur):
+    """Append-only event journal (app/core/ledger_events.py); the derived tables can be rebuilt from it."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_events (
+            seq BIGSERIAL PRIMARY KEY,
+            event_type VARCHAR(30) NOT NULL,
+            business_date DATE,
+            tx_id INTEGER,
+            user_id VARCHAR(100),
+            portfolio_id INTEGER,
+            amount DECIMAL(20, 2),
+            detail JSONB,
+            recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+def _add_cents_column(cur, table, column, source):
+    """BIGINT copy of a DECIMAL(20, 2) column in cents, kept by PostgreSQL; hot paths read it as a plain int."""
+    cur.execute(f"""
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} BIGINT
+        GENERATED ALWAYS AS (({source} * 100)::bigint) STORED
+    """)
+
+def _partition_daily_reports(cur):
+    """
+    Creates daily_reports partitioned by report_date (primary key: report_date, which
+    must include the partition key). A plain daily_reports from before partitioning is
+    copied into the default partition and dropped.
+    """
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('daily_reports')")
+    row = cur.fetchone()
+    if row and row[0] == 'p':
+        return
+    if row:
+        # Free the names the new table's sequence and indexes take
+        cur.execute("ALTER TABLE daily_reports RENAME TO daily_reports_unpartitioned")
+        cur.execute("ALTER SEQUENCE daily_reports_id_seq RENAME TO daily_reports_unpartitioned_id_seq")
+        cur.execute("ALTER TABLE daily_reports_unpartitioned RENAME CONSTRAINT daily_reports_pkey TO daily_reports_unpartitioned_pkey")
+        cur.execute("ALTER TABLE daily_reports_unpartitioned RENAME CONSTRAINT daily_reports_report_date_key TO daily_reports_unpartitioned_report_date_key")
+
+    cur.execute("""
+        CREATE TABLE daily_reports (
+            id SERIAL,
+            report_date DATE NOT NULL,
+            daily_deposit DECIMAL(20, 2),
+            daily_withdrawal DECIMAL(20, 2),
+            idle_cash_at_close DECIMAL(20, 2),
+            invested_at_close DECIMAL(20, 2),
+            PRIMARY KEY (report_date)
+        ) PARTITION BY RANGE (report_date);
+    """)
+    cur.execute("CREATE TABLE daily_reports_default PARTITION OF daily_reports DEFAULT")
+
+    if row:
+        cur.execute("INSERT INTO daily_reports SELECT * FROM daily_reports_unpartitioned")
+        cur.execute("SELECT setval('daily_reports_id_seq', COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM daily_reports")
+        cur.execute("DROP TABLE daily_reports_unpartitioned")
+
+def initialize_shards():
+    """
+    Creates the per-user tables on every shard database.
+    pending_ledger ids are strided (shard i issues i+1, i+1+N, ...) so they stay
+    unique across shards and the owning shard can be derived from the id.
+    """
+    count = len(SHARD_CONFIGS)
+    for index, shard in enumerate(SHARD_CONFIGS):
+        _create_database(shard)
+        conn = psycopg2.connect(**shard)
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS pending_ledger (
+                id SERIAL PRIMARY KEY,
+                user_id VARCHAR(100) NOT NULL,
+                type VARCHAR(20),
+                amount DECIMAL(20, 2) NOT NULL,
+                portfolio_id INTEGER,
+                status VARCHAR(20) DEFAULT 'PENDING',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                intake_id VARCHAR(64) UNIQUE
+            );
+        """)
+        # portfolio lives on the primary, so no foreign key here
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS user_shares (
+                id SERIAL PRIMARY KEY,
+                user_id VARCHAR(100) NOT NULL,
+                portfolio_id INTEGER NOT NULL,
+                principal_owned DECIMAL(20, 2) NOT NULL,
+                UNIQUE(user_id, portfolio_id)
+            );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_user_shares_portfolio ON user_shares (portfolio_id)")
+        _add_cents_column(cur, "pending_ledger", "amount_cents", "amount")
+        _add_cents_column(cur, "user_shares", "owned_cents", "principal_owned")
+        _create_ledger_events(cur)
+
+        cur.execute(f"ALTER SEQUENCE pending_ledger_id_seq INCREMENT BY {count} START WITH {index + 1}")
+        cur.execute("SELECT COUNT(*) FROM pending_ledger")
+        if cur.fetchone()[0] == 0:
+            cur.execute(f"ALTER SEQUENCE pending_ledger_id_seq RESTART WITH {index + 1}")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print(f"✨ Shard {index} Initialized for {shard['database']}")
 
 def initialize_v3_db():
     """
@@ -15,14 +129,7 @@ def initialize_v3_db():
     new_db = PSYCOPG2_CONFIG['database']
     
     # 1. DB Creation
-    conn_m = psycopg2.connect(**MAINTENANCE_CONFIG)
-    conn_m.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-    cur_m = conn_m.cursor()
-    cur_m.execute("SELECT 1 FROM pg_catalog.pg_database WHERE datname = %s", (new_db,))
-    if not cur_m.fetchone():
-        cur_m.execute(f'CREATE DATABASE {new_db}')
-    cur_m.close()
-    conn_m.close()
+    _create_database(PSYCOPG2_CONFIG)
 
     # 2. Table Creation
     conn = psycopg2.connect(**PSYCOPG2_CONFIG)
@@ -51,19 +158,31 @@ def initialize_v3_db():
             amount DECIMAL(20, 2) NOT NULL,
             portfolio_id INTEGER,
             status VARCHAR(20) DEFAULT 'PENDING',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            intake_id VARCHAR(64) UNIQUE
         );
     """)
+    # Journal replay key (exactly-once drains from the API intake journal)
+    cur.execute("ALTER TABLE pending_ledger ADD COLUMN IF NOT EXISTS intake_id VARCHAR(64) UNIQUE")
 
+    # No foreign key to portfolio: a drained lot moves to portfolio_archive while its
+    # (zero) share rows stay, as they always have on the shards
     cur.execute("""
         CREATE TABLE IF NOT EXISTS user_shares (
             id SERIAL PRIMARY KEY,
             user_id VARCHAR(100) NOT NULL,
-            portfolio_id INTEGER REFERENCES portfolio(id),
+            portfolio_id INTEGER,
             principal_owned DECIMAL(20, 2) NOT NULL,
             UNIQUE(user_id, portfolio_id)
         );
     """)
+    cur.execute("ALTER TABLE user_shares DROP CONSTRAINT IF EXISTS user_shares_portfolio_id_fkey")
+
+    # MONEY: integer cents alongside the DECIMAL columns (app/core/money.py)
+    _add_cents_column(cur, "portfolio", "principal_cents", "principal")
+    _add_cents_column(cur, "portfolio", "accrued_cents", "accrued_interest")
+    _add_cents_column(cur, "pending_ledger", "amount_cents", "amount")
+    _add_cents_column(cur, "user_shares", "owned_cents", "principal_owned")
 
     cur.execute("""
         CREATE TABLE IF NOT EXISTS fund_registry (
@@ -74,17 +193,113 @@ def initialize_v3_db():
         );
     """)
 
+    # REPORTS: Range-partitioned by month (app/core/retention.py creates the partitions;
+    # rows outside them land in the default one). Months past REPORT_RETENTION_DAYS are
+    # rolled up into daily_reports_monthly and their partition dropped.
+    _partition_daily_reports(cur)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_reports_monthly (
+            month DATE PRIMARY KEY,
+            first_date DATE NOT NULL,
+            last_date DATE NOT NULL,
+            days INTEGER NOT NULL,
+            total_deposit DECIMAL(20, 2) NOT NULL,
+            total_withdrawal DECIMAL(20, 2) NOT NULL,
+            idle_cash_at_close DECIMAL(20, 2) NOT NULL,
+            invested_at_close DECIMAL(20, 2) NOT NULL,
+            rolled_up_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    # ARCHIVE: Lots the close removes once their principal reaches zero, as they were
+    # at that close (the journal still records them as LOT_DELETED).
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS portfolio_archive (
+            id INTEGER PRIMARY KEY,
+            bank_name VARCHAR(255) NOT NULL,
+            principal DECIMAL(20, 2) NOT NULL,
+            accrued_interest DECIMAL(20, 2) NOT NULL,
+            annual_rate_m DECIMAL(10, 5) NOT NULL,
+            annual_rate_n DECIMAL(10, 5) NOT NULL,
+            purchase_date DATE NOT NULL,
+            maturity_date DATE NOT NULL,
+            status VARCHAR(20),
+            archived_on DATE NOT NULL
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_portfolio_archive_archived_on ON portfolio_archive (archived_on)")
+
+    # EXPOSURE: ACTIVE lots summed per (bank, maturity month), moved by the close from the
+    # day's deltas (app/core/exposure.py); the nightly full reconciliation checks it
+    # against a recompute. Backfilled from portfolio when first created.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS bank_exposure (
+            bank_name VARCHAR(255) NOT NULL,
+            maturity_month DATE NOT NULL,
+            lots INTEGER NOT NULL DEFAULT 0,
+            principal_cents BIGINT NOT NULL DEFAULT 0,
+            accrued_cents BIGINT NOT NULL DEFAULT 0,
+            rate_weighted NUMERIC NOT NULL DEFAULT 0, -- SUM(principal_cents * annual_rate_m)
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (bank_name, maturity_month)
+        );
+    """)
+    cur.execute(f"""
+        INSERT INTO bank_exposure (bank_name, maturity_month, {', '.join(EXPOSURE_FIELDS)})
+        SELECT * FROM ({RECOMPUTE_SQL}) r WHERE NOT EXISTS (SELECT 1 FROM bank_exposure)
+    """)
+
+    # RECONCILIATION: Per-lot share totals maintained by the close.
+    # `dirty` marks lots touched since the last check; `verified_total` is the
+    # value the last check agreed with, so fund totals can be rolled forward.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS lot_share_totals (
+            portfolio_id INTEGER PRIMARY KEY,
+            shares_total DECIMAL(20, 2) NOT NULL DEFAULT 0,
+            verified_total DECIMAL(20, 2) NOT NULL DEFAULT 0,
+            dirty BOOLEAN NOT NULL DEFAULT TRUE,
+            touched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_lot_share_totals_dirty ON lot_share_totals (portfolio_id) WHERE dirty")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_user_shares_portfolio ON user_shares (portfolio_id)")
+
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS daily_reports (
+        CREATE TABLE IF NOT EXISTS reconciliation_runs (
             id SERIAL PRIMARY KEY,
-            report_date DATE UNIQUE NOT NULL,
-            daily_deposit DECIMAL(20, 2),
-            daily_withdrawal DECIMAL(20, 2),
-            idle_cash_at_close DECIMAL(20, 2),
-            invested_at_close DECIMAL(20, 2)
+            run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            mode VARCHAR(20) NOT NULL,
+            lots_checked INTEGER NOT NULL,
+            discrepancies INTEGER NOT NULL,
+            claims_total DECIMAL(20, 2) NOT NULL,
+            registry_invested DECIMAL(20, 2) NOT NULL
+        );
+    """)
+
+    # CLOSE RUNS: One row per close date; the checkpointed close commits each phase
+    # (withdrawals, accrual, investment, report) with its `phase` update, so a failed
+    # close resumes from the last durable phase and a finished one is a no-op retry.
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS close_runs (
+            close_date DATE PRIMARY KEY,
+            phase VARCHAR(20) NOT NULL,
+            inv_params JSONB,
+            deposit_cents BIGINT NOT NULL DEFAULT 0,
+            withdrawal_cents BIGINT NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 1,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP
         );
     """)
 
+    # GENERATION: Bumped after every committed close or ledger write; keys HTTP caches.
+    # A sequence avoids row locks, so ledger writes never queue behind a running close.
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS fund_generation")
+
+    # EVENTS: Every change to the tables above, so they can be rebuilt (python -m app rebuild)
+    _create_ledger_events(cur)
+
     cur.execute("SELECT COUNT(*) FROM fund_registry")
     if cur.fetchone()[0] == 0:
         cur.execute("INSERT INTO fund_registry (total_idle_cash) VALUES (1000000.00)")
@@ -94,5 +309,10 @@ def initialize_v3_db():
     conn.close()
     print(f"✨ V3 Schema Initialized for {new_db}")
 
+    # 3. Shard Databases (only when SHARD_DATABASES is set)
+    if SHARD_DATABASES:
+        initialize_shards()
+
+# Run as: python -m app.database.schema
 if __name__ == "__main__":
     initialize_v3_db()
\ No newline at end of file
@@ -0,0 +1,46 @@
+import zlib
+
+from app.config import PSYCOPG2_CONFIG, SHARD_CONFIGS
+from app.database.connection import get_connection
+from app.database.replica import read_connection
+
+SHARD_COUNT = len(SHARD_CONFIGS)
+
+def is_sharded():
+    # A single SHARD_DATABASES entry other than DB_NAME still moves the user tables off the primary
+    return SHARD_COUNT > 1 or SHARD_CONFIGS[0] != PSYCOPG2_CONFIG
+
+def shard_for_user(user_id):
+    """Stable hash partition (crc32 is identical across processes and restarts, unlike hash())."""
+    if SHARD_COUNT == 1:
+        return 0
+    return zlib.crc32(str(user_id).encode()) % SHARD_COUNT
+
+def shard_for_tx(tx_id):
+    """pending_ledger ids are strided per shard (START shard+1, INCREMENT SHARD_COUNT)."""
+    return (int(tx_id) - 1) % SHARD_COUNT
+
+def shard_config(index):
+    return SHARD_CONFIGS[index]
+
+def shard_connection(index):
+    return get_connection(SHARD_CONFIGS[index])
+
+def fan_out(fn, read_only=False):
+    """
+    Runs fn(shard_index, conn) on every shard in parallel, each on its own connection.
+    Returns results in shard order. read_only on an unsharded fund routes through the
+    read replica (shards themselves have no replicas configured).
+    """
+    def run(index):
+        conn = read_connection() if read_only and not is_sharded() else shard_connection(index)
+        try:
+            return fn(index, conn)
+        finally:
+            conn.close()
+
+    if SHARD_COUNT == 1:
+        return [run(0)]
+    from concurrent.futures import ThreadPoolExecutor # Only sharded funds need the pool
+    with ThreadPoolExecutor(max_workers=SHARD_COUNT) as pool:
+        return list(pool.map(run, range(SHARD_COUNT)))
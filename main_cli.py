@@ -1,11 +1,7 @@
 import sys
-import os
 from decimal import Decimal
 from datetime import date
 
-# Ensure the root directory is in the path for modular imports
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
 from app.core.ledger_manager import LedgerManager
 from app.core.daily_engine import DailyEngine
 from app.core.validators import validate_user_withdrawal, simple_amount_check
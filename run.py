@@ -1,17 +1,20 @@
 from flask import Flask, render_template
-import os
-import sys
-
-# Ensure the app directory is in the path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.api.routes import api_blueprint
 from app.api.ledger_api import ledger_api
+from app.api.json_provider import LedgerJSONProvider
+from app.api.instrumentation import register_instrumentation
 
 app = Flask(__name__, 
             template_folder='app/frontend/templates', 
             static_folder='app/frontend/static')
 
+# Exact Decimal encoding (no float round-trip) for every jsonify() call
+app.json = LedgerJSONProvider(app)
+
+# Endpoint latency histograms + Prometheus scrape endpoint at /metrics
+register_instrumentation(app)
+
 # Register V3 Blueprints
 # Dashboard API handles internal UI logic (Status, Reports, Daily Close)
 app.register_blueprint(api_blueprint, url_prefix='/api/dashboard')
@@ -0,0 +1,7 @@
+import sys
+
+from app.cli import main
+
+# Kept for existing cron entries; same as: python -m app stress [options]
+if __name__ == "__main__":
+    main(["stress"] + sys.argv[1:])
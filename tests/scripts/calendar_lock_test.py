@@ -11,7 +11,7 @@ def reset_env():
     conn = psycopg2.connect(**PSYCOPG2_CONFIG)
     with conn:
         with conn.cursor() as cur:
-            cur.execute("TRUNCATE pending_ledger, portfolio, user_shares, daily_reports CASCADE")
+            cur.execute("TRUNCATE pending_ledger, portfolio, user_shares, daily_reports, lot_share_totals, reconciliation_runs, close_runs, daily_reports_monthly, portfolio_archive, bank_exposure, ledger_events CASCADE")
             cur.execute("UPDATE fund_registry SET total_idle_cash = 1000000, total_invested = 0, last_close_date = NULL")
     conn.close()
 
@@ -26,9 +26,9 @@ def run_test():
     s, m = engine.run_daily_close(d1)
     print(f"Test 1 (Initial Close): {'✅' if s else '❌'} {m}")
     
-    # 2. Duplicate Close
+    # 2. Duplicate Close (a retry of a finished close succeeds without closing again)
     s, m = engine.run_daily_close(d1)
-    print(f"Test 2 (Duplicate Block): {'✅' if not s else '❌'} {m}")
+    print(f"Test 2 (Duplicate No-op): {'✅' if s and 'already closed' in m else '❌'} {m}")
     
     # 3. Gap Detection (Try skipping d2)
     s, m = engine.run_daily_close(date(2026, 4, 5))
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RUNS = 9
+TARGET_MS = 100
+
+# What main_cli.py / the old audit_util.py imported before printing anything
+EAGER_IMPORTS = ("import app.core.ledger_manager, app.core.daily_engine, app.core.validators, "
+                 "app.core.auditor, app.core.reconciler, tabulate; print('ready')")
+
+CASES = [
+    ("python -c 'pass' (interpreter floor)", [sys.executable, "-c", "print('ready')"]),
+    ("eager imports (old CLI start-up)", [sys.executable, "-c", EAGER_IMPORTS]),
+    ("python -m app --help", [sys.executable, "-m", "app", "--help"]),
+    ("python -m app audit --summary", [sys.executable, "-m", "app", "audit", "--summary"])
+]
+
+def first_output_ms(cmd):
+    """Wall time from spawn to the first line on stdout (None if the command printed nothing)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    line = proc.stdout.readline()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, err = proc.communicate()
+    if not line:
+        return None, err.decode().strip().splitlines()[-1:] or ["no output"]
+    return elapsed, None
+
+def import_breakdown(module, top=8):
+    """Slowest imports (cumulative) up to two levels below a module, from -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True).stderr
+    rows = []
+    for line in out.splitlines()[1:]:
+        _, _, cumulative_us, name = line.replace(":", "|", 1).split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 2:
+            rows.append((int(cumulative_us), "  " * depth + name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def run_benchmark():
+    print(f"\n🚀 CLI START-UP BENCHMARK (median of {RUNS} runs, target < {TARGET_MS} ms for audit --summary)")
+    print("-" * 80)
+    print(f"{'COMMAND':<40} | {'FIRST OUTPUT':>14} | STATUS")
+    print("-" * 80)
+    for label, cmd in CASES:
+        samples, error = [], None
+        for _ in range(RUNS):
+            ms, error = first_output_ms(cmd)
+            if ms is None:
+                break
+            samples.append(ms)
+        if error:
+            print(f"{label:<40} | {'-':>14} | ❌ {error[0][:60]}")
+            continue
+        median = statistics.median(samples)
+        status = ("✅" if median < TARGET_MS else "❌") if "summary" in label else ""
+        print(f"{label:<40} | {median:>11.1f} ms | {status}")
+    print("-" * 80)
+
+    print("\nSlowest imports behind `audit --summary` (cumulative):")
+    for cumulative_us, name in import_breakdown("app.commands.audit"):
+        print(f"  {name:<40} {cumulative_us / 1000:>8.1f} ms")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,136 @@
+import os
+import sys
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+
+os.environ.setdefault("CLOSE_CHECKPOINTS", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.database.db_reset import reset_database
+from app.database.connection import get_connection
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+from app.core.checkpointed_close import CheckpointedDailyClose
+from app.core.close_runs import PHASES
+from app.core.reconciler import ReconciliationEngine
+
+SEED = 20260601
+DAYS = 8
+FAIL_DAY = 5
+USERS = [f"cr_user_{i:03d}" for i in range(1, 41)]
+
+class FailingClose(CheckpointedDailyClose):
+    """Crashes just before `fail_at` begins, after every earlier phase has committed."""
+    def __init__(self, engine, fail_at):
+        super().__init__(engine)
+        self.fail_at = fail_at
+
+    def _step(self, conn, close_date, phase, inv_params):
+        if phase == self.fail_at:
+            raise RuntimeError(f"injected failure before {phase}")
+        return super()._step(conn, close_date, phase, inv_params)
+
+def snapshot():
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT total_idle_cash, total_invested, last_close_date FROM fund_registry")
+        registry = cur.fetchone()
+        cur.execute("SELECT report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close FROM daily_reports ORDER BY report_date")
+        reports = cur.fetchall()
+        cur.execute("SELECT id, bank_name, principal, accrued_interest, status FROM portfolio ORDER BY id")
+        lots = cur.fetchall()
+        cur.execute("SELECT user_id, portfolio_id, principal_owned FROM user_shares ORDER BY 1, 2")
+        shares = cur.fetchall()
+        cur.execute("SELECT id, status FROM pending_ledger ORDER BY id")
+        pending = cur.fetchall()
+        cur.execute("SELECT close_date, phase, completed_at IS NOT NULL FROM close_runs ORDER BY close_date")
+        runs = cur.fetchall()
+    conn.close()
+    return {"registry": registry, "reports": reports, "portfolio": lots, "user_shares": shares,
+            "pending_ledger": pending, "close_runs": runs}
+
+def run_scenario(fail_at=None):
+    """DAYS closes of random traffic; with fail_at, the close of FAIL_DAY crashes there and is retried."""
+    reset_database()
+    ledger = LedgerManager()
+    engine = DailyEngine(workers=1)
+    rng = random.Random(SEED)
+    current_date = date(2026, 6, 1)
+    outcome = None
+
+    for day in range(DAYS):
+        conn = get_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id, portfolio_id, principal_owned FROM user_shares WHERE principal_owned > 100 ORDER BY 1, 2")
+            positions = cur.fetchall()
+        conn.close()
+        for _ in range(rng.randint(10, 25)):
+            if rng.random() < 0.7 or not positions:
+                ledger.queue_request(rng.choice(USERS), 'DEPOSIT', Decimal(rng.randint(500, 9000)))
+            else:
+                u, lot_id, balance = rng.choice(positions)
+                ledger.queue_request(u, 'WITHDRAWAL', (balance * Decimal('0.2')).quantize(Decimal('0.01')), portfolio_id=lot_id)
+
+        inv_params = {'bank': rng.choice(["VCB", "ACB", "BIDV"]), 'rate': Decimal('8.5'),
+                      'early_rate': Decimal('2.0'), 'duration': rng.choice([7, 30])}
+        if fail_at and day == FAIL_DAY:
+            ok, _ = FailingClose(engine, fail_at).run(current_date, inv_params)
+            # Without params the retry resumes with the first attempt's
+            retried, msg = engine.run_daily_close(current_date, None)
+            outcome = (not ok) and retried and ("resumed" in msg or fail_at == PHASES[0])
+        else:
+            ok, msg = engine.run_daily_close(current_date, inv_params)
+            if not ok:
+                raise RuntimeError(msg)
+        current_date += timedelta(days=1)
+    return outcome
+
+def check_params():
+    """Bad params are refused before any phase commits; a resume may correct them until the investment phase."""
+    reset_database()
+    ledger = LedgerManager()
+    engine = DailyEngine(workers=1)
+    ledger.queue_request(USERS[0], 'DEPOSIT', Decimal('5000'))
+    good = {'bank': 'VCB', 'rate': Decimal('8.5'), 'early_rate': Decimal('2.0'), 'duration': 30}
+    refused = [not engine.run_daily_close(date(2026, 6, 1), dict(good, **bad))[0]
+               for bad in ({'bank': ''}, {'rate': 'abc'}, {'duration': 0}, {'early_rate': None})]
+    untouched = snapshot()["close_runs"] == []
+
+    failed, _ = FailingClose(engine, "investment").run(date(2026, 6, 1), good)
+    resumed, _ = engine.run_daily_close(date(2026, 6, 1), dict(good, bank="ACB"))
+    banks = [lot[1] for lot in snapshot()["portfolio"]]
+    return [("invalid params refused, nothing recorded", all(refused) and untouched),
+            ("resume takes corrected params", not failed and resumed and banks == ["ACB"])]
+
+def run_test():
+    print(f"\n🚀 STARTING CHECKPOINTED CLOSE TEST (seed {SEED}, {DAYS} days, crash on day {FAIL_DAY})")
+    print("-" * 90)
+    run_scenario()
+    reference = snapshot()
+    engine = DailyEngine(workers=1)
+    last = reference["registry"][2]
+    ok, msg = engine.run_daily_close(last, None)
+    replay_ok = ok and snapshot() == reference
+    print(f"retry of a finished close {'(no-op)':<22} | {'✅' if replay_ok else f'❌ {msg}'}")
+    all_ok = replay_ok
+
+    for phase in PHASES:
+        resumed = run_scenario(fail_at=phase)
+        after = snapshot()
+        diff = [k for k in reference if reference[k] != after[k]]
+        recon = ReconciliationEngine().run_full()
+        passed = resumed and not diff and recon["clean"]
+        all_ok = all_ok and passed
+        status = "✅" if passed else f"❌ resumed={resumed} differs in: {', '.join(diff) or '-'} clean={recon['clean']}"
+        print(f"crash before {phase:<12}, then retry  | {status}")
+
+    checks = check_params()
+    for label, passed in checks:
+        print(f"{label:<40} | {'✅' if passed else '❌'}")
+        all_ok = all_ok and passed
+
+    print("-" * 90)
+    print("✨ CHECKPOINTED CLOSE VERIFIED." if all_ok else "❌ CHECKPOINTED CLOSE DIVERGED.")
+
+if __name__ == "__main__":
+    run_test()
@@ -9,7 +9,9 @@ import psycopg2
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from app.core.ledger_manager import LedgerManager
 from app.core.daily_engine import DailyEngine
+from app.core.reconciler import ReconciliationEngine
 from app.config import PSYCOPG2_CONFIG
+from app.database.sharding import is_sharded, fan_out, shard_for_user, shard_connection
 
 def reset_environment():
     """Wipes the database for a clean V3 mathematical proof."""
@@ -17,26 +19,27 @@ def reset_environment():
     conn = psycopg2.connect(**PSYCOPG2_CONFIG)
     with conn:
         with conn.cursor() as cur:
-            cur.execute("TRUNCATE pending_ledger, portfolio, user_shares, daily_reports CASCADE")
+            cur.execute("TRUNCATE pending_ledger, portfolio, user_shares, daily_reports, lot_share_totals, reconciliation_runs, close_runs, daily_reports_monthly, portfolio_archive, bank_exposure, ledger_events CASCADE")
             cur.execute("UPDATE fund_registry SET total_idle_cash = 1000000, total_invested = 0, last_close_date = NULL")
     conn.close()
+    if is_sharded():
+        fan_out(_truncate_shard)
 
-def get_integrity_snapshot():
-    conn = psycopg2.connect(**PSYCOPG2_CONFIG)
-    with conn.cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(principal_owned), 0) FROM user_shares")
-        user_claims = cur.fetchone()[0]
-        cur.execute("SELECT COALESCE(SUM(principal), 0) FROM portfolio")
-        bank_assets = cur.fetchone()[0]
-        cur.execute("SELECT total_invested FROM fund_registry")
-        registry_record = cur.fetchone()[0]
-    conn.close()
-    return user_claims, bank_assets, registry_record
+def _truncate_shard(shard, conn):
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE pending_ledger, user_shares, ledger_events RESTART IDENTITY")
+
+def get_integrity_snapshot(reconciler):
+    """Incremental check: only lots touched by the last close are rescanned."""
+    recon = reconciler.run_incremental()
+    return recon['clean'], recon['claims_total'], recon['registry_invested'], recon['lots_checked']
 
 def run_automation():
     reset_environment()
     ledger = LedgerManager()
     engine = DailyEngine()
+    reconciler = ReconciliationEngine()
     users = [f"user_{i:02d}" for i in range(1, 71)]
     current_date = date(2026, 2, 1)
     
@@ -50,7 +53,7 @@ def run_automation():
             if random.random() < 0.7:
                 ledger.queue_request(u, 'DEPOSIT', Decimal(random.randint(1000, 5000)))
             else:
-                conn = psycopg2.connect(**PSYCOPG2_CONFIG)
+                conn = shard_connection(shard_for_user(u))
                 with conn.cursor() as cur:
                     cur.execute("SELECT portfolio_id, principal_owned FROM user_shares WHERE user_id=%s AND principal_owned > 100", (u,))
                     res = cur.fetchone()
@@ -68,12 +71,15 @@ def run_automation():
         engine.run_daily_close(current_date, inv_params)
         
         # 3. Integrity Check
-        claims, assets, reg = get_integrity_snapshot()
-        status = "✅" if (claims == assets == reg) else "❌"
-        print(f"DAY {day:02d} | {status} | Claims: ${claims:,.2f} | Bank: ${assets:,.2f} | Registry: ${reg:,.2f}")
+        clean, claims, reg, lots = get_integrity_snapshot(reconciler)
+        status = "✅" if clean else "❌"
+        print(f"DAY {day:02d} | {status} | Claims: ${claims:,.2f} | Registry: ${reg:,.2f} | Lots Checked: {lots}")
         current_date += timedelta(days=1)
 
+    # 4. Nightly full scan must agree with the incremental results
+    full = reconciler.run_full()
     print("-" * 90)
+    print(f"FULL SCAN | {'✅' if full['clean'] else '❌'} | Lots: {full['lots_checked']} | Discrepancies: {len(full['discrepancies'])}")
     print("✨ V3 INTEGRITY VERIFIED.")
 
 if __name__ == "__main__":
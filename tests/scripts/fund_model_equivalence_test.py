@@ -0,0 +1,148 @@
+import os
+import sys
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.database.db_reset import reset_database
+from app.database.connection import get_connection
+from app.database.sharding import fan_out
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+from app.core.fund_model import FundModel, from_cents
+
+SEEDS = [7, 1234, 20260101]
+DAYS = 30
+USERS = [f"eq_user_{i:03d}" for i in range(1, 81)]
+BANKS = ["VCB", "ACB", "BIDV", "Techcombank", "TPBank"]
+
+class DatabaseDriver:
+    def __init__(self):
+        reset_database()
+        self.ledger = LedgerManager()
+        self.engine = DailyEngine()
+
+    def _lots(self):
+        conn = get_connection()
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, purchase_date, bank_name, principal, accrued_interest, annual_rate_m,
+                       annual_rate_n, maturity_date, status
+                FROM portfolio
+            """)
+            rows = cur.fetchall()
+        conn.close()
+        return rows
+
+    def lot_ids(self):
+        return {r[1]: r[0] for r in self._lots()}
+
+    def queue(self, user_id, req_type, amount, portfolio_id=None):
+        self.ledger.queue_request(user_id, req_type, amount, portfolio_id)
+
+    def close(self, close_date, params):
+        return self.engine.run_daily_close(close_date, params)
+
+    def state(self):
+        lots = self._lots()
+        by_id = {r[0]: r[1] for r in lots}
+
+        def shares(shard, conn):
+            with conn.cursor() as cur:
+                cur.execute("SELECT user_id, portfolio_id, principal_owned FROM user_shares")
+                return cur.fetchall()
+
+        conn = get_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT total_idle_cash, total_invested, last_close_date FROM fund_registry")
+            registry = cur.fetchone()
+            cur.execute("SELECT report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close FROM daily_reports ORDER BY report_date")
+            reports = cur.fetchall()
+            cur.execute("SELECT portfolio_id, shares_total FROM lot_share_totals")
+            totals = cur.fetchall()
+            cur.execute("SELECT bank_name, maturity_month, lots, principal_cents, accrued_cents, rate_weighted FROM bank_exposure ORDER BY 1, 2")
+            exposure = cur.fetchall()
+        conn.close()
+        return {
+            "registry": registry,
+            "reports": reports,
+            "lots": sorted(r[1:] for r in lots),
+            "shares": sorted((u, by_id.get(p), amt) for part in fan_out(shares) for u, p, amt in part),
+            "lot_totals": sorted((by_id.get(p), t) for p, t in totals if p in by_id),
+            "exposure": exposure
+        }
+
+class ModelDriver:
+    def __init__(self):
+        self.model = FundModel()
+
+    def lot_ids(self):
+        return {l.purchase_date: l.id for l in self.model.lots.values()}
+
+    def queue(self, user_id, req_type, amount, portfolio_id=None):
+        self.model.queue_request(user_id, req_type, amount, portfolio_id)
+
+    def close(self, close_date, params):
+        return self.model.run_daily_close(close_date, params)
+
+    def state(self):
+        m = self.model
+        by_id = {l.id: l.purchase_date for l in m.lots.values()}
+        return {
+            "registry": (from_cents(m.idle_cash), from_cents(m.invested), m.last_close_date),
+            "reports": [(d, from_cents(a), from_cents(b), from_cents(c), from_cents(e)) for d, a, b, c, e in m.reports],
+            "lots": sorted((l.purchase_date, l.bank_name, from_cents(l.principal), from_cents(l.accrued), l.rate_m,
+                            l.rate_n, l.maturity_date, l.status) for l in m.lots.values()),
+            "shares": sorted((u, by_id.get(p), from_cents(c)) for (u, p), c in m.shares.items()),
+            "lot_totals": sorted((by_id.get(p), from_cents(t)) for p, t in m.lot_totals.items() if p in by_id),
+            "exposure": m.get_exposure()
+        }
+
+def run_scenario(driver, seed):
+    """Identical decisions for both engines: every draw depends only on the seed and on engine state."""
+    rng = random.Random(seed)
+    current_date = date(2026, 3, 1)
+    outcomes = []
+    for _ in range(DAYS):
+        lot_ids = driver.lot_ids()
+        holders = [(u, d, amt) for u, d, amt in driver.state()["shares"] if d is not None and amt > 10]
+        for _ in range(rng.randint(20, 60)):
+            if rng.random() < 0.7 or not holders:
+                driver.queue(rng.choice(USERS), 'DEPOSIT', Decimal(rng.randint(50000, 1500000)).scaleb(-2))
+            else:
+                u, lot_date, balance = rng.choice(holders)
+                amt = (balance * Decimal(str(round(rng.uniform(0.05, 0.5), 4)))).quantize(Decimal('0.01'))
+                if amt > 0:
+                    driver.queue(u, 'WITHDRAWAL', amt, lot_ids[lot_date])
+
+        params = None
+        if rng.random() < 0.85:
+            params = {'bank': rng.choice(BANKS), 'rate': Decimal(str(round(rng.uniform(6.0, 9.5), 3))),
+                      'early_rate': Decimal('2.0'), 'duration': rng.choice([90, 180, 360])}
+        outcomes.append(driver.close(current_date, params)[0])
+        current_date += timedelta(days=1)
+
+    # Guards
+    outcomes.append(driver.close(current_date - timedelta(days=1))[0])
+    outcomes.append(driver.close(current_date + timedelta(days=2))[0])
+    state = driver.state()
+    state["outcomes"] = outcomes
+    return state
+
+def run_test():
+    print(f"\n🚀 STARTING FUND MODEL EQUIVALENCE TEST ({len(SEEDS)} seeds x {DAYS} days)")
+    print("-" * 90)
+    all_equal = True
+    for seed in SEEDS:
+        db_state = run_scenario(DatabaseDriver(), seed)
+        model_state = run_scenario(ModelDriver(), seed)
+        diff = [k for k in db_state if db_state[k] != model_state[k]]
+        all_equal = all_equal and not diff
+        print(f"SEED {seed:<10} | {'✅' if not diff else '❌ differs in: ' + ', '.join(diff)} | "
+              f"Lots: {len(db_state['lots'])} | Positions: {len(db_state['shares'])}")
+    print("-" * 90)
+    print("✨ IN-MEMORY MODEL MATCHES THE DATABASE ENGINE." if all_equal else "❌ MODEL DIVERGED.")
+
+if __name__ == "__main__":
+    run_test()
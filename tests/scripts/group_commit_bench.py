@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import threading
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.core.ledger_manager import LedgerManager
+from app.database.sharding import fan_out
+
+THREADS = 64
+REQUESTS_PER_THREAD = 200
+# (label, group_commit, window_ms)
+MODES = [
+    ("per-request commit", False, None),
+    ("group commit 0.5 ms", True, 0.5),
+    ("group commit 2 ms", True, 2),
+    ("group commit 5 ms", True, 5),
+    ("group commit 10 ms", True, 10),
+]
+
+def _cleanup_shard(shard, conn):
+    # The QUEUED events go too, or a journal rebuild would bring the benchmark rows back
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                WITH gone AS (
+                    DELETE FROM pending_ledger WHERE user_id LIKE 'bench\\_%' RETURNING id
+                )
+                DELETE FROM ledger_events
+                WHERE event_type = 'QUEUED' AND (tx_id IN (SELECT id FROM gone) OR user_id LIKE 'bench\\_%')
+            """)
+
+def cleanup():
+    """Removes the benchmark's rows from every shard."""
+    fan_out(_cleanup_shard)
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+def run_mode(group_commit, window_ms):
+    ledger = LedgerManager(group_commit=group_commit, group_window_ms=window_ms or 0)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        local = []
+        for i in range(REQUESTS_PER_THREAD):
+            t0 = time.perf_counter()
+            ledger.queue_request(f"bench_{n:03d}", 'DEPOSIT', Decimal('100.00'))
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99)
+
+def run_benchmark():
+    total = THREADS * REQUESTS_PER_THREAD
+    print(f"\n🚀 GROUP COMMIT BENCHMARK ({THREADS} threads x {REQUESTS_PER_THREAD} requests = {total:,} rows per mode)")
+    print("-" * 80)
+    print(f"{'MODE':<24} | {'THROUGHPUT':>14} | {'P50 LATENCY':>12} | {'P99 LATENCY':>12}")
+    print("-" * 80)
+    for label, group_commit, window_ms in MODES:
+        cleanup()
+        rps, p50, p99 = run_mode(group_commit, window_ms)
+        print(f"{label:<24} | {rps:>10,.0f} r/s | {p50 * 1000:>9.2f} ms | {p99 * 1000:>9.2f} ms")
+    cleanup()
+    print("-" * 80)
+
+if __name__ == "__main__":
+    run_benchmark()
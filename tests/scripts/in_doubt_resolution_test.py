@@ -0,0 +1,90 @@
+import os
+import sys
+from decimal import Decimal
+from datetime import date
+
+# Two shard databases on the same host as DB_NAME: every connection sees every prepared branch
+os.environ.setdefault("SHARD_DATABASES", "ledger_shard_0,ledger_shard_1")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.config import PSYCOPG2_CONFIG
+from app.database.schema import initialize_v3_db
+from app.database.db_reset import reset_database
+from app.database.connection import get_connection
+from app.database.sharding import SHARD_COUNT, shard_connection, fan_out
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+from app.core.sharded_close import GTRID_PREFIX, COORDINATOR_BRANCH, resolve_in_doubt
+
+# Needs max_prepared_transactions > 0 on the server.
+INV_PARAMS = {'bank': 'VCB', 'rate': Decimal('8.5'), 'early_rate': Decimal('2.0'), 'duration': 30}
+
+def leave_prepared(close_date, primary_sql, commit_coordinator):
+    """
+    What a coordinator that crashed mid-commit leaves behind: one prepared branch per shard
+    (each queuing a marker deposit) and the primary branch, prepared or already committed.
+    """
+    gtrid = f"{GTRID_PREFIX}:{close_date}:crashed"
+    primary = get_connection(PSYCOPG2_CONFIG)
+    primary.tpc_begin(primary.xid(0, gtrid, COORDINATOR_BRANCH))
+    with primary.cursor() as cur:
+        cur.execute(primary_sql, (close_date,))
+    primary.tpc_prepare()
+    if commit_coordinator:
+        primary.tpc_commit()
+    primary.close()
+
+    for i in range(SHARD_COUNT):
+        conn = shard_connection(i)
+        conn.tpc_begin(conn.xid(0, gtrid, f"shard-{i}"))
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO pending_ledger (user_id, type, amount) VALUES (%s, 'DEPOSIT', 1)",
+                        (f"in_doubt_{close_date}_{i}",))
+        conn.tpc_prepare()
+        conn.close() # Crash: the branch stays prepared
+
+def prepared_count():
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM pg_prepared_xacts WHERE gid LIKE %s", (f"%{GTRID_PREFIX}%",))
+        count = cur.fetchone()[0]
+    conn.close()
+    return count
+
+def markers(close_date):
+    def fetch(shard, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM pending_ledger WHERE user_id LIKE %s", (f"in_doubt_{close_date}_%",))
+            return cur.fetchone()[0]
+    return sum(fan_out(fetch))
+
+def run_test():
+    initialize_v3_db()
+    reset_database()
+    ledger = LedgerManager()
+    engine = DailyEngine(workers=1)
+    print(f"\n🚀 STARTING IN-DOUBT RESOLUTION TEST ({SHARD_COUNT} shards on one host)")
+    print("-" * 90)
+
+    ledger.queue_request("doubt_user", 'DEPOSIT', Decimal('2500.00'))
+    ok, msg = engine.run_daily_close(date(2026, 7, 1), INV_PARAMS)
+    checks = [("baseline sharded close", ok)]
+
+    # 1. Coordinator crashed after prepare: its branch still holds the registry row lock
+    leave_prepared(date(2026, 7, 2), "UPDATE fund_registry SET last_close_date = %s", commit_coordinator=False)
+    ok, msg = engine.run_daily_close(date(2026, 7, 2), INV_PARAMS)
+    checks.append(("undecided close rolled back, next close runs", ok and not prepared_count() and not markers(date(2026, 7, 2))))
+
+    # 2. Coordinator committed, then crashed before the shards did: they must commit
+    leave_prepared(date(2026, 7, 3), "UPDATE fund_registry SET last_close_date = %s", commit_coordinator=True)
+    resolved = resolve_in_doubt()
+    checks.append((f"decided close committed on every shard ({resolved} branches)",
+                   resolved == SHARD_COUNT and not prepared_count() and markers(date(2026, 7, 3)) == SHARD_COUNT))
+
+    for label, passed in checks:
+        print(f"{label:<70} | {'✅' if passed else f'❌ {msg}'}")
+    print("-" * 90)
+    print("✨ IN-DOUBT RESOLUTION VERIFIED." if all(p for _, p in checks) else "❌ IN-DOUBT RESOLUTION FAILED.")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import random
+import threading
+from decimal import Decimal
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from run import app
+from app.api.rate_limit import ingest_limiter
+from app.database.db_reset import reset_database
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+
+SEED = 20260801
+DAYS = 12
+FLOOD_THREADS = 32
+FLOOD_CLIENTS = 4 # misbehaving CRM integrations, each hammering from several threads
+USERS = [f"fl_user_{i:03d}" for i in range(1, 81)]
+# (label, flood, limiter on)
+MODES = [
+    ("quiet", False, True),
+    ("flood, no limits", True, False),
+    ("flood, rate limited", True, True),
+]
+
+class Flood:
+    """FLOOD_THREADS loops posting deposits to /api/ledger as fast as the API answers."""
+    def __init__(self):
+        self.stop = threading.Event()
+        self.codes = {}
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._run, args=(n,), daemon=True) for n in range(FLOOD_THREADS)]
+
+    def _run(self, n):
+        client = app.test_client()
+        headers = {"X-Client-Id": f"crm_{n % FLOOD_CLIENTS}"}
+        codes = {}
+        while not self.stop.is_set():
+            r = client.post("/api/ledger/deposit", json={"user_id": f"flood_{n:02d}", "amount": "10.00"}, headers=headers)
+            codes[r.status_code] = codes.get(r.status_code, 0) + 1
+            if r.status_code == 429:
+                # A polite client would sleep Retry-After; a flood doesn't
+                time.sleep(0.001)
+        with self._lock:
+            for code, n in codes.items():
+                self.codes[code] = self.codes.get(code, 0) + n
+
+    def __enter__(self):
+        for t in self.threads:
+            t.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        for t in self.threads:
+            t.join()
+        return False
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+def run_closes():
+    """DAYS closes over the same organic traffic; returns each close's latency."""
+    ledger = LedgerManager()
+    engine = DailyEngine(workers=1)
+    rng = random.Random(SEED)
+    latencies = []
+    for day in range(DAYS):
+        for _ in range(rng.randint(20, 40)):
+            ledger.queue_request(rng.choice(USERS), 'DEPOSIT', Decimal(rng.randint(500, 9000)))
+        inv_params = {'bank': rng.choice(["VCB", "ACB"]), 'rate': Decimal('8.5'),
+                      'early_rate': Decimal('2.0'), 'duration': 30}
+        t0 = time.perf_counter()
+        ok, msg = engine.run_daily_close(date(2026, 8, 1) + timedelta(days=day), inv_params)
+        latencies.append(time.perf_counter() - t0)
+        if not ok:
+            raise RuntimeError(msg)
+        time.sleep(0.2) # let intake refill between closes, as the day would
+    return latencies
+
+def run_benchmark():
+    print(f"\n🚀 INGESTION FLOOD BENCHMARK ({DAYS} closes, {FLOOD_THREADS} flood threads from {FLOOD_CLIENTS} clients)")
+    print("-" * 96)
+    print(f"{'MODE':<22} | {'CLOSE P50':>10} | {'CLOSE MAX':>10} | {'ACCEPTED':>9} | {'THROTTLED':>9} | {'ERRORS':>6}")
+    print("-" * 96)
+    results = {}
+    for label, flood, limited in MODES:
+        reset_database()
+        ingest_limiter.enabled = limited
+        if flood:
+            with Flood() as f:
+                latencies = run_closes()
+            codes = f.codes
+        else:
+            latencies, codes = run_closes(), {}
+        accepted, throttled = codes.get(202, 0), codes.get(429, 0)
+        errors = sum(n for c, n in codes.items() if c not in (202, 429))
+        results[label] = percentile(latencies, 0.5)
+        print(f"{label:<22} | {results[label] * 1000:>7.1f} ms | {max(latencies) * 1000:>7.1f} ms | "
+              f"{accepted:>9,} | {throttled:>9,} | {errors:>6,}")
+    ingest_limiter.enabled = True
+    print("-" * 96)
+    flat = results["flood, rate limited"] <= results["quiet"] * 1.5
+    print(f"rate-limited close p50 vs quiet: {results['flood, rate limited'] / results['quiet']:.2f}x "
+          f"(unlimited: {results['flood, no limits'] / results['quiet']:.2f}x) | {'✅' if flat else '❌'}")
+    print("✨ CLOSE LATENCY FLAT UNDER FLOOD." if flat else "❌ CLOSE LATENCY DEGRADED UNDER FLOOD.")
+
+if __name__ == "__main__":
+    run_benchmark()
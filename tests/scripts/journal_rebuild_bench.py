@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.database.db_reset import reset_database
+from app.database.connection import get_connection
+from app.database.sharding import is_sharded
+from app.core.journal_rebuild import JournalRebuilder
+from app.core.reconciler import ReconciliationEngine
+
+# ~10M events: every lot is created, funded by DEPOSITORS users, loses WITHDRAWALS of
+# 100.00 to its first users, then accrues once a day for DAYS days.
+LOTS = 50000
+DEPOSITORS = 20
+WITHDRAWALS = 4
+DAYS = 150
+PENDING = 500000
+USERS = 200000
+WORKERS = [1, 2, 4, 8]
+
+LOT_PRINCIPAL = 100000
+SHARE = LOT_PRINCIPAL // DEPOSITORS
+WITHDRAWAL = 100
+
+# Synthesized server-side in journal order, so every lot's history is consistent
+SYNTHESIS = [
+    ("LOT_CREATED", f"""
+        INSERT INTO ledger_events (event_type, business_date, portfolio_id, amount, detail)
+        SELECT 'LOT_CREATED', DATE '2026-01-01', i, {LOT_PRINCIPAL},
+               jsonb_build_object('bank', 'BANK_' || (i % 12), 'rate_m', '8.5', 'rate_n', '2.0',
+                                  'purchase_date', '2026-01-01', 'maturity_date', '2026-12-31')
+        FROM generate_series(1, {LOTS}) i
+    """),
+    ("DEPOSIT_ALLOCATED", f"""
+        INSERT INTO ledger_events (event_type, business_date, user_id, portfolio_id, amount)
+        SELECT 'DEPOSIT_ALLOCATED', DATE '2026-01-01', 'bench_user_' || ((i * {DEPOSITORS} + j) % {USERS}), i, {SHARE}
+        FROM generate_series(1, {LOTS}) i, generate_series(0, {DEPOSITORS - 1}) j
+    """),
+    ("QUEUED / SETTLED", f"""
+        WITH q AS (
+            INSERT INTO ledger_events (event_type, tx_id, user_id, amount, detail)
+            SELECT 'QUEUED', t, 'bench_user_' || (t % {USERS}), 1000 + t % 5000,
+                   jsonb_build_object('type', 'DEPOSIT', 'intake_id', md5(t::text))
+            FROM generate_series(1, {PENDING}) t
+            RETURNING tx_id
+        )
+        INSERT INTO ledger_events (event_type, business_date, tx_id)
+        SELECT 'SETTLED', DATE '2026-01-02', tx_id FROM q WHERE tx_id % 10 <> 0
+    """),
+    ("WITHDRAWALS", f"""
+        INSERT INTO ledger_events (event_type, business_date, user_id, portfolio_id, amount)
+        SELECT e, DATE '2026-01-02', CASE WHEN e = 'WITHDRAWAL_APPLIED' THEN 'bench_user_' || ((i * {DEPOSITORS} + j) % {USERS}) END,
+               i, {WITHDRAWAL}
+        FROM generate_series(1, {LOTS}) i, generate_series(0, {WITHDRAWALS - 1}) j,
+             unnest(ARRAY['WITHDRAWAL_APPLIED', 'LOT_WITHDRAWAL']) e
+    """),
+    ("ACCRUAL", f"""
+        INSERT INTO ledger_events (event_type, business_date, portfolio_id, amount)
+        SELECT 'ACCRUAL', DATE '2026-01-01' + d, i, round(d * {LOT_PRINCIPAL - WITHDRAWALS * WITHDRAWAL} * 0.085 / 365, 2)
+        FROM generate_series(1, {DAYS}) d, generate_series(1, {LOTS}) i
+        ORDER BY d, i
+    """),
+    ("DAY_CLOSED", f"""
+        INSERT INTO ledger_events (event_type, business_date, detail)
+        SELECT 'DAY_CLOSED', DATE '2026-01-01' + d,
+               jsonb_build_object('deposit', '0', 'withdrawal', '0', 'idle_cash', '1000000.00',
+                                  'invested', ({LOTS} * {LOT_PRINCIPAL - WITHDRAWALS * WITHDRAWAL})::text)
+        FROM generate_series(1, {DAYS}) d
+    """)
+]
+
+def synthesize():
+    reset_database()
+    conn = get_connection()
+    with conn:
+        with conn.cursor() as cur:
+            for label, statement in SYNTHESIS:
+                started = time.perf_counter()
+                cur.execute(statement)
+                print(f"  synthesized {label:<20} {time.perf_counter() - started:>7.2f}s")
+            cur.execute("ANALYZE ledger_events")
+            cur.execute("SELECT COUNT(*) FROM ledger_events")
+            count = cur.fetchone()[0]
+    conn.close()
+    return count
+
+def run_benchmark():
+    if is_sharded():
+        print("❌ Run against an unsharded fund (SHARD_DATABASES empty): events are synthesized on the primary.")
+        return
+
+    print(f"\n🚀 JOURNAL REBUILD BENCHMARK ({LOTS:,} lots, {DAYS} accrual days, {PENDING:,} pending rows)")
+    events = synthesize()
+    print("-" * 80)
+    print(f"{'WORKERS':<10} | {'REBUILD':>10} | {'REPLAY':>10} | {'EVENTS/S':>12} | {'SPEEDUP':>8} | STATUS")
+    print("-" * 80)
+
+    baseline = None
+    for workers in [w for w in WORKERS if w <= (os.cpu_count() or 1)] or [1]:
+        report = JournalRebuilder(workers=workers).run()
+        db = report["databases"][0]
+        baseline = baseline or report["seconds"]
+        recon = ReconciliationEngine().run_full()
+        status = "✅" if recon["clean"] and db["rows"].get("portfolio") == LOTS else "❌"
+        print(f"{workers:<10} | {report['seconds']:>9.2f}s | {db['replay_seconds']:>9.2f}s | "
+              f"{events / report['seconds']:>12,.0f} | {baseline / report['seconds']:>7.2f}x | {status}")
+    print("-" * 80)
+    print(f"✨ {events:,} events rebuilt.")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,106 @@
+import os
+import sys
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.database.db_reset import reset_database
+from app.database.connection import get_connection
+from app.database.sharding import fan_out
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+from app.core.journal_rebuild import JournalRebuilder
+from app.core.reconciler import ReconciliationEngine
+
+SEED = 20260501
+DAYS = 20
+USERS = [f"jr_user_{i:03d}" for i in range(1, 121)]
+BANKS = ["VCB", "ACB", "BIDV", "Techcombank"]
+
+def _user_tables(shard, conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, user_id, type, amount, portfolio_id, status, created_at, intake_id FROM pending_ledger")
+        pending = cur.fetchall()
+        cur.execute("SELECT user_id, portfolio_id, principal_owned FROM user_shares")
+        shares = cur.fetchall()
+    return pending, shares
+
+def snapshot():
+    """Every rebuilt table, minus surrogate ids (user_shares, daily_reports) and reconciliation flags."""
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT total_idle_cash, total_invested, last_close_date FROM fund_registry")
+        registry = cur.fetchone()
+        cur.execute("SELECT report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close FROM daily_reports ORDER BY report_date")
+        reports = cur.fetchall()
+        cur.execute("SELECT * FROM portfolio ORDER BY id")
+        lots = cur.fetchall()
+        cur.execute("SELECT t.portfolio_id, t.shares_total FROM lot_share_totals t JOIN portfolio p ON p.id = t.portfolio_id ORDER BY 1")
+        totals = cur.fetchall()
+    conn.close()
+    parts = fan_out(_user_tables)
+    return {
+        "registry": registry,
+        "reports": reports,
+        "portfolio": lots,
+        "lot_share_totals": totals,
+        "pending_ledger": sorted(r for pending, _ in parts for r in pending),
+        "user_shares": sorted(r for _, shares in parts for r in shares)
+    }
+
+def run_scenario():
+    """Deposits, withdrawals, edits and cancels over DAYS closes, with a few requests left pending."""
+    reset_database()
+    ledger = LedgerManager()
+    engine = DailyEngine(workers=1)
+    rng = random.Random(SEED)
+    current_date = date(2026, 5, 1)
+
+    for day in range(DAYS + 1):
+        positions = sorted(r for _, shares in fan_out(_user_tables) for r in shares if r[2] > 100)
+        queued, deposits = [], []
+        for _ in range(rng.randint(30, 60)):
+            if rng.random() < 0.7 or not positions:
+                deposits.append(ledger.queue_request(rng.choice(USERS), 'DEPOSIT', Decimal(rng.randint(500, 9000))))
+                queued.append(deposits[-1])
+            else:
+                u, lot_id, balance = rng.choice(positions)
+                amt = (balance * Decimal(str(rng.uniform(0.05, 0.3)))).quantize(Decimal('0.01'))
+                queued.append(ledger.queue_request(u, 'WITHDRAWAL', amt, portfolio_id=lot_id))
+        for tx_id in rng.sample(deposits, min(3, len(deposits))):
+            ledger.update_pending(tx_id, Decimal(rng.randint(100, 900)))
+        for tx_id in rng.sample(queued, 2):
+            ledger.cancel_pending(tx_id)
+
+        if day == DAYS:
+            break # Leave the last batch PENDING
+        inv_params = {'bank': rng.choice(BANKS), 'rate': Decimal('8.5'),
+                      'early_rate': Decimal('2.0'), 'duration': rng.choice([7, 30, 180])}
+        ok, msg = engine.run_daily_close(current_date, inv_params)
+        if not ok:
+            raise RuntimeError(msg)
+        current_date += timedelta(days=1)
+
+def run_test():
+    print(f"\n🚀 STARTING JOURNAL REBUILD TEST (seed {SEED}, {DAYS} days)")
+    print("-" * 90)
+    run_scenario()
+    before = snapshot()
+    all_equal = True
+    for workers in (1, 4):
+        report = JournalRebuilder(workers=workers).run()
+        after = snapshot()
+        diff = [k for k in before if before[k] != after[k]]
+        all_equal = all_equal and not diff
+        status = "✅" if not diff else f"❌ differs in: {', '.join(diff)}"
+        print(f"rebuild, {workers} worker(s) | {report['events']:,} events in {report['seconds']:.2f}s | {status}")
+
+    recon = ReconciliationEngine().run_full()
+    all_equal = all_equal and recon["clean"]
+    print(f"full reconciliation after rebuild | {'✅' if recon['clean'] else '❌'} ({recon['lots_checked']} lots)")
+    print("-" * 90)
+    print("✨ JOURNAL REBUILD VERIFIED." if all_equal else "❌ JOURNAL REBUILD DIVERGED.")
+
+if __name__ == "__main__":
+    run_test()
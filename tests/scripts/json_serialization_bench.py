@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+from flask import Flask, jsonify
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.api.json_provider import LedgerJSONProvider, rows_response
+from app.core.auditor import SystemAuditor
+
+ROWS = 100_000
+
+def build_rows():
+    """Synthetic /audit/full user rows shaped like the cursor output."""
+    banks = ["VCB", "ACB", "BIDV", "Techcombank", "TPBank"]
+    return [(
+        f"Client_{i:06d}",
+        random.choice(banks),
+        random.randint(1, 500),
+        Decimal(random.randint(1, 10_000_000)) / 100,
+        Decimal(random.choice(["7.50000", "8.50000", "9.10000"]))
+    ) for i in range(ROWS)]
+
+def timed(label, fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<42} {best * 1000:>9.1f} ms | {len(body) / 1e6:>6.2f} MB")
+    return best
+
+def run_benchmark():
+    rows = build_rows()
+    cols = SystemAuditor.USER_COLUMNS
+
+    legacy_app = Flask("legacy")
+    fast_app = Flask("fast")
+    fast_app.json = LedgerJSONProvider(fast_app)
+
+    print(f"\n🚀 JSON SERIALIZATION BENCHMARK ({ROWS:,} audit rows)")
+    print("-" * 80)
+
+    with legacy_app.app_context():
+        # Current /audit/full: dict per row, Decimals through Flask's default encoder
+        t_dict = timed("legacy: dicts + default jsonify", lambda: jsonify(
+            [dict(zip(cols, r)) for r in rows]).get_data())
+        # Current /reports & /pending-list: dict per row with float() conversion
+        t_float = timed("legacy: dicts + float() + jsonify", lambda: jsonify(
+            [{"uid": r[0], "bank": r[1], "pid": r[2], "amt": float(r[3]), "rate": float(r[4])} for r in rows]).get_data())
+
+    with fast_app.app_context():
+        t_provider = timed("provider: dicts + exact Decimal jsonify", lambda: jsonify(
+            [dict(zip(cols, r)) for r in rows]).get_data())
+        t_fast = timed("fast path: tuples -> JSON text", lambda: rows_response(cols, rows).get_data())
+
+    print("-" * 80)
+    print(f"  Speedup vs dict+default : {t_dict / t_fast:.2f}x")
+    print(f"  Speedup vs dict+float   : {t_float / t_fast:.2f}x")
+    print(f"  Provider vs dict+default: {t_dict / t_provider:.2f}x")
+    faster = t_fast < min(t_dict, t_float) and t_provider < t_dict
+    print("✨ EXACT DECIMAL JSON FASTER THAN BOTH BASELINES." if faster else "❌ EXACT DECIMAL JSON SLOWER THAN A BASELINE.")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.core.fund_model import FundModel
+from app.core.stress import FundSnapshot, StressScenario, LiquidityStressEngine
+
+BANKS = ["VCB", "ACB", "BIDV", "Techcombank"]
+PATHS = 20000
+
+def build_model(days=60, seed=11):
+    """A fund with a few months of history, built in memory (no database needed)."""
+    rng = random.Random(seed)
+    model = FundModel()
+    users = [f"stress_user_{i:04d}" for i in range(500)]
+    current = date(2026, 1, 1)
+    for _ in range(days):
+        holders = model.get_users_with_balances()
+        for _ in range(rng.randint(50, 120)):
+            if rng.random() < 0.7 or not holders:
+                model.queue_request(rng.choice(users), 'DEPOSIT', Decimal(rng.randint(500, 20000)))
+            else:
+                u, p, bal = rng.choice(holders)
+                model.queue_request(u, 'WITHDRAWAL', (bal * Decimal('0.2')).quantize(Decimal('0.01')), p)
+        model.run_daily_close(current, {'bank': rng.choice(BANKS), 'rate': Decimal('8.0'),
+                                        'early_rate': Decimal('2.0'), 'duration': rng.choice([30, 90, 180])})
+        current += timedelta(days=1)
+    return model
+
+def run_test():
+    snapshot = FundSnapshot.from_model(build_model())
+    print(f"\n🚀 STARTING LIQUIDITY STRESS TEST ({len(snapshot.lots)} lots, {PATHS:,} paths)")
+
+    # 1. Same seed, different worker counts: identical report
+    serial = LiquidityStressEngine(snapshot, paths=PATHS, workers=1, seed=99).run()
+    start = time.perf_counter()
+    pooled = LiquidityStressEngine(snapshot, paths=PATHS, workers=4, seed=99).run()
+    elapsed = time.perf_counter() - start
+    print(f"Test 1 (Deterministic Across Workers): {'✅' if serial == pooled else '❌'} ({PATHS / elapsed:,.0f} paths/s on 4 workers)")
+
+    # 2. Longer horizons can only be worse
+    h = pooled["horizons"]
+    monotone = all(h[a]["shortfall_probability"] <= h[b]["shortfall_probability"] and
+                   h[a]["residual_percentiles"][99] <= h[b]["residual_percentiles"][99]
+                   for a, b in zip(sorted(h), sorted(h)[1:]))
+    print(f"Test 2 (Monotone In Horizon): {'✅' if monotone else '❌'}")
+
+    # 3. Early exits never increase the shortfall
+    covered = all(v["residual_percentiles"][p] <= v["shortfall_percentiles"][p] + 1e-6
+                  for v in h.values() for p in v["shortfall_percentiles"])
+    print(f"Test 3 (Early Exit Only Helps): {'✅' if covered else '❌'}")
+
+    # 4. A fund with no withdrawals never runs short
+    calm = LiquidityStressEngine(snapshot, StressScenario(withdrawal_scale=0.0), paths=2000, workers=2, seed=1).run()
+    print(f"Test 4 (No Withdrawals, No Shortfall): {'✅' if all(v['shortfall_probability'] == 0 for v in calm['horizons'].values()) else '❌'}")
+
+    # 5. A heavier run regime raises the tail
+    panic = LiquidityStressEngine(snapshot, StressScenario(run_probability=0.05, run_multiplier=8.0),
+                                  paths=PATHS, workers=4, seed=99).run()
+    worse = panic["horizons"][90]["shortfall_percentiles"][99] >= h[90]["shortfall_percentiles"][99]
+    print(f"Test 5 (Run Regime Raises Tail): {'✅' if worse else '❌'}")
+    print("\n✨ LIQUIDITY STRESS ENGINE VERIFIED.")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import random
+from decimal import Decimal, Context, ROUND_HALF_UP
+from psycopg2.extensions import DECIMAL, LONGINTEGER
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.core.money import CENT, to_cents, from_cents, to_rate, rate_units, daily_interest
+
+ROWS = 1_000_000
+LOTS = 20_000
+DAYS = 30
+EXACT = Context(prec=100, rounding=ROUND_HALF_UP)
+
+def timed(fn, repeat=3):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def build_inputs(rng):
+    texts = [f"{rng.randint(1, 1_500_000)}.{rng.randint(0, 99):02d}" for _ in range(ROWS)]
+    pending = [(i, f"user_{rng.randint(1, 50_000)}", rng.choice(("DEPOSIT", "WITHDRAWAL")), t, rng.randint(1, 500))
+               for i, t in enumerate(texts)]
+    lots = [(rng.randint(100_000, 10 ** 10), Decimal(rng.choice(["6.5", "7.25", "8.5", "9.125"])))
+            for _ in range(LOTS)]
+    return texts, pending, lots
+
+# --- Decimal path (as before) vs integer path, stage by stage ---
+
+def parse_decimal(texts):
+    return [Decimal(str(t)).quantize(CENT, rounding=ROUND_HALF_UP) for t in texts]
+
+def parse_int(texts):
+    return [to_cents(t) for t in texts]
+
+def fetch_decimal(pending):
+    """Driver cost of pending rows with a numeric amount column."""
+    return [(i, u, t, DECIMAL(a, None), p) for i, u, t, a, p in pending]
+
+def fetch_int(pending):
+    """Same rows read through the BIGINT amount_cents column."""
+    return [(i, u, t, LONGINTEGER(a.replace(".", ""), None), p) for i, u, t, a, p in pending]
+
+def aggregate(rows, zero):
+    """collect_pending's aggregation: withdrawals per (user, lot) and per lot, deposits per user."""
+    withdrawals, deposits, per_lot = {}, {}, {}
+    total_dep = total_wit = zero
+    for _, user_id, tx_type, amount, port_id in rows:
+        if tx_type == 'WITHDRAWAL':
+            key = (user_id, port_id)
+            withdrawals[key] = withdrawals.get(key, zero) + amount
+            per_lot[port_id] = per_lot.get(port_id, zero) + amount
+            total_wit += amount
+        else:
+            deposits[user_id] = deposits.get(user_id, zero) + amount
+            total_dep += amount
+    return total_dep, total_wit, len(withdrawals), len(deposits)
+
+def accrue_decimal(lots):
+    """principal * rate / 100 / 365 per lot per day in Decimal, rounded to the cent."""
+    accrued = [Decimal('0.00')] * len(lots)
+    for _ in range(DAYS):
+        for i, (principal, rate) in enumerate(lots):
+            exact = EXACT.divide(EXACT.multiply(from_cents(principal), to_rate(rate)), Decimal(36500))
+            accrued[i] += exact.quantize(CENT, context=EXACT)
+    return [to_cents(a) for a in accrued]
+
+def accrue_int(lots):
+    units = [(principal, rate_units(rate)) for principal, rate in lots]
+    accrued = [0] * len(lots)
+    for _ in range(DAYS):
+        for i, (principal, r) in enumerate(units):
+            accrued[i] += daily_interest(principal, r)
+    return accrued
+
+def run_benchmark():
+    rng = random.Random(42)
+    texts, pending, lots = build_inputs(rng)
+    print(f"\n🚀 MONEY REPRESENTATION BENCHMARK ({ROWS:,} pending rows, {LOTS:,} lots x {DAYS} accrual days)")
+    print("-" * 88)
+    print(f"{'STAGE':<36} | {'DECIMAL':>10} | {'INT CENTS':>10} | {'SPEEDUP':>8} | SAME RESULT")
+    print("-" * 88)
+
+    def stage(label, decimal_fn, int_fn, same):
+        dec_s, dec_r = timed(decimal_fn)
+        int_s, int_r = timed(int_fn)
+        ok = same(dec_r, int_r)
+        print(f"{label:<36} | {dec_s * 1000:>7.0f} ms | {int_s * 1000:>7.0f} ms | {dec_s / int_s:>7.1f}x | "
+              f"{'✅' if ok else '❌'}")
+        return ok
+
+    dec_rows = fetch_decimal(pending)
+    int_rows = fetch_int(pending)
+    results = [
+        stage("parse amounts (API / CLI input)", lambda: parse_decimal(texts), lambda: parse_int(texts),
+              lambda d, i: all(to_cents(a) == b for a, b in zip(d, i))),
+        stage("driver decode (numeric vs bigint)", lambda: fetch_decimal(pending), lambda: fetch_int(pending),
+              lambda d, i: all(to_cents(a[3]) == b[3] for a, b in zip(d, i))),
+        stage("close aggregation", lambda: aggregate(dec_rows, Decimal('0')), lambda: aggregate(int_rows, 0),
+              lambda d, i: (to_cents(d[0]), to_cents(d[1]), d[2], d[3]) == i),
+        stage("daily accrual", lambda: accrue_decimal(lots), lambda: accrue_int(lots), lambda d, i: d == i)
+    ]
+    print("-" * 88)
+    print("✨ INTEGER PATH MATCHES THE DECIMAL PATH." if all(results) else "❌ INTEGER PATH DIVERGED.")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,101 @@
+import os
+import sys
+import random
+from decimal import Decimal, Context, ROUND_HALF_UP
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.core.money import (CENT, ACCRUAL_DIVISOR, to_cents, from_cents, format_cents, to_rate, rate_units,
+                            daily_interest)
+
+SEED = 20260601
+SAMPLES = 200000
+EXACT = Context(prec=100, rounding=ROUND_HALF_UP)
+
+def decimal_cents(amount):
+    """The Decimal path: Decimal(str(x)) rounded as a DECIMAL(20, 2) assignment."""
+    value = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def decimal_interest(principal, rate):
+    """principal * rate / 100 / 365 in exact Decimal arithmetic, rounded half away from zero to the cent."""
+    exact = EXACT.divide(EXACT.multiply(principal, rate), Decimal(36500))
+    return exact.quantize(CENT, context=EXACT)
+
+def random_amount(rng):
+    whole = rng.choice([0, rng.randint(0, 99), rng.randint(0, 10 ** 6), rng.randint(0, 10 ** 15)])
+    digits = "".join(rng.choice("0123456789") for _ in range(rng.choice([0, 1, 2, 2, 3, 5])))
+    sign = rng.choice(["", "", "-", "+"])
+    text = f"{sign}{whole}.{digits}" if digits or rng.random() < 0.2 else f"{sign}{whole}"
+    kind = rng.random()
+    if kind < 0.6:
+        return rng.choice([text, f" {text} "])
+    if kind < 0.8:
+        return Decimal(text)
+    if kind < 0.9:
+        return float(text)
+    return int(whole) * (-1 if sign == "-" else 1)
+
+def check_parsing(rng):
+    failures = []
+    for _ in range(SAMPLES):
+        amount = random_amount(rng)
+        expected = decimal_cents(amount)
+        got = to_cents(amount)
+        # numeric has no negative zero: -0.004 is stored (and printed) as 0.00
+        if from_cents(got) != expected or format_cents(got) != str(expected if expected else abs(expected)):
+            failures.append((amount, got, expected))
+    # Inputs both paths must refuse
+    for bad in ["", "abc", ".", "-", "1.2.3", "NaN", "Infinity", "1e999999", None, [], {}]:
+        try:
+            to_cents(bad)
+            failures.append((bad, "accepted", "ValueError"))
+        except ValueError:
+            pass
+    # Exponent forms and other spellings fall back to Decimal and must still agree
+    for text in ["1e3", "1E-2", "2.5e-3", "-0.005", "0.0049999", "123456789012345678.995"]:
+        if from_cents(to_cents(text)) != decimal_cents(text):
+            failures.append((text, to_cents(text), decimal_cents(text)))
+    return failures
+
+def check_aggregation(rng):
+    amounts = [Decimal(rng.randint(-10 ** 9, 10 ** 9)).scaleb(-2) for _ in range(SAMPLES)]
+    cents = [to_cents(a) for a in amounts]
+    return [] if from_cents(sum(cents)) == sum(amounts, Decimal('0')) else [("sum", sum(cents), sum(amounts))]
+
+def check_accrual(rng):
+    failures = []
+    cases = []
+    for _ in range(SAMPLES):
+        principal = rng.choice([rng.randint(0, 10 ** 6), rng.randint(0, 10 ** 12), rng.randint(-10 ** 6, 0)])
+        rate = Decimal(rng.randint(0, 2000000)).scaleb(-5) # 0 .. 20.00000 %
+        cases.append((principal, rate))
+    # Exact half-cent ties: principal * rate_units == ACCRUAL_DIVISOR * (k + 1/2)
+    for k in range(200):
+        units = rng.choice([100000, 500000, 800000, 1000000])
+        n = ACCRUAL_DIVISOR * (2 * k + 1)
+        if n % (2 * units) == 0:
+            cases.append((n // (2 * units), Decimal(units).scaleb(-5)))
+    for principal, rate in cases:
+        expected = decimal_interest(from_cents(principal), to_rate(rate))
+        got = daily_interest(principal, rate_units(rate))
+        if from_cents(got) != expected:
+            failures.append((principal, rate, got, expected))
+    return failures, len(cases)
+
+def run_test():
+    rng = random.Random(SEED)
+    print(f"\n🚀 STARTING MONEY CORRECTNESS TEST (seed {SEED}, {SAMPLES:,} samples per check)")
+    print("-" * 90)
+    all_ok = True
+    checks = [("to_cents / from_cents / format_cents vs Decimal(str(x))", check_parsing(rng)),
+              ("integer aggregation vs Decimal sum", check_aggregation(rng))]
+    accrual_failures, accrual_cases = check_accrual(rng)
+    checks.append((f"daily_interest vs exact Decimal ({accrual_cases:,} cases)", accrual_failures))
+    for label, failures in checks:
+        all_ok = all_ok and not failures
+        print(f"{label:<70} | {'✅' if not failures else f'❌ {len(failures)} mismatches, e.g. {failures[0]}'}")
+    print("-" * 90)
+    print("✨ MONEY PATH VERIFIED." if all_ok else "❌ MONEY PATH DIVERGED.")
+
+if __name__ == "__main__":
+    run_test()
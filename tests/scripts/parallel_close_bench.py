@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import random
+import uuid
+from decimal import Decimal
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.database.db_reset import reset_database
+from app.database.sharding import fan_out
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+from app.core.parallel_close import ParallelDailyClose, _get_pool
+
+USERS = 20000
+DAY_ONE_DEPOSITS = 60000
+DAY_TWO_REQUESTS = 120000
+WORKERS = [1, 2, 4, 8]
+INV_PARAMS = {'bank': 'VCB', 'rate': Decimal('8.5'), 'early_rate': Decimal('2.0'), 'duration': 180}
+
+def _positions(shard, conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT user_id, portfolio_id, principal_owned FROM user_shares")
+        return cur.fetchall()
+
+def queue_bulk(ledger, rows):
+    """Loads the pending batch straight through queue_batch (one statement per shard)."""
+    ledger.queue_batch([(uuid.uuid4().hex, u, t, a, p) for u, t, a, p in rows])
+
+def prepare_fund(rng, ledger):
+    """Day 1 closes serially to build positions; day 2's batch is left PENDING for the timed close."""
+    reset_database()
+    users = [f"bench_user_{i:06d}" for i in range(USERS)]
+    queue_bulk(ledger, [(rng.choice(users), 'DEPOSIT', Decimal(rng.randint(500, 15000)), None)
+                        for _ in range(DAY_ONE_DEPOSITS)])
+    ok, msg = DailyEngine(workers=1).run_daily_close(date(2026, 6, 1), INV_PARAMS)
+    if not ok:
+        raise RuntimeError(msg)
+
+    positions = [r for part in fan_out(_positions) for r in part]
+    rows = []
+    for _ in range(DAY_TWO_REQUESTS):
+        if rng.random() < 0.6:
+            rows.append((rng.choice(users), 'DEPOSIT', Decimal(rng.randint(500, 15000)), None))
+        else:
+            u, p, owned = rng.choice(positions)
+            rows.append((u, 'WITHDRAWAL', (owned * Decimal('0.01')).quantize(Decimal('0.01')), p))
+    queue_bulk(ledger, rows)
+
+def run_benchmark():
+    ledger = LedgerManager()
+    print(f"\n🚀 PARALLEL CLOSE BENCHMARK ({USERS:,} users, {DAY_TWO_REQUESTS:,} pending rows per close)")
+    print("-" * 80)
+    print(f"{'WORKERS':<10} | {'CLOSE TIME':>12} | {'ROWS/S':>12} | {'SPEEDUP':>8} | STATUS")
+    print("-" * 80)
+
+    baseline = None
+    for workers in [0] + WORKERS:
+        prepare_fund(random.Random(42), ledger)
+        if workers:
+            # Parallel path even at 1 worker; warm the pool so process start-up is not billed to the close
+            list(_get_pool(workers).map(time.sleep, [0.2] * workers))
+            close = ParallelDailyClose(DailyEngine(), workers).run
+        else:
+            close = DailyEngine(workers=1).run_daily_close
+        start = time.perf_counter()
+        ok, msg = close(date(2026, 6, 2), INV_PARAMS)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        label = "serial" if workers == 0 else str(workers)
+        print(f"{label:<10} | {elapsed:>10.3f} s | {DAY_TWO_REQUESTS / elapsed:>12,.0f} | {baseline / elapsed:>7.2f}x | {'✅' if ok else '❌ ' + msg}")
+    print("-" * 80)
+
+if __name__ == "__main__":
+    run_benchmark()
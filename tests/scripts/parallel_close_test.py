@@ -0,0 +1,108 @@
+import os
+import sys
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.database.db_reset import reset_database
+from app.database.connection import get_connection
+from app.database.sharding import fan_out
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+
+SEED = 20260401
+DAYS = 15
+USERS = [f"pc_user_{i:03d}" for i in range(1, 151)]
+BANKS = ["VCB", "ACB", "BIDV", "Techcombank", "TPBank"]
+
+def _user_shares(shard, conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT user_id, portfolio_id, principal_owned FROM user_shares")
+        return cur.fetchall()
+
+def snapshot():
+    """Engine-visible state keyed by lot purchase date (lot ids are not part of the contract)."""
+    conn = get_connection()
+    with conn.cursor() as cur:
+        cur.execute("SELECT total_idle_cash, total_invested, last_close_date FROM fund_registry")
+        registry = cur.fetchone()
+        cur.execute("SELECT report_date, daily_deposit, daily_withdrawal, idle_cash_at_close, invested_at_close FROM daily_reports ORDER BY report_date")
+        reports = cur.fetchall()
+        cur.execute("SELECT id, purchase_date, bank_name, principal, accrued_interest, status FROM portfolio ORDER BY purchase_date")
+        lots = cur.fetchall()
+        cur.execute("SELECT portfolio_id, shares_total FROM lot_share_totals")
+        totals = cur.fetchall()
+    conn.close()
+
+    lot_key = {l[0]: l[1] for l in lots}
+    shares = sorted((u, lot_key.get(p), amt) for part in fan_out(_user_shares) for u, p, amt in part)
+    return {
+        "registry": registry,
+        "reports": reports,
+        "lots": [l[1:] for l in lots],
+        "lot_share_totals": sorted((lot_key.get(p), t) for p, t in totals),
+        "user_shares": shares
+    }
+
+def holdings():
+    """Current positions in a run-independent order, so both runs draw the same withdrawals."""
+    state = snapshot()
+    return [(u, d, amt) for u, d, amt in state["user_shares"] if amt > 10]
+
+def run_scenario(workers):
+    reset_database()
+    ledger = LedgerManager()
+    engine = DailyEngine(workers=workers)
+    rng = random.Random(SEED)
+    current_date = date(2026, 4, 1)
+
+    for _ in range(DAYS):
+        positions = holdings()
+        conn = get_connection()
+        with conn.cursor() as cur:
+            cur.execute("SELECT purchase_date, id FROM portfolio")
+            lot_ids = dict(cur.fetchall())
+        conn.close()
+
+        for _ in range(rng.randint(60, 120)):
+            if rng.random() < 0.7 or not positions:
+                ledger.queue_request(rng.choice(USERS), 'DEPOSIT', Decimal(rng.randint(500, 15000)))
+            else:
+                u, lot_date, balance = rng.choice(positions)
+                amt = (balance * Decimal(str(rng.uniform(0.05, 0.5)))).quantize(Decimal('0.01'))
+                if amt > 0:
+                    ledger.queue_request(u, 'WITHDRAWAL', amt, portfolio_id=lot_ids[lot_date])
+
+        inv_params = None
+        if rng.random() < 0.9:
+            inv_params = {'bank': rng.choice(BANKS), 'rate': Decimal('8.5'),
+                          'early_rate': Decimal('2.0'), 'duration': rng.choice([180, 360])}
+        ok, msg = engine.run_daily_close(current_date, inv_params)
+        if not ok:
+            raise RuntimeError(f"{workers} worker(s): {msg}")
+        current_date += timedelta(days=1)
+
+    # The guards must behave the same way too
+    duplicate_ok, _ = engine.run_daily_close(current_date - timedelta(days=1))
+    gap_ok, _ = engine.run_daily_close(current_date + timedelta(days=3))
+    state = snapshot()
+    state["guards"] = (duplicate_ok, gap_ok)
+    return state
+
+def run_test():
+    print(f"\n🚀 STARTING PARALLEL CLOSE EQUIVALENCE TEST (seed {SEED}, {DAYS} days)")
+    print("-" * 90)
+    serial = run_scenario(1)
+    all_equal = True
+    for workers in (2, 4, 8):
+        parallel = run_scenario(workers)
+        diff = [k for k in serial if serial[k] != parallel[k]]
+        all_equal = all_equal and not diff
+        status = "✅" if not diff else f"❌ differs in: {', '.join(diff)}"
+        print(f"{workers} workers vs serial | {status}")
+    print("-" * 90)
+    print("✨ PARALLEL CLOSE EQUIVALENT." if all_equal else "❌ PARALLEL CLOSE DIVERGED.")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+from decimal import Decimal
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.config import READ_REPLICA_DSN, REPLICA_PROBE_CONNECTIONS
+from app.database.db_reset import reset_database
+from app.database.connection import get_connection
+from app.database.replica import router, read_connection
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+
+# Needs two local instances: DB_HOST as primary and READ_REPLICA_DSN as a streaming
+# standby of it (e.g. pg_basebackup -R), connecting as a role allowed to pause replay.
+
+def served_by_replica(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_is_in_recovery()")
+        in_recovery = cur.fetchone()[0]
+    conn.rollback()
+    return in_recovery
+
+def registry_close_date(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT last_close_date FROM fund_registry")
+        return cur.fetchone()[0]
+
+def set_replay(paused):
+    conn = get_connection(router.replica_config)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_wal_replay_pause()" if paused else "SELECT pg_wal_replay_resume()")
+    conn.close()
+
+def run_test():
+    if not READ_REPLICA_DSN:
+        print("READ_REPLICA_DSN is not set; nothing to test.")
+        return
+
+    reset_database()
+    ledger = LedgerManager()
+    engine = DailyEngine()
+    print("\n🚀 STARTING READ REPLICA ROUTING TEST")
+
+    # 1. Idle fund: reads go to the replica
+    conn = read_connection()
+    print(f"Test 1 (Replica Serves Reads): {'✅' if served_by_replica(conn) else '❌'}")
+    conn.close()
+
+    # 2. Read-your-writes: a close is visible on the very next read
+    ledger.queue_request("replica_user", 'DEPOSIT', Decimal('2500.00'))
+    engine.run_daily_close(date(2026, 7, 1), {'bank': 'VCB', 'rate': '8.5', 'early_rate': '2.0', 'duration': 180})
+    conn = read_connection()
+    print(f"Test 2 (Close Visible Immediately): {'✅' if registry_close_date(conn) == date(2026, 7, 1) else '❌'} "
+          f"(served by {'replica' if served_by_replica(conn) else 'primary'})")
+    conn.close()
+
+    # 3. Lagging replica: replay paused, the next close forces a primary fallback
+    set_replay(paused=True)
+    try:
+        engine.run_daily_close(date(2026, 7, 2))
+        conn = read_connection()
+        fresh = registry_close_date(conn) == date(2026, 7, 2)
+        print(f"Test 3 (Lag Falls Back To Primary): {'✅' if fresh and not served_by_replica(conn) else '❌'}")
+        conn.close()
+    finally:
+        set_replay(paused=False)
+
+    # 4. Replay resumed: routing returns to the replica
+    conn = read_connection()
+    print(f"Test 4 (Replica Resumes): {'✅' if served_by_replica(conn) else '❌'}")
+    conn.close()
+
+    # 5. Many request threads share the bounded probe pool instead of one primary connection each
+    def reads():
+        for _ in range(10):
+            read_connection().close()
+    threads = [threading.Thread(target=reads) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Test 5 (Probe Pool Bounded): {'✅' if router.probes_open() <= REPLICA_PROBE_CONNECTIONS else '❌'} "
+          f"({router.probes_open()} probe connections for 16 threads)")
+    print("\n✨ READ REPLICA ROUTING VERIFIED.")
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,76 @@
+import os
+import sys
+import random
+from decimal import Decimal
+from datetime import date, timedelta
+
+# Shard layout must be set before app.config is imported
+os.environ.setdefault("SHARD_DATABASES", "ledger_shard_0,ledger_shard_1,ledger_shard_2")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from app.database.schema import initialize_v3_db
+from app.database.db_reset import reset_database
+from app.database.sharding import SHARD_COUNT, fan_out, shard_for_user, shard_for_tx, shard_connection
+from app.core.ledger_manager import LedgerManager
+from app.core.daily_engine import DailyEngine
+from app.core.reconciler import ReconciliationEngine
+from app.core.auditor import SystemAuditor
+
+def misplaced_rows(shard, conn):
+    """Rows whose user hashes to a different shard (must be none)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT user_id FROM user_shares UNION ALL SELECT user_id FROM pending_ledger")
+        return [u for (u,) in cur.fetchall() if shard_for_user(u) != shard]
+
+def run_test():
+    initialize_v3_db()
+    reset_database()
+    ledger = LedgerManager()
+    engine = DailyEngine()
+    reconciler = ReconciliationEngine()
+    users = [f"shard_user_{i:03d}" for i in range(1, 121)]
+    current_date = date(2026, 5, 1)
+
+    print(f"\n🚀 STARTING SHARDED CLOSE TEST ({SHARD_COUNT} shards)")
+    print("-" * 90)
+
+    for day in range(1, 11):
+        for _ in range(60):
+            u = random.choice(users)
+            if random.random() < 0.7:
+                tx_id = ledger.queue_request(u, 'DEPOSIT', Decimal(random.randint(1000, 5000)))
+                assert shard_for_tx(tx_id) == shard_for_user(u), "tx id does not route to the user's shard"
+            else:
+                conn = shard_connection(shard_for_user(u))
+                with conn.cursor() as cur:
+                    cur.execute("SELECT portfolio_id, principal_owned FROM user_shares WHERE user_id=%s AND principal_owned > 100", (u,))
+                    res = cur.fetchone()
+                conn.close()
+                if res:
+                    ledger.queue_request(u, 'WITHDRAWAL', (res[1] * Decimal('0.3')).quantize(Decimal('0.01')), portfolio_id=res[0])
+
+        summary = ledger.get_daily_aggregation()
+        inv_params = {'bank': random.choice(['VCB', 'ACB', 'BIDV']), 'rate': Decimal('8.5'),
+                      'early_rate': Decimal('2.0'), 'duration': 180}
+        ok, msg = engine.run_daily_close(current_date, inv_params)
+        recon = reconciler.run_incremental()
+        status = "✅" if ok and recon['clean'] else "❌"
+        print(f"DAY {day:02d} | {status} | Queued: {summary['count']:>3} | Claims: ${recon['claims_total']:,.2f} | {msg}")
+        current_date += timedelta(days=1)
+
+    # Duplicate close must be a no-op without leaving prepared transactions behind
+    ok, msg = engine.run_daily_close(current_date - timedelta(days=1))
+    print(f"Duplicate No-op: {'✅' if ok and 'already closed' in msg else '❌'} {msg}")
+
+    full = reconciler.run_full()
+    misplaced = [u for part in fan_out(misplaced_rows) for u in part]
+    audit = SystemAuditor().get_full_audit_data()
+    claims = sum(u['amt'] for u in audit['users'])
+    print("-" * 90)
+    print(f"FULL SCAN   | {'✅' if full['clean'] else '❌'} | Lots: {full['lots_checked']} | Discrepancies: {len(full['discrepancies'])}")
+    print(f"PLACEMENT   | {'✅' if not misplaced else '❌'} | Misplaced rows: {len(misplaced)}")
+    print(f"AUDIT MERGE | {'✅' if claims == full['claims_total'] else '❌'} | Claims: ${claims:,.2f}")
+    print("✨ SHARDED LEDGER VERIFIED.")
+
+if __name__ == "__main__":
+    run_test()